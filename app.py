@@ -1,197 +1,52 @@
-import streamlit as st
+import time
+script_started = time.perf_counter() # whole-script time, recorded as "rerun: <page>" at the end
+import importlib
+import os
+
 import pandas as pd
-import data_processor
-import altair as alt
+import streamlit as st
+
+import app_state
+import instrumentation
+
+# Pages live in their own modules and are imported on first visit, so the landing page
+# never pays for altair, openpyxl or the pivot / query engines
+PAGE_MODULES = {
+    "Audit: Raw Form Export": "page_tables",
+    "Dataset: Master Course List": "page_tables",
+    "Overview: Course Offerings": "page_analysis",
+    "Trends: Virtue by Year": "page_analysis",
+    "Trends: Virtue by Semester": "page_analysis",
+    "Analysis: Instructor Load": "page_analysis",
+    "Analysis: Department Alignment": "page_analysis",
+    "Analysis: Virtual Adoption": "page_analysis",
+    "Tool: Course Lookup": "page_tables",
+    "Catalog: Virtual Courses": "page_tables",
+    "Quality: Issues Log": "page_tables",
+    "Quality: Tag Validation": "page_tables",
+    "Diagnostics": "page_diagnostics",
+}
+
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'style.css')
 
 # --- CONFIGURATION & STYLING ---
 st.set_page_config(page_title="Cardinal Virtues Dashboard", layout="wide")
 
-# Custom CSS for the "White Box" (Table) and "Mint Box" (Chart) theme
-# Custom CSS for the "White Box" (Table) and "Mint Box" (Chart) theme
-st.markdown("""
-<style>
-    /* Main Background - Force light theme colors */
-    .stApp {
-        background-color: #F5F7F8;
-        color: #333333; /* Default text color */
-    }
-    
-    /* 
-       CSS :has() selector strategy for containers
-    */
-
-    /* Landing Page Box (New Unified Layout) */
-    div[data-testid="stVerticalBlock"]:has(div.landing-box-marker) {
-        background-color: white;
-        padding: 50px;
-        border-radius: 15px;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.05);
-        text-align: center;
-        /* Force dark text */
-        color: #2c3e50 !important;
-    }
-    
-    /* Center the file uploader inside the landing box */
-    div[data-testid="stVerticalBlock"]:has(div.landing-box-marker) div[data-testid="stFileUploader"] {
-        margin: 0 auto;
-        max-width: 100%;
-    }
-    
-    /* Force specific text colors in the landing box */
-    div[data-testid="stVerticalBlock"]:has(div.landing-box-marker) h1, 
-    div[data-testid="stVerticalBlock"]:has(div.landing-box-marker) p {
-        color: #2c3e50 !important;
-    }
-    
-    /* White Box Column */
-    div[data-testid="stVerticalBlock"]:has(div.white-box-marker) {
-        background-color: white;
-        padding: 20px;
-        border-radius: 12px;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-        border: 1px solid #EAEAEA;
-        /* Force Text Color */
-        color: #333333 !important;
-    }
-
-    /* Mint Box Column */
-    div[data-testid="stVerticalBlock"]:has(div.mint-box-marker) {
-        background-color: #E0F7FA;
-        padding: 20px;
-        border-radius: 12px;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-        border: 1px solid #B2EBF2;
-        /* Force Text Color */
-        color: #006064 !important;
-    }
-    
-    /* Force standard headers to be dark everywhere */
-    h1, h2, h3, p, label, .stMarkdown, div[data-testid="stMarkdownContainer"] {
-        color: #333333 !important;
-    }
-    
-    /* Markers (Hidden) */
-    .white-box-marker, .mint-box-marker, .landing-box-marker {
-        display: none;
-    }
-    
-    /* Helper text */
-    .sub-text {
-        font-size: 0.9em;
-        color: #666 !important;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# --- DATA LOADING ---
-@st.cache_data
-def load_data(file):
-    return data_processor.process_file(file)
-
-# --- HELPER FUNCTIONS ---
-# --- HELPER FUNCTIONS ---
-def show_split_view(dataframe, index_col, columns_col, title_pivot="Pivot Table", title_chart="Visualization", values_col='Course Code', agg='count'):
-    """
-    Renders the split view: Left = White Box (Pivot), Right = Mint Box (Chart)
-    """
-    col1, col2 = st.columns([5, 4], gap="medium")
-    
-    # 1. Prepare Data
-    pivot = dataframe.pivot_table(
-        index=index_col,
-        columns=columns_col,
-        values=values_col,
-        aggfunc=agg,
-        fill_value=0
-    )
-    # Add Total for table display
-    pivot_display = pivot.copy()
-    pivot_display['Total'] = pivot_display.sum(axis=1)
-
-    # 2. Render Left Column (White Box)
-    with col1:
-        # Marker for CSS targeting
-        st.markdown('<div class="white-box-marker"></div>', unsafe_allow_html=True)
-        st.markdown(f'<h3>{title_pivot}</h3>', unsafe_allow_html=True)
-        st.dataframe(pivot_display, use_container_width=True, height=500)
+@st.cache_resource(show_spinner=False)
+def load_style():
+    # Read once per server process, not on every rerun
+    with open(STYLE_FILE, encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
-    # 3. Render Right Column (Mint Box)
-    with col2:
-        # Marker for CSS targeting
-        st.markdown('<div class="mint-box-marker"></div>', unsafe_allow_html=True)
-        
-        # Header + Chart Toggle in columns
-        c_head_1, c_head_2 = st.columns([2, 1])
-        with c_head_1:
-            st.markdown(f'<h3>{title_chart}</h3>', unsafe_allow_html=True)
-        with c_head_2:
-            chart_type = st.selectbox("Chart Type", ["Bar", "Line", "Area", "Heatmap"], key=title_chart, label_visibility="collapsed")
-
-        # Move chart down for cleaner look
-        st.markdown("<br>", unsafe_allow_html=True)
-
-        # Chart Data Preparation
-        reset = pivot.reset_index()
-        melted = reset.melt(id_vars=[reset.columns[0]], var_name='Category', value_name='Count')
-        
-        primary_dim = reset.columns[0] # e.g., Academic Year
-        secondary_dim = 'Category'      # e.g., Semester/Virtue
-        
-        # Custom Color Scale: Purple, Light Green, Gray shades
-        custom_colors = alt.Scale(range=['#9b59b6', '#2ecc71', '#95a5a6', '#8e44ad', '#27ae60', '#7f8c8d'])
-        
-        # Chart Logic
-        if chart_type == "Bar":
-            # Grouped Bar Chart (Cleaner, Single Axis, No Overflow)
-            chart = alt.Chart(melted).mark_bar().encode(
-                x=alt.X(primary_dim, title=index_col, axis=alt.Axis(labelAngle=0)),
-                y=alt.Y('Count', title='Count'),
-                xOffset=alt.XOffset(secondary_dim),
-                color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
-                tooltip=[primary_dim, secondary_dim, 'Count']
-            ).properties(
-                height=500 # Strict match to table
-            ).interactive()
-
-        elif chart_type == "Line":
-            chart = alt.Chart(melted).mark_line(point=True).encode(
-                x=alt.X(primary_dim, title=index_col),
-                y=alt.Y('Count', title='Count'),
-                color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
-                tooltip=[primary_dim, secondary_dim, 'Count']
-            ).properties(height=500).interactive()
-
-        elif chart_type == "Area":
-            chart = alt.Chart(melted).mark_area(opacity=0.6).encode(
-                x=alt.X(primary_dim, title=index_col),
-                y=alt.Y('Count', title='Count', stack=None),
-                color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
-                tooltip=[primary_dim, secondary_dim, 'Count']
-            ).properties(height=500).interactive()
-            
-        elif chart_type == "Heatmap":
-            chart = alt.Chart(melted).mark_rect().encode(
-                x=alt.X(primary_dim, title=index_col),
-                y=alt.Y(secondary_dim, title=columns_col),
-                color=alt.Color('Count', title='Count'),
-                tooltip=[primary_dim, secondary_dim, 'Count']
-            ).properties(height=500).interactive()
-
-        st.altair_chart(chart, use_container_width=True)
+# Custom CSS for the "White Box" (Table) and "Mint Box" (Chart) theme
+st.markdown(load_style(), unsafe_allow_html=True)
 
 # --- APP STATE MANAGEMENT ---
-if 'df' not in st.session_state:
-    st.session_state.df = None
-if 'active_page' not in st.session_state:
-    st.session_state.active_page = "Landing"
-
-def reset_app():
-    st.session_state.df = None
-    st.session_state.active_page = "Landing"
+app_state.init_state()
 
 # --- SIDEBAR LOGIC ---
 # Conditionally render sidebar content
-if st.session_state.df is None:
+if st.session_state.dataset is None:
     # HIDE SIDEBAR CSS when on Landing
     st.markdown("""
     <style>
@@ -209,8 +64,24 @@ else:
         st.title("Navigation")
         
         if st.button("📤 Upload New File", use_container_width=True):
-            reset_app()
+            app_state.reset_app()
             st.rerun()
+
+        update_file = st.file_uploader("🔄 Apply Updated Export", type=['xlsx'], key="update_upload",
+                                       help="A newer export of the same form: only the changed responses are processed.")
+        if update_file is not None and update_file.file_id != st.session_state.applied_update:
+            try:
+                with st.spinner("Applying update..."):
+                    message = app_state.apply_update(update_file)
+                st.session_state.applied_update = update_file.file_id
+                st.success(message)
+            except Exception as e:
+                st.error(f"Error processing file: {e}")
+
+        ingest_report = st.session_state.dataset.dataset.report
+        if ingest_report:
+            with st.expander("⏱️ Ingest Timings"):
+                st.dataframe(pd.DataFrame(ingest_report), hide_index=True, use_container_width=True)
             
         st.markdown("---")
         
@@ -268,138 +139,31 @@ else:
         elif mode_quality: st.session_state.active_page = mode_quality
         elif mode_dataset: st.session_state.active_page = mode_dataset
 
+        # Hidden developer page: listed with ?diagnostics in the URL or when CV_PROFILE=1
+        if instrumentation.ENABLED or "diagnostics" in st.query_params:
+            st.header("Developer")
+            if st.toggle("🩺 Diagnostics", key="nav_diagnostics"):
+                st.session_state.active_page = "Diagnostics"
+            elif st.session_state.active_page == "Diagnostics":
+                st.session_state.active_page = "Overview: Course Offerings"
 
 # --- MAIN CONTENT ---
 
-if st.session_state.df is None:
-    # --- LANDING / IMPORT STATE ---
-    col1, col2, col3 = st.columns([1,2,1])
-    with col2:
-        # Unified Landing Card Container
-        with st.container():
-            # Marker for CSS targeting (Landing Card Style)
-            st.markdown('<div class="landing-box-marker"></div>', unsafe_allow_html=True)
-            
-            st.markdown("""
-                <h1>Import dataset for pivot tables or insight</h1>
-                <p class="sub-text">Please upload your Course Designation Form (Excel) to begin analysis.</p>
-            """, unsafe_allow_html=True)
-            
-            st.markdown("<br>", unsafe_allow_html=True) 
-
-            # Uploader NOW INSIDE the container
-            uploaded_file = st.file_uploader("Choose a file", type=['xlsx'], label_visibility="collapsed")
-            
-            if uploaded_file is not None:
-                try:
-                    with st.spinner("Processing Data..."):
-                        df = load_data(uploaded_file)
-                        st.session_state.df = df
-                        st.session_state.active_page = "Overview: Course Offerings" # Default landing
-                        st.rerun()
-                except Exception as e:
-                    st.error(f"Error processing file: {e}")
+if st.session_state.dataset is None:
+    import page_landing
+    page_landing.render()
 
 else:
     # --- DASHBOARD STATE ---
-    df = st.session_state.df
     active_page = st.session_state.active_page
-    
+
     # Handle case where page is still landing but we have data
     if active_page == "Landing":
         active_page = "Overview: Course Offerings"
 
     st.title(active_page)
+    page_started = time.perf_counter()
+    importlib.import_module(PAGE_MODULES[active_page]).render(active_page)
+    instrumentation.record(f"page: {active_page}", page_started)
 
-    # 1. Audit: Raw Form Export
-    if active_page == "Audit: Raw Form Export":
-        st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
-        st.write("Original Data Source (Form Responses)")
-        st.dataframe(df[df['Source'] == 'Form'], use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-
-    # 2. Dataset: Master Course List
-    elif active_page == "Dataset: Master Course List":
-        st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
-        st.write("Full Processed Dataset (Normalized)")
-        st.dataframe(df, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # 3. Overview: Course Offerings
-    elif active_page == "Overview: Course Offerings":
-        valid_ay = df[df['Academic Year'].str.startswith('AY')]
-        show_split_view(valid_ay, 'Academic Year', 'Semester', 
-                       title_pivot="Course Count by Year/Sem", title_chart="Trend Overview")
-
-    # 4. Trends: Virtue by Year
-    elif active_page == "Trends: Virtue by Year":
-        show_split_view(df, 'Cardinal virtues addressed', 'Academic Year',
-                       title_pivot="Virtue Distribution (Year)", title_chart="Virtue Trends")
-
-    # 5. Trends: Virtue by Semester
-    elif active_page == "Trends: Virtue by Semester":
-        show_split_view(df, 'Cardinal virtues addressed', 'Semester',
-                       title_pivot="Virtue Distribution (Semester)", title_chart="Seasonality Analysis")
-
-    # 6. Analysis: Instructor Load
-    elif active_page == "Analysis: Instructor Load":
-         # Top 20 for readability
-        top_instructors = df['Instructor name'].value_counts().head(20).index
-        filtered = df[df['Instructor name'].isin(top_instructors)]
-        show_split_view(filtered, 'Instructor name', 'Cardinal virtues addressed',
-                       title_pivot="Instructor Focus Area", title_chart="Instructor Load Visualization")
-
-    # 7. Analysis: Department Alignment
-    elif active_page == "Analysis: Department Alignment":
-        show_split_view(df, 'Department', 'Cardinal virtues addressed',
-                       title_pivot="Departmental Breakdown", title_chart="Department Strategy")
-
-    # 8. Analysis: Virtual Adoption
-    elif active_page == "Analysis: Virtual Adoption":
-        show_split_view(df, 'Academic Year', 'DeliveryMode',
-                       title_pivot="Virtual Penetration", title_chart="Adoption Rate")
-
-    # 9. Tool: Course Lookup
-    elif active_page == "Tool: Course Lookup":
-        st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
-        col1, col2, col3 = st.columns(3)
-        with col1: sel_virtue = st.multiselect("Virtue", df['Cardinal virtues addressed'].unique())
-        with col2: sel_ay = st.multiselect("Academic Year", df['Academic Year'].unique())
-        with col3: sel_dept = st.multiselect("Department", df['Department'].unique())
-        
-        filtered_df = df.copy()
-        if sel_virtue: filtered_df = filtered_df[filtered_df['Cardinal virtues addressed'].isin(sel_virtue)]
-        if sel_ay: filtered_df = filtered_df[filtered_df['Academic Year'].isin(sel_ay)]
-        if sel_dept: filtered_df = filtered_df[filtered_df['Department'].isin(sel_dept)]
-        
-        st.dataframe(filtered_df, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # 10. Catalog: Virtual Courses
-    elif active_page == "Catalog: Virtual Courses":
-        st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
-        virt_df = df[df['DeliveryMode'] == 'Virtual']
-        if len(virt_df) == 0:
-            st.warning("No courses explicitly marked as 'Virtual' were found.")
-        else:
-            st.dataframe(virt_df, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # 11. Quality: Issues Log
-    elif active_page == "Quality: Issues Log":
-        st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
-        unknowns = df[(df['Department'] == 'Unknown') | (df['Term'] == 'Unknown')]
-        st.write(f"Found {len(unknowns)} potential data quality issues.")
-        st.dataframe(unknowns, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-    # 12. Quality: Tag Validation
-    elif active_page == "Quality: Tag Validation":
-        st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
-        st.subheader("Virtue / Tag Analysis")
-        vc = df['Cardinal virtues addressed'].value_counts()
-        st.dataframe(vc, use_container_width=True)
-        st.info("Expected: Justice, Prudence, Temperance, Fortitude")
-        st.markdown('</div>', unsafe_allow_html=True)
-
+instrumentation.record(f"rerun: {st.session_state.active_page}", script_started)
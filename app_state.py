@@ -0,0 +1,116 @@
+import time
+
+import streamlit as st
+
+from instrumentation import span
+
+# --- SESSION STATE ---
+# Shared by app.py and the page modules. A session only keeps a handle on its dataset
+# (dataset_store.DatasetHandle); the master_df and what is derived from it live in one
+# process-wide store, so sessions on the same export share them. The data modules behind
+# these helpers (pivot_cube, query_engine, dataset_cache...) are imported on first use.
+
+@st.cache_resource(show_spinner=False)
+def get_store():
+    from dataset_store import DatasetStore
+    return DatasetStore()
+
+@st.cache_resource(show_spinner=False)
+def get_jobs():
+    # Background ingests of uploads (ingest_jobs.py), shared by every session like the store
+    from ingest_jobs import IngestJobs
+    return IngestJobs(get_store())
+
+def init_state():
+    if 'dataset' not in st.session_state:
+        st.session_state.dataset = None
+    if 'ingest_job' not in st.session_state:
+        st.session_state.ingest_job = None # (job id or None once cancelled, upload file ids)
+    if 'applied_update' not in st.session_state:
+        st.session_state.applied_update = None
+    if 'active_page' not in st.session_state:
+        st.session_state.active_page = "Landing"
+
+def _set_dataset(handle):
+    previous = st.session_state.dataset
+    st.session_state.dataset = handle
+    if previous is not None:
+        previous.close()
+
+def reset_app():
+    _set_dataset(None)
+    st.session_state.active_page = "Landing"
+
+def open_dataset(handle):
+    # A freshly loaded dataset: the previous one is handed back to the store
+    _set_dataset(handle)
+    st.session_state.active_page = "Overview: Course Offerings" # Default landing
+
+# --- DERIVED DATA ---
+
+def get_df():
+    return st.session_state.dataset.df
+
+def get_dataset_key():
+    # Content hash of the session's dataset (dataset_cache.files_key)
+    return st.session_state.dataset.key
+
+def get_query_engine():
+    # Polars (lazy, multi-threaded) when installed, else pandas; see query_engine.ENGINE
+    def build():
+        from query_engine import get_engine
+        return get_engine(dataset.df)
+
+    dataset = st.session_state.dataset.dataset
+    return dataset.derive('engine', build)
+
+def get_cube():
+    # Built once per dataset, by the first session that needs it; every analysis view is sliced out of it
+    def build():
+        from pivot_cube import PivotCube
+        engine = get_query_engine()
+        with span('pivot_cube', rows=len(dataset.df), engine=engine.name):
+            return PivotCube(dataset.df, engine=engine)
+
+    dataset = st.session_state.dataset.dataset
+    return dataset.derive('cube', build)
+
+def get_quality():
+    # Built by the ingest along with master_df; a dataset added without one reads it back from
+    # the on-disk cache (None if it is not there either)
+    def build():
+        import dataset_cache
+        return dataset_cache.load_quality(dataset.key)
+
+    dataset = st.session_state.dataset.dataset
+    return dataset.derive('quality', build)
+
+def apply_update(uploaded_file):
+    # Incremental re-ingest on top of the current dataset: only new/changed responses are
+    # parsed, retracted rows are dropped and the pivot cube is patched instead of rebuilt
+    import dataset_cache
+    from pivot_cube import PivotCube
+
+    current = st.session_state.dataset
+    start = time.perf_counter()
+    key, df, quality, delta = dataset_cache.load_or_process(uploaded_file, base_key=current.key)
+    if key == current.key:
+        return "No changes: this export is already loaded."
+    cube = None
+    base_cube = current.dataset.cube
+    # A delta comes back only when the stored state of current.key was the base; otherwise
+    # (cache entry evicted, precomputed dataset) the export was parsed in full and the cube is rebuilt
+    if delta is not None and base_cube is not None:
+        # The base cube is shared with other sessions: patch a new one over its counts
+        cube = PivotCube.from_counts(base_cube.counts, base_cube.n_rows)
+        cube.apply_delta(delta, df)
+    # Ingest Timings of this update, not of the upload it was applied to
+    report = [{
+        'file': getattr(uploaded_file, 'name', str(uploaded_file)),
+        'rows': quality.n_responses,
+        **({} if delta is None else {'new': delta.n_new, 'removed': delta.n_deleted, 'unchanged': delta.n_unchanged}),
+        'master_rows': int((~df['Hardcoded'].to_numpy()).sum()), # form rows, as in the multi-file report
+        'seconds': round(time.perf_counter() - start, 3),
+    }]
+    _set_dataset(get_store().add(key, df, report, cube=cube, quality=quality))
+    return "Dataset updated." if delta is None else f"Dataset updated: {delta.summary()}."
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_processor
+
+# --- CONFIGURATION ---
+# Batch output (see cli.py): everything the dashboard shows, precomputed.
+#   manifest.json       what was built from what, with which rules
+#   master.parquet      normalized master_df (categorical columns kept)
+#   cube.parquet        PivotCube counts, so the app starts without grouping master_df
+#   quality.npz         QualityIndex arrays behind the quality pages
+#   pivots/*.parquet    each show_split_view pivot and quality table
+#   report.xlsx         the same tables as worksheets (plus master_df)
+# The landing page checks for a manifest on every run, so the modules that build or load the
+# tables (pivot_cube, exports, dataset_cache and pyarrow behind them) are imported where used.
+ARTIFACTS_DIR = os.environ.get(
+    'CV_ARTIFACTS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports')
+)
+MANIFEST = 'manifest.json'
+MASTER_FILE = 'master.parquet'
+CUBE_FILE = 'cube.parquet'
+QUALITY_FILE = 'quality.npz'
+PIVOTS_DIR = 'pivots'
+XLSX_FILE = 'report.xlsx'
+
+# --- TABLES ---
+
+def report_tables(cube, quality):
+    """Every dashboard table by page name: the six split-view pivots, then the quality checks."""
+    from pivot_cube import DASHBOARD_VIEWS
+
+    tables = {}
+    for view_name in DASHBOARD_VIEWS:
+        pivot = cube.pivot(view_name).copy()
+        pivot['Total'] = pivot.sum(axis=1)
+        tables[view_name] = pivot
+    # Same tables as the quality pages (see page_tables)
+    tables["Quality: Issues Log"] = quality.log
+    tables["Quality: Tag Validation"] = quality.tag_table()
+    return tables
+
+# --- WRITE ---
+
+def write_xlsx(path, tables, master_df):
+    """Multi-sheet report; master_df is split over as many sheets as Excel's row limit needs."""
+    import exports
+
+    sheets = [(name, exports.flat(table), None, None) for name, table in tables.items()]
+    exports.write_xlsx(path, sheets + [("Master Course List", master_df, None, None)])
+
+def write_artifacts(state, out_dir=ARTIFACTS_DIR, sources=(), report=None, xlsx=True):
+    """
+    Write master_df, the cube counts, every report table (Parquet) and optionally the XLSX
+    report for an IngestState built from sources [(name, raw bytes)]. Returns the manifest.
+    """
+    import dataset_cache
+    import exports
+    from pivot_cube import PivotCube
+
+    master_df = state.master_df
+    cube = PivotCube(master_df)
+    tables = report_tables(cube, state.quality)
+
+    os.makedirs(os.path.join(out_dir, PIVOTS_DIR), exist_ok=True)
+    try:
+        os.remove(os.path.join(out_dir, MANIFEST)) # the old files are about to be overwritten
+    except FileNotFoundError:
+        pass
+    master_df.to_parquet(os.path.join(out_dir, MASTER_FILE), index=False)
+    cube.counts.to_parquet(os.path.join(out_dir, CUBE_FILE), index=False)
+    np.savez(os.path.join(out_dir, QUALITY_FILE), **state.quality.to_arrays())
+    pivot_files = {}
+    for name, table in tables.items():
+        pivot_files[name] = os.path.join(PIVOTS_DIR, exports.slug(name) + '.parquet')
+        exports.flat(table).to_parquet(os.path.join(out_dir, pivot_files[name]), index=False)
+    if xlsx:
+        write_xlsx(os.path.join(out_dir, XLSX_FILE), tables, master_df)
+
+    manifest = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rules': data_processor.rules_fingerprint(),
+        'parser_version': data_processor.PARSER_VERSION,
+        'dataset_key': dataset_cache.files_key(sources) if sources else None,
+        'sources': [name for name, _ in sources],
+        'rows': len(master_df),
+        'form_rows': int((master_df['Source'] == 'Form').sum()),
+        'master': MASTER_FILE,
+        'cube': CUBE_FILE,
+        'quality': QUALITY_FILE,
+        'tables': pivot_files,
+        'xlsx': XLSX_FILE if xlsx else None,
+        'ingest': report or [],
+    }
+    # Written last (atomically): a directory with a manifest is complete
+    tmp_path = os.path.join(out_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST))
+    return manifest
+
+# --- READ ---
+
+def read_manifest(out_dir=ARTIFACTS_DIR):
+    """The manifest if out_dir holds artifacts built with the current parsing rules, else None."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('rules') != data_processor.rules_fingerprint():
+        return None # stale: built by another parser version / rule set
+    if 'quality' not in manifest:
+        return None # built before the quality index
+    return manifest
+
+def load_artifacts(out_dir=ARTIFACTS_DIR, manifest=None):
+    """(manifest, master_df, PivotCube, QualityIndex) from a batch run, or None when there is none usable."""
+    from pivot_cube import PivotCube
+    from quality_index import QualityIndex
+
+    manifest = manifest or read_manifest(out_dir)
+    if manifest is None:
+        return None
+    master_df = pd.read_parquet(os.path.join(out_dir, manifest['master']))
+    counts = pd.read_parquet(os.path.join(out_dir, manifest['cube']))
+    with np.load(os.path.join(out_dir, manifest['quality'])) as arrays:
+        quality = QualityIndex.from_arrays(arrays)
+    return manifest, master_df, PivotCube.from_counts(counts, len(master_df)), quality
@@ -0,0 +1,1136 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_processor
+from synthetic_data import TERM_ANSWERS, make_form_frame
+
+# --- REFERENCE IMPLEMENTATION ---
+# The row-by-row loop process_file used before the columnar engine.
+# Kept here so the output can be diffed and the speedup measured.
+
+def legacy_process_frame(df):
+    processed_rows = []
+    term_expander = data_processor.parse_terms()
+
+    for idx, row in df.iterrows():
+        raw_course = str(row.get('Course Info', ''))
+        raw_term = str(row.get('Term(s) offered', ''))
+        virtue_str = str(row.get('Cardinal virtues addressed', ''))
+        instructor = str(row.get('Instructor name', ''))
+
+        virtues = data_processor.normalize_virtues(virtue_str)
+        if not virtues: continue
+
+        delivery = data_processor.get_virtual_status(row)
+
+        terms = term_expander(raw_term)
+        if not terms:
+            terms = [('Unknown', 'Unknown')]
+
+        course_match = re.search(r'([A-Z]{3,4})\s*-?(\d{3})', raw_course)
+        if course_match:
+            dept = course_match.group(1)
+            num = course_match.group(2)
+            code = f"{dept} {num}"
+        else:
+            dept = 'Unknown'
+            num = 'Unknown'
+            code = raw_course[:20] + '...'
+
+        for v in virtues:
+            for term_name, ay in terms:
+                processed_rows.append({
+                    'Source': 'Form',
+                    'Course Code': code,
+                    'Department': dept,
+                    'Course Number': num,
+                    'Course Title': raw_course,
+                    'Section': 'See Info',
+                    'Instructor name': instructor,
+                    'Cardinal virtues addressed': v,
+                    'Term': term_name,
+                    'Academic Year': ay,
+                    'DeliveryMode': delivery,
+                    'Semester': term_name.split(' ')[0] if ' ' in term_name else term_name,
+                    'Hardcoded': False
+                })
+
+    hard_df = data_processor.get_hardcoded_courses()
+    for idx, row in hard_df.iterrows():
+        for v in row['Cardinal virtues addressed'].split(';'):
+            processed_rows.append({
+                'Source': 'Hardcoded',
+                'Course Code': row['Course Code'],
+                'Department': row['Department'],
+                'Course Number': row['Course Number'],
+                'Course Title': row['Course Title'],
+                'Section': row['Section'],
+                'Instructor name': row['Instructor name'],
+                'Cardinal virtues addressed': v,
+                'Term': row['Term'],
+                'Academic Year': row['Academic Year'],
+                'DeliveryMode': row['DeliveryMode'],
+                'Semester': row['Term'].split(' ')[0],
+                'Hardcoded': True
+            })
+
+    return pd.DataFrame(processed_rows)
+
+LEGACY_AY_MAPPING = {
+    'Fall 2025': 'AY 25', 'J-Term 2026': 'AY 25', 'Spring 2026': 'AY 25', 'Summer 2026': 'AY 25',
+    'Fall 2026': 'AY 26', 'J-Term 2027': 'AY 26', 'Spring 2027': 'AY 26', 'Summer 2027': 'AY 26',
+    'Fall 2027': 'AY 27',
+}
+
+def legacy_parse_terms():
+    # parse_terms() before the memoized engine: uncompiled regex + hand-listed AY mapping
+    def expand(text):
+        if not isinstance(text, str): return []
+        text = text.lower()
+        results = []
+        matches = re.findall(r'(fall|spring|summer|j-term)\s*(\d{4}|\d{2})', text)
+        for season, year in matches:
+            if len(year) == 2: year = '20' + year
+            term_str = f"{season.title()} {year}"
+            if term_str in LEGACY_AY_MAPPING:
+                results.append((term_str, LEGACY_AY_MAPPING[term_str]))
+        if 'every' in text or 'each' in text or 'all' in text:
+            defaults = [('Fall 2025', 'AY 25'), ('Spring 2026', 'AY 25'), ('Fall 2026', 'AY 26'), ('Spring 2027', 'AY 26')]
+            if 'fall' in text and 'spring' not in text:
+                defaults = [x for x in defaults if 'Fall' in x[0]]
+            elif 'spring' in text and 'fall' not in text:
+                defaults = [x for x in defaults if 'Spring' in x[0]]
+            existing_terms = {r[0] for r in results}
+            for d in defaults:
+                if d[0] not in existing_terms:
+                    results.append(d)
+        return results
+    return expand
+
+# --- HELPERS ---
+
+def timed(fn, *args, repeat=1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def mapped_form_frame(n_rows, seed=0):
+    raw = make_form_frame(n_rows, seed)
+    return raw.rename(columns=data_processor.map_columns(raw.columns))
+
+def to_plain(master_df):
+    # master_df with the categorical columns turned back into plain strings
+    cat_cols = master_df.select_dtypes('category').columns
+    return master_df.astype({c: str for c in cat_cols})
+
+def dashboard_pivots(df):
+    # The six show_split_view pivots, as app.py builds them
+    top_instructors = df['Instructor name'].value_counts().head(20).index
+    return {
+        'Overview: Course Offerings': (df[df['Academic Year'].str.startswith('AY')], 'Academic Year', 'Semester'),
+        'Trends: Virtue by Year': (df, 'Cardinal virtues addressed', 'Academic Year'),
+        'Trends: Virtue by Semester': (df, 'Cardinal virtues addressed', 'Semester'),
+        'Analysis: Instructor Load': (df[df['Instructor name'].isin(top_instructors)], 'Instructor name', 'Cardinal virtues addressed'),
+        'Analysis: Department Alignment': (df, 'Department', 'Cardinal virtues addressed'),
+        'Analysis: Virtual Adoption': (df, 'Academic Year', 'DeliveryMode'),
+    }
+
+def pivot_view(dataframe, index_col, columns_col):
+    return dataframe.pivot_table(index=index_col, columns=columns_col, values='Course Code',
+                                 aggfunc='count', fill_value=0, observed=True)
+
+def assert_same_pivot(left, right):
+    # Same labels, order and counts; ignores categorical vs string index dtypes
+    def plain(pivot):
+        return pd.DataFrame(pivot.to_numpy(), index=[str(i) for i in pivot.index],
+                            columns=[str(c) for c in pivot.columns])
+    pd.testing.assert_frame_equal(plain(left), plain(right))
+
+# Runs in a fresh interpreter so nothing benchmark.py imported counts as already loaded.
+# Prints one JSON line: modules loaded by the landing page, then (first, reruns) script
+# times in ms per page, read from the "rerun: <page>" spans app.py records.
+STARTUP_PROBE = """
+import json, os, sys
+os.environ['CV_PROFILE'] = '1'
+from streamlit.testing.v1 import AppTest
+import instrumentation
+
+APP, PAGES, N_ROWS, RERUNS = sys.argv[1], sys.argv[2].split('|'), int(sys.argv[3]), int(sys.argv[4])
+HEAVY = ['altair', 'openpyxl', 'pyarrow', 'polars', 'charts', 'pivot_cube', 'query_engine', 'table_view']
+
+def script_ms():
+    return [s for s in instrumentation.spans() if s.name.startswith('rerun: ')][-1].duration * 1000
+
+def measure(at):
+    at.run()
+    assert not at.exception, at.exception
+    first = script_ms()
+    reruns = []
+    for _ in range(RERUNS):
+        at.run()
+        reruns.append(script_ms())
+    return first, reruns
+
+import pandas, streamlit
+# pandas 3 imports pyarrow itself when it is installed: only count what the page adds
+result = {'baseline': [m for m in HEAVY if m in sys.modules]}
+result['Landing'] = measure(AppTest.from_file(APP, default_timeout=120))
+result['loaded'] = [m for m in HEAVY if m in sys.modules and m not in result['baseline']]
+if N_ROWS:
+    import data_processor
+    from incremental import IngestState
+    from synthetic_data import make_form_frame
+    raw = make_form_frame(N_ROWS, seed=0)
+    raw = raw.rename(columns=data_processor.map_columns(raw.columns)).astype(object)
+    state, _ = IngestState.empty().update([(raw, N_ROWS, N_ROWS)])
+    from dataset_store import DatasetStore
+    for page in PAGES[1:]:
+        at = AppTest.from_file(APP, default_timeout=120)
+        # nothing derived yet
+        at.session_state['dataset'] = DatasetStore().add('startup', state.master_df, quality=state.quality)
+        at.session_state['active_page'] = page
+        result[page] = measure(at)
+print(json.dumps(result))
+"""
+
+# --- BENCHMARKS ---
+
+def bench_ingest(sizes, legacy_limit):
+    print(f"{'form rows':>10} {'out rows':>10} {'legacy s':>10} {'columnar s':>11} {'speedup':>8}")
+    for n in sizes:
+        df = mapped_form_frame(n)
+        t_new, new = timed(data_processor.process_frame, df)
+        if n <= legacy_limit:
+            t_old, old = timed(legacy_process_frame, df)
+            pd.testing.assert_frame_equal(to_plain(new), old)
+            print(f"{n:>10,} {len(new):>10,} {t_old:>10.2f} {t_new:>11.3f} {t_old / t_new:>7.1f}x")
+        else:
+            print(f"{n:>10,} {len(new):>10,} {'skipped':>10} {t_new:>11.3f} {'-':>8}")
+
+def bench_schema(sizes):
+    for n in sizes:
+        compact = data_processor.process_frame(mapped_form_frame(n))
+        plain = to_plain(compact)
+        print(f"\n{n:,} form rows -> {len(compact):,} master rows")
+
+        print(f"  {'column':<28} {'plain B/row':>12} {'compact B/row':>14}")
+        plain_mem = plain.memory_usage(deep=True, index=False)
+        compact_mem = compact.memory_usage(deep=True, index=False)
+        for col in data_processor.MASTER_COLUMNS + ['TOTAL']:
+            p = plain_mem.sum() if col == 'TOTAL' else plain_mem[col]
+            c = compact_mem.sum() if col == 'TOTAL' else compact_mem[col]
+            print(f"  {col:<28} {p / len(plain):>12.1f} {c / len(compact):>14.1f}")
+
+        print(f"  {'view (incl. filter)':<32} {'plain ms':>9} {'compact ms':>11}")
+        for name in dashboard_pivots(plain):
+            t_plain, p = timed(lambda: pivot_view(*dashboard_pivots(plain)[name]), repeat=3)
+            t_compact, c = timed(lambda: pivot_view(*dashboard_pivots(compact)[name]), repeat=3)
+            assert_same_pivot(p, c)
+            print(f"  {name:<32} {t_plain * 1000:>9.1f} {t_compact * 1000:>11.1f}")
+
+def bench_cube(sizes):
+    from pivot_cube import PivotCube, DASHBOARD_VIEWS
+
+    for n in sizes:
+        df = data_processor.process_frame(mapped_form_frame(n))
+        t_build, cube = timed(PivotCube, df)
+        print(f"\n{n:,} form rows -> {len(df):,} master rows, cube {len(cube.counts):,} cells built in {t_build * 1000:.1f} ms")
+        print(f"  {'view':<32} {'pivot_table ms':>15} {'cube first ms':>14} {'cube memo ms':>13}")
+        views = dashboard_pivots(df)
+        # value_counts leaves ties at the top-20 cut unspecified; the cube breaks them by first appearance
+        top_slice = df[df['Instructor name'].isin(cube.top_instructors())]
+        views['Analysis: Instructor Load'] = (top_slice,) + views['Analysis: Instructor Load'][1:]
+        for name in DASHBOARD_VIEWS:
+            t_table, ref = timed(lambda: pivot_view(*views[name]))
+            t_first, got = timed(cube.pivot, name)
+            t_memo, _ = timed(cube.pivot, name)
+            pd.testing.assert_frame_equal(got, ref)
+            print(f"  {name:<32} {t_table * 1000:>15.1f} {t_first * 1000:>14.1f} {t_memo * 1000:>13.3f}")
+
+def term_workloads(n, seed=0):
+    rng = np.random.default_rng(seed)
+    repetitive = list(rng.choice(TERM_ANSWERS, n))
+    # Adversarial: every answer distinct and long, so the memo never hits
+    tokens = ['fall', 'spring', 'summer', 'j-term', 'every', 'each', '2025', '26', 'semester', 'and', ',', 'x' * 40]
+    adversarial = [f"{i} " + ' '.join(rng.choice(tokens, 30)) for i in range(n)]
+    return {'repetitive': repetitive, 'adversarial': adversarial}
+
+def bench_terms(n):
+    print(f"{'workload':<12} {'strings':>9} {'legacy /s':>12} {'memoized /s':>12} {'hit rate':>9}")
+    for name, texts in term_workloads(n).items():
+        legacy = legacy_parse_terms()
+        t_old, _ = timed(lambda: [legacy(t) for t in texts])
+        data_processor._expand_terms.cache_clear()
+        expand = data_processor.parse_terms()
+        t_new, _ = timed(lambda: [expand(t) for t in texts])
+        stats = data_processor.term_parser_stats()
+        print(f"{name:<12} {len(texts):>9,} {len(texts) / t_old:>12,.0f} {len(texts) / t_new:>12,.0f} {stats['hit_rate']:>9.1%}")
+
+def bench_lookup(sizes):
+    from lookup_index import LookupIndex
+
+    def copy_and_filter(df, filters):
+        # The Course Lookup page before the index
+        filtered_df = df.copy()
+        for dim, selected in filters.items():
+            if selected: filtered_df = filtered_df[filtered_df[dim].isin(selected)]
+        return filtered_df
+
+    cases = {
+        'no filter': {},
+        '1 virtue': {'Cardinal virtues addressed': ['Justice']},
+        'virtue + AY': {'Cardinal virtues addressed': ['Justice', 'Fortitude'], 'Academic Year': ['AY 25']},
+        'virtue + AY + dept': {'Cardinal virtues addressed': ['Prudence'], 'Academic Year': ['AY 25', 'AY 26'],
+                               'Department': ['THEO', 'EDUC']},
+    }
+    for n in sizes:
+        df = data_processor.process_frame(mapped_form_frame(n))
+        t_build, index = timed(LookupIndex, df)
+        print(f"\n{n:,} form rows -> {len(df):,} master rows, index built in {t_build * 1000:.1f} ms")
+        print(f"  {'filter':<20} {'rows':>10} {'copy+isin ms':>13} {'index ms':>9}")
+        for name, filters in cases.items():
+            t_old, old = timed(copy_and_filter, df, filters, repeat=3)
+            t_new, positions = timed(index.select, filters, repeat=3)
+            matched = len(df) if positions is None else len(positions)
+            assert matched == len(old) and (positions is None or (old.index.to_numpy() == positions).all())
+            print(f"  {name:<20} {matched:>10,} {t_old * 1000:>13.1f} {t_new * 1000:>9.2f}")
+
+def bench_paging(n_master_rows, page_size):
+    from streamlit import dataframe_util
+    from table_view import page_frame, visible_rows
+
+    # Enough form rows to reach the requested master_df size
+    df = data_processor.process_frame(mapped_form_frame(n_master_rows // 3 + 1)).iloc[:n_master_rows]
+    print(f"master_df: {len(df):,} rows, page size {page_size}")
+    print(f"  {'table':<36} {'rows sent':>10} {'payload KB':>11} {'serialize ms':>13}")
+
+    def report(name, frame):
+        t, payload = timed(dataframe_util.convert_pandas_df_to_arrow_bytes, frame)
+        print(f"  {name:<36} {len(frame):>10,} {len(payload) / 1e3:>11,.1f} {t * 1000:>13.1f}")
+
+    form_rows = np.flatnonzero(df['Source'] == 'Form')
+    report("full master_df (before)", df)
+    report("full Source == 'Form' (before)", df[df['Source'] == 'Form'])
+    report("one page (after)", page_frame(df, form_rows[:page_size], list(df.columns)))
+    report("one page, 3 columns (after)", page_frame(df, form_rows[:page_size], ['Course Code', 'Term', 'Instructor name']))
+
+    print(f"  {'server-side step':<36} {'ms':>10}")
+    for name, kwargs in [
+        ('sort by Instructor name', {'sort_column': 'Instructor name'}),
+        ('sort by Course Title desc', {'sort_column': 'Course Title', 'ascending': False}),
+        ("search Course Code 'THEO'", {'search_column': 'Course Code', 'search_text': 'THEO'}),
+    ]:
+        t, _ = timed(lambda: visible_rows(df, form_rows, **kwargs), repeat=3)
+        print(f"  {name:<36} {t * 1000:>10.1f}")
+
+def form_batches(df, batch_size=data_processor.STREAM_BATCH_ROWS):
+    # Same shape as iter_form_batches, without the workbook read
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size].reset_index(drop=True).astype(object)
+        yield batch, min(start + batch_size, len(df)), len(df)
+
+def check_no_virtue_updates():
+    # Responses naming no virtue explode to nothing: a first upload of only those, and an
+    # update adding only those, still ingest (the update changes no rows)
+    from incremental import IngestState
+
+    blank = mapped_form_frame(50, seed=3)
+    blank['Cardinal virtues addressed'] = ''
+    first, delta = IngestState.empty().update(form_batches(blank))
+    assert first.n_form_rows == 0 and delta.added is None and delta.n_new == len(blank)
+    assert list(first.master_df.columns) == data_processor.MASTER_COLUMNS
+    base, _ = IngestState.empty().update(form_batches(mapped_form_frame(200, seed=1)))
+    state, delta = base.update(form_batches(pd.concat([mapped_form_frame(200, seed=1), blank], ignore_index=True)))
+    assert delta.added is None and delta.removed is None and delta.n_new == len(blank)
+    pd.testing.assert_frame_equal(state.master_df, base.master_df)
+    assert data_processor.build_master([]).columns.tolist() == data_processor.MASTER_COLUMNS
+
+def check_update_base():
+    # An update is only returned as a delta when the base entry's state was there to apply it
+    # to; with the base missing (evicted, precomputed dataset) it is a full parse and no delta
+    import os
+    import tempfile
+    import dataset_cache
+    from synthetic_data import write_form_xlsx
+
+    cache_dir = dataset_cache.CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_cache.CACHE_DIR = os.path.join(tmp, 'cache')
+        try:
+            old, new = (write_form_xlsx(os.path.join(tmp, f"export_{i}.xlsx"), 200, seed=i) for i in (1, 2))
+            base_key, _, _, _ = dataset_cache.load_or_process(old)
+            _, df, _, delta = dataset_cache.load_or_process(new, base_key=base_key)
+            assert delta is not None and delta.n_new > 0
+            dataset_cache.CACHE_DIR = os.path.join(tmp, 'evicted')
+            _, full, _, delta = dataset_cache.load_or_process(new, base_key=base_key)
+            assert delta is None
+            pd.testing.assert_frame_equal(*(
+                to_plain(d).sort_values(data_processor.MASTER_COLUMNS, ignore_index=True) for d in (df, full)))
+            # Without a base_key, an upload is parsed on its own whatever was opened before
+            dataset_cache.CACHE_DIR = os.path.join(tmp, 'history')
+            dataset_cache.load_or_process(old)
+            _, alone, _, delta = dataset_cache.load_or_process(new)
+            assert delta is None
+            pd.testing.assert_frame_equal(alone, full)
+        finally:
+            dataset_cache.CACHE_DIR = cache_dir
+
+def bench_incremental(n_rows, change_pcts):
+    from incremental import IngestState
+    from pivot_cube import PivotCube, DASHBOARD_VIEWS
+
+    check_no_virtue_updates()
+    check_update_base()
+    base_df = mapped_form_frame(n_rows, seed=1)
+    base, _ = IngestState.empty().update(form_batches(base_df))
+    print(f"base export: {n_rows:,} responses -> {len(base.master_df):,} master rows (workbook read excluded)")
+    print(f"  {'change':>8} {'full ingest + cube':>19} {'incremental + patch':>20} {'speedup':>8}")
+    for pct in change_pcts:
+        # Daily refresh: pct% appended responses, a fifth as many deleted ones
+        n_new = max(int(n_rows * pct / 100), 1)
+        updated = pd.concat([
+            base_df.drop(index=base_df.index[::max(n_rows // max(n_new // 5, 1), 1)]),
+            mapped_form_frame(n_new, seed=2),
+        ], ignore_index=True)
+
+        def full():
+            state, _ = IngestState.empty().update(form_batches(updated))
+            return PivotCube(state.master_df)
+
+        def incremental():
+            state, delta = base.update(form_batches(updated))
+            cube.apply_delta(delta, state.master_df)
+            return cube
+
+        cube = PivotCube(base.master_df) # patched in place by incremental()
+        cube.instructors # built up front, so the delta patches it too
+        t_full, ref = timed(full)
+        t_inc, cube = timed(incremental)
+        for view in DASHBOARD_VIEWS:
+            if DASHBOARD_VIEWS[view].get('filter') != 'top_instructors': # ties can rank differently
+                pd.testing.assert_frame_equal(cube.pivot(view), ref.pivot(view))
+        # The patched per-instructor aggregates match a fresh build: compared over every instructor
+        every = len(updated)
+        pd.testing.assert_frame_equal(cube.instructors.pivot(k=every), ref.instructors.pivot(k=every))
+        print(f"  {pct:>7}% {t_full:>18.2f}s {t_inc:>19.2f}s {t_full / t_inc:>7.1f}x")
+
+def bench_multi(n_files, n_rows, worker_counts):
+    import os
+    import tempfile
+    from multi_ingest import process_files
+    from synthetic_data import write_form_xlsx
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(n_files):
+            path = write_form_xlsx(os.path.join(tmp, f"export_{i}.xlsx"), n_rows, seed=i)
+            with open(path, 'rb') as f:
+                files.append((os.path.basename(path), f.read()))
+
+        print(f"{n_files} exports x {n_rows:,} responses, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in worker_counts:
+            t, (state, report) = timed(process_files, files, workers)
+            baseline = baseline or t
+            print(f"  {workers:>2} workers: {t:>7.2f}s  speedup {baseline / t:>4.1f}x  "
+                  f"({len(state.master_df):,} master rows)")
+        print(f"  {'file':<16} {'rows':>8} {'dupes':>6} {'master rows':>12} {'parse s':>8}")
+        for r in report:
+            print(f"  {r['file']:<16} {r['rows']:>8,} {r['duplicates']:>6,} {r['master_rows']:>12,} {r['seconds']:>8.2f}")
+
+def legacy_chart_spec(pivot, index_col, columns_col, chart_type):
+    # What show_split_view built before: every melted cell inline, rebuilt on each rerun
+    import altair as alt
+    reset = pivot.reset_index()
+    melted = reset.melt(id_vars=[reset.columns[0]], var_name='Category', value_name='Count')
+    primary_dim = melted.columns[0]
+    secondary_dim = 'Category'
+    custom_colors = alt.Scale(range=['#9b59b6', '#2ecc71', '#95a5a6', '#8e44ad', '#27ae60', '#7f8c8d'])
+    tooltip = [primary_dim, secondary_dim, 'Count']
+    if chart_type == "Bar":
+        chart = alt.Chart(melted).mark_bar().encode(
+            x=alt.X(primary_dim, title=index_col, axis=alt.Axis(labelAngle=0)), y=alt.Y('Count', title='Count'),
+            xOffset=alt.XOffset(secondary_dim), color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
+            tooltip=tooltip)
+    elif chart_type == "Line":
+        chart = alt.Chart(melted).mark_line(point=True).encode(
+            x=alt.X(primary_dim, title=index_col), y=alt.Y('Count', title='Count'),
+            color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors), tooltip=tooltip)
+    elif chart_type == "Area":
+        chart = alt.Chart(melted).mark_area(opacity=0.6).encode(
+            x=alt.X(primary_dim, title=index_col), y=alt.Y('Count', title='Count', stack=None),
+            color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors), tooltip=tooltip)
+    else:
+        chart = alt.Chart(melted).mark_rect().encode(
+            x=alt.X(primary_dim, title=index_col), y=alt.Y(secondary_dim, title=columns_col),
+            color=alt.Color('Count', title='Count'), tooltip=tooltip)
+    return chart.properties(height=500).interactive().to_dict()
+
+def bench_charts(n_rows):
+    import json
+    import altair as alt
+    from charts import CHART_TYPES, build_spec
+    from pivot_cube import PivotCube, DASHBOARD_VIEWS
+
+    master_df = data_processor.process_frame(mapped_form_frame(n_rows))
+    cube = PivotCube(master_df)
+    pivots = {view: (cube.pivot(view), spec['index'], spec['columns']) for view, spec in DASHBOARD_VIEWS.items()}
+    # High-cardinality case: every instructor, no top-20 filter
+    pivots["Instructor x Virtue (uncapped)"] = (
+        cube.counts.groupby(['Instructor name', 'Cardinal virtues addressed'], observed=True)['Count'].sum()
+        .unstack(fill_value=0), 'Instructor name', 'Cardinal virtues addressed')
+
+    print(f"{n_rows:,} form rows -> {len(master_df):,} master rows")
+    print(f"  {'view':<34} {'chart':<8} {'before KB':>10} {'after KB':>9} {'build ms':>9} {'cached ms':>10}")
+    print("  (before: full melt inlined by the old show_split_view, rebuilt on every rerun)")
+    cache = {}
+    for view, (pivot, index_col, columns_col) in pivots.items():
+        for chart_type in CHART_TYPES:
+            try:
+                before = f"{len(json.dumps(legacy_chart_spec(pivot, index_col, columns_col, chart_type))) / 1e3:,.1f}"
+            except alt.MaxRowsError: # Altair refuses to inline more than 5,000 rows
+                before = "MaxRows"
+            t_build, spec = timed(build_spec, pivot, index_col, columns_col, chart_type)
+            cache[(view, chart_type)] = spec
+            t_cached, _ = timed(lambda: cache[(view, chart_type)])
+            print(f"  {view[:34]:<34} {chart_type:<8} {before:>10} {len(json.dumps(spec)) / 1e3:>9,.1f} "
+                  f"{t_build * 1000:>9.1f} {t_cached * 1000:>10.4f}")
+
+def bench_engines(sizes):
+    from pivot_cube import PivotCube, DASHBOARD_VIEWS
+    from query_engine import ENGINES, polars_available
+
+    names = ['pandas'] + (['polars'] if polars_available() else [])
+    if len(names) == 1:
+        print("polars is not installed: timing the pandas engine only")
+    filters = {'Cardinal virtues addressed': ['Justice', 'Fortitude'], 'Academic Year': ['AY 25', 'AY 26'],
+               'Department': ['THEO', 'EDUC']}
+    for n in sizes:
+        df = data_processor.process_frame(mapped_form_frame(n))
+        print(f"\n{n:,} form rows -> {len(df):,} master rows")
+        print(f"  {'stage':<34}" + ''.join(f"{name + ' ms':>12}" for name in names))
+        timings, results = {}, {}
+        for name in names:
+            engine = ENGINES[name](df)
+            t_cube, cube = timed(PivotCube, df, engine)
+            timings[(name, 'cube build')] = t_cube
+            results[(name, 'cube')] = cube.counts
+            # Six views end to end: one cube build plus each pivot's first slice
+            def six_views():
+                fresh = PivotCube(df, engine)
+                return [fresh.pivot(v) for v in DASHBOARD_VIEWS]
+            t_views, pivots = timed(six_views)
+            timings[(name, 'six views')] = t_views
+            results[(name, 'pivots')] = pivots
+            timings[(name, 'lookup options')], results[(name, 'options')] = timed(
+                lambda: [engine.options(dim) for dim in filters])
+            timings[(name, 'lookup select')], results[(name, 'select')] = timed(engine.select, filters, repeat=3)
+            timings[(name, 'virtual catalog')], results[(name, 'catalog')] = timed(
+                engine.rows_equal, 'DeliveryMode', 'Virtual', repeat=3)
+        for name in names[1:]:
+            pd.testing.assert_frame_equal(results[(name, 'cube')], results[('pandas', 'cube')])
+            for got, ref in zip(results[(name, 'pivots')], results[('pandas', 'pivots')]):
+                pd.testing.assert_frame_equal(got, ref)
+            assert results[(name, 'options')] == results[('pandas', 'options')]
+            for key in ('select', 'catalog'):
+                np.testing.assert_array_equal(results[(name, key)], results[('pandas', key)])
+        for stage in ['cube build', 'six views', 'lookup options', 'lookup select', 'virtual catalog']:
+            print(f"  {stage:<34}" + ''.join(f"{timings[(name, stage)] * 1000:>12.1f}" for name in names))
+
+def bench_startup(n_rows, reruns, processes):
+    import json
+    import os
+    import statistics
+    import subprocess
+    import sys
+
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    pages = ["Landing", "Overview: Course Offerings", "Tool: Course Lookup", "Quality: Tag Validation"]
+    runs = []
+    for _ in range(processes):
+        out = subprocess.run([sys.executable, '-c', STARTUP_PROBE, app, '|'.join(pages), str(n_rows), str(reruns)],
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(app)).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{processes} fresh processes, {reruns} reruns each; pages after Landing use {n_rows:,} form rows")
+    loaded = sorted({m for r in runs for m in r['loaded']})
+    print(f"  heavy modules loaded by the landing page: {', '.join(loaded) or 'none'} "
+          f"(already loaded by pandas / streamlit: {', '.join(runs[0]['baseline']) or 'none'})")
+    print(f"  {'page':<30} {'first ms':>9} {'rerun median ms':>16} {'rerun min ms':>13}")
+    for page in pages if n_rows else pages[:1]:
+        first = statistics.median(r[page][0] for r in runs)
+        reruns_ms = [t for r in runs for t in r[page][1]]
+        print(f"  {page:<30} {first:>9.1f} {statistics.median(reruns_ms):>16.1f} {min(reruns_ms):>13.1f}")
+    if loaded:
+        raise SystemExit(f"landing page imported heavy modules: {', '.join(loaded)}")
+
+def session_rss(mode, n_sessions, n_rows):
+    """
+    One load-test run in a fresh process: n_sessions concurrent sessions open the same export
+    and render the six views. 'private' is the old per-session copy (st.cache_data unpickles
+    its cached master_df for every caller, and each session built its own cube); 'shared' goes
+    through dataset_store. Returns RSS above the baseline with every session open and after
+    they have all closed.
+    """
+    import gc
+    import pickle
+    import threading
+    from dataset_store import DatasetStore
+    from pivot_cube import PivotCube, DASHBOARD_VIEWS
+    from test_pivots import current_rss
+
+    blob = pickle.dumps(data_processor.process_frame(mapped_form_frame(n_rows)))
+    gc.collect()
+    base = current_rss()
+    store = DatasetStore()
+    sessions = []
+    opened = threading.Barrier(n_sessions + 1)
+
+    def session():
+        if mode == 'private':
+            df = pickle.loads(blob)
+            cube = PivotCube(df)
+            sessions.append((df, cube))
+        else:
+            handle = store.open('export', lambda: (pickle.loads(blob), None, None))
+            cube = handle.dataset.derive('cube', lambda: PivotCube(handle.dataset.df))
+            sessions.append(handle)
+        for view in DASHBOARD_VIEWS:
+            cube.pivot(view)
+        opened.wait()
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(n_sessions)]
+    for t in threads:
+        t.start()
+    opened.wait()
+    seconds = time.perf_counter() - t0
+    rss_open = current_rss()
+    for t in threads:
+        t.join()
+
+    n_rows_master = len(sessions[0][0]) if mode == 'private' else len(sessions[0].df)
+    sessions.clear() # handles are released as they are collected
+    gc.collect()
+    rss_closed = current_rss()
+    return {'master_rows': n_rows_master, 'seconds': seconds, 'open_mb': (rss_open - base) / 2**20,
+            'closed_mb': (rss_closed - base) / 2**20, 'stored': len(store.stats())}
+
+def check_store_race(n_sessions=8):
+    # Sessions opening one upload at the same time parse it once, however the threads interleave
+    import threading
+    from dataset_store import DatasetStore
+
+    store, calls, start = DatasetStore(), [], threading.Barrier(n_sessions)
+    df = pd.DataFrame({'x': range(10)})
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return df, None, None
+
+    acquire = store._acquire
+    def slow_acquire(dataset): # widens the window between the load and taking the reference
+        time.sleep(0.05)
+        return acquire(dataset)
+    store._acquire = slow_acquire
+
+    def session(i):
+        start.wait()
+        time.sleep(0.01 * (i % 3) * 3) # some arrive during the load, some right after it
+        handles.append(store.open('k', load))
+
+    handles = []
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1, f"load() ran {len(calls)} times"
+    assert len(handles) == n_sessions and store._datasets['k'].refs == n_sessions and not store._loading
+
+def bench_sessions(n_rows, session_counts):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    check_store_race()
+    print(f"{n_rows:,} form rows; RSS above the process baseline, each run in a fresh process")
+    print(f"  {'sessions':>8} {'mode':<8} {'open MB':>8} {'MB/session':>11} {'closed MB':>10} {'open s':>7}")
+    for n_sessions in session_counts:
+        for mode in ('private', 'shared'):
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                r = pool.submit(session_rss, mode, n_sessions, n_rows).result()
+            print(f"  {n_sessions:>8} {mode:<8} {r['open_mb']:>8.1f} {r['open_mb'] / n_sessions:>11.1f} "
+                  f"{r['closed_mb']:>10.1f} {r['seconds']:>7.2f}")
+    print(f"  ({r['master_rows']:,} master rows; a closed shared dataset stays in the store until "
+          f"CV_STORE_MAX_MB is exceeded)")
+
+COURSE_CODE_CASES = {
+    "EDUC 330, THEO 201": [('EDUC', '330'), ('THEO', '201')],
+    "EDUC 330/331 Foundations": [('EDUC', '330'), ('EDUC', '331')],
+    "HIST 101 & 102.": [('HIST', '101'), ('HIST', '102')],
+    "PHIL 210, 211 and 212 (cross-listed)": [('PHIL', '210'), ('PHIL', '211'), ('PHIL', '212')],
+    "THEO 101, 100% online": [('THEO', '101')],
+    "ENGL 250 and 300-level seminars": [('ENGL', '250')],
+    "MATH 120, 1000 students": [('MATH', '120')],
+    "no course code": [],
+}
+
+def check_course_codes():
+    # Known answers through both extractions: per answer (Python) and the column scan (Arrow)
+    answers = list(COURSE_CODE_CASES)
+    dept, num, _, _, offsets, counts = data_processor._course_table(np.array(answers, dtype=object))
+    for i, (answer, expected) in enumerate(COURSE_CODE_CASES.items()):
+        assert data_processor.extract_course_codes(answer) == expected, answer
+        scanned = list(zip(dept[offsets[i]:offsets[i] + counts[i]], num[offsets[i]:offsets[i] + counts[i]]))
+        assert scanned == (expected or [('Unknown', 'Unknown')]), (answer, scanned)
+
+def bench_extract(sizes, cross_pct):
+    check_course_codes()
+    rng = np.random.default_rng(0)
+    print(f"{'form rows':>10} {'per-row s':>10} {'scan s':>8} {'speedup':>8} {'codes per-row':>14} {'codes scan':>11}")
+    for n in sizes:
+        df = mapped_form_frame(n)
+        # Cross-listed answers ("EDUC 330/331 ..."), which the per-row search reads as one course
+        cross = rng.random(n) < cross_pct / 100
+        df.loc[cross, 'Course Info'] = df.loc[cross, 'Course Info'].str.replace(
+            data_processor.COURSE_CODE_PATTERN, lambda m: f"{m[1]} {m[2]}/{int(m[2]) + 1}", n=1, regex=True)
+        course, term, virtue = (data_processor.text_column(df, col)
+                                for col in ['Course Info', 'Term(s) offered', 'Cardinal virtues addressed'])
+
+        def per_row():
+            # What the row loop called for every response
+            out = []
+            for c, t, v in zip(course, term, virtue):
+                match = re.search(data_processor.COURSE_CODE_PATTERN, c)
+                row = {'Cardinal virtues addressed': v, 'Term(s) offered': t}
+                out.append((match.groups() if match else None, data_processor.normalize_virtues(v),
+                            data_processor.get_virtual_status(row)))
+            return out
+
+        def scan():
+            virtue_code, virtue_uniques = pd.factorize(virtue)
+            flags = data_processor.scan_flags(virtue_uniques)[virtue_code]
+            term_code, term_uniques = pd.factorize(term)
+            virtual = (flags | data_processor.scan_flags(term_uniques)[term_code]) & data_processor.VIRTUAL_FLAG
+            course_code, course_uniques = pd.factorize(course)
+            dept, num, _, _, offsets, counts = data_processor._course_table(course_uniques)
+            return flags, virtual.astype(bool), dept, num, offsets[course_code], counts[course_code]
+
+        t_row, rows = timed(per_row)
+        t_scan, (flags, virtual, dept, num, first, n_codes) = timed(scan)
+        for i, (code, virtues, delivery) in enumerate(rows):
+            assert virtues == [v for j, v in enumerate(data_processor.VIRTUES) if flags[i] >> j & 1]
+            assert (delivery == 'Virtual') == virtual[i]
+            assert (code or ('Unknown', 'Unknown')) == (dept[first[i]], num[first[i]])
+        found_row = sum(code is not None for code, _, _ in rows)
+        found_scan = int(n_codes[dept[first] != 'Unknown'].sum())
+        print(f"{n:>10,} {t_row:>10.2f} {t_scan:>8.3f} {t_row / t_scan:>7.1f}x {found_row:>14,} {found_scan:>11,}")
+
+def bench_quality(sizes):
+    from quality_index import QualityIndex
+
+    print(f"{'form rows':>10} {'master rows':>12} {'index MB':>9} {'master MB':>10} {'build ms':>9} "
+          f"{'visit scan ms':>14} {'visit index ms':>15} {'speedup':>8}")
+    for n in sizes:
+        df = mapped_form_frame(n).astype(object)
+        norm = data_processor.normalize_form_rows(df)
+        master = data_processor.build_master([data_processor.explode_normalized(norm),
+                                              data_processor.explode_hardcoded_rows()])
+        t_build, quality = timed(QualityIndex.from_normalized, norm, repeat=3)
+
+        def scan():
+            # What the two quality pages did on every visit
+            issues = np.flatnonzero((master['Department'] == 'Unknown') | (master['Term'] == 'Unknown'))
+            return issues, master['Cardinal virtues addressed'].value_counts()
+
+        def index():
+            return quality.log_rows(), quality.tag_table()
+
+        t_scan, (scan_rows, by_row) = timed(scan, repeat=5)
+        quality.log # built once per dataset, like the index itself
+        t_index, (log_rows, by_response) = timed(index, repeat=5)
+        index_mb = (quality.issues.nbytes + quality.tags.nbytes
+                    + quality.answers.memory_usage(deep=True, index=False).sum()) / 2**20
+        master_mb = master.memory_usage(deep=True, index=False).sum() / 2**20
+        print(f"{n:>10,} {len(master):>12,} {index_mb:>9.1f} {master_mb:>10.1f} {t_build * 1000:>9.1f} "
+              f"{t_scan * 1000:>14.2f} {t_index * 1000:>15.2f} {t_scan / t_index:>7.1f}x")
+        print(f"{'':>10} issue rows: {len(scan_rows):,} master rows vs {len(log_rows):,} responses "
+              f"({quality.issue_counts['No virtue (dropped)']:,} dropped responses the scan never saw); "
+              f"Justice: {by_row['Justice']:,} rows vs {by_response.loc['Justice', 'Responses']:,} responses")
+
+def export_peak(fmt, mode, n_rows):
+    """
+    One export run in a fresh process: n_rows master rows (a row selection over master_df)
+    written as fmt, either 'full' (select the rows into a new frame, then pandas' writer) or
+    'chunked' (exports.py). Returns seconds, peak RSS above the pre-export baseline (sampled
+    every 2 ms) and the file size.
+    """
+    import ctypes
+    import gc
+    import os
+    import tempfile
+    import threading
+    import exports
+    from test_pivots import current_rss
+
+    n_form = int(n_rows / 3.4) + 1 # ~3.5 master rows per synthetic response
+    master = data_processor.process_frame(mapped_form_frame(n_form))
+    rows = np.arange(min(n_rows, len(master)))
+    gc.collect()
+    try: # hand the setup's freed heap back, or the export would reuse it unseen
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except OSError:
+        pass
+    base = peak = current_rss()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.002):
+            peak = max(peak, current_rss())
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    t0 = time.perf_counter()
+    if mode == 'full':
+        path = os.path.join(tempfile.mkdtemp(), 'export' + exports.FORMATS[fmt][0])
+        selected = master.iloc[rows]
+        if fmt == 'XLSX':
+            selected.to_excel(path, index=False, engine='xlsxwriter')
+        elif fmt == 'CSV':
+            selected.to_csv(path, index=False)
+        else:
+            selected.to_parquet(path, index=False)
+        size = os.path.getsize(path)
+        os.remove(path)
+    else:
+        f = exports.export_file(fmt, 'export', master, rows)
+        size = os.fstat(f.fileno()).st_size
+        f.close()
+    seconds = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    return {'rows': len(rows), 'seconds': seconds, 'peak_mb': (peak - base) / 2**20, 'file_mb': size / 2**20}
+
+def bench_export(n_rows, formats):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    print(f"export of {n_rows:,} master rows (a row selection); each run in a fresh process")
+    print(f"  {'format':<8} {'mode':<8} {'seconds':>8} {'peak MB':>8} {'file MB':>8}")
+    for fmt in formats:
+        for mode in ('full', 'chunked'):
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                r = pool.submit(export_peak, fmt, mode, n_rows).result()
+            print(f"  {fmt:<8} {mode:<8} {r['seconds']:>8.1f} {r['peak_mb']:>8.1f} {r['file_mb']:>8.1f}")
+    print("  (peak MB: RSS above the process with master_df loaded; 'full' copies the selection into a "
+          "new frame, then writes it with pandas)")
+
+def bench_topk(sizes, k):
+    from pivot_cube import PivotCube, InstructorLoad
+
+    print(f"{'form rows':>10} {'master rows':>12} {'instructors':>12} {'load build ms':>14} "
+          f"{'filter':>8} {'value_counts ms':>16} {'top-k ms':>9} {'speedup':>8}")
+    for n in sizes:
+        df = data_processor.process_frame(mapped_form_frame(n))
+        cube = PivotCube(df)
+        t_build, load = timed(InstructorLoad, cube.counts, repeat=3)
+        virtue, year = load.options('Cardinal virtues addressed')[0], load.options('Academic Year')[0]
+        for name, virtues, years in [('none', [], []), ('virtue', [virtue], []), ('both', [virtue], [year])]:
+            def scan():
+                # What Instructor Load did on every rerun (plus the filters it now offers)
+                rows = df
+                if virtues:
+                    rows = rows[rows['Cardinal virtues addressed'].isin(virtues)]
+                if years:
+                    rows = rows[rows['Academic Year'].isin(years)]
+                top = rows['Instructor name'].value_counts().head(k).index
+                return rows[rows['Instructor name'].isin(top)].pivot_table(
+                    index='Instructor name', columns='Cardinal virtues addressed', values='Course Code',
+                    aggfunc='count', fill_value=0, observed=True)
+
+            t_scan, ref = timed(scan, repeat=3)
+            t_top, got = timed(load.pivot, k, virtues, years, repeat=5)
+            # value_counts leaves ties at the cut unspecified: same totals, then same cells per instructor
+            assert sorted(got.sum(axis=1)) == sorted(ref.sum(axis=1))
+            same = got.index.astype(object).intersection(ref.index.astype(object))
+            assert_same_pivot(got.loc[got.index.astype(object).isin(same), ref.columns],
+                              ref.loc[ref.index.astype(object).isin(same)])
+            print(f"{n:>10,} {len(df):>12,} {len(load.labels[0]):>12,} {t_build * 1000:>14.1f} "
+                  f"{name:>8} {t_scan * 1000:>16.1f} {t_top * 1000:>9.2f} {t_scan / t_top:>7.1f}x")
+
+def bench_jobs(n_rows, n_jobs):
+    import os
+    import tempfile
+    import dataset_cache
+    from dataset_store import DatasetStore
+    import multi_ingest
+    from ingest_jobs import FINISHED, IngestJobs
+    from pivot_cube import DASHBOARD_VIEWS, PivotCube
+    from synthetic_data import write_form_xlsx
+
+    # Another session's rerun meanwhile: every analysis view sliced from a loaded dataset's cube
+    cube = PivotCube(data_processor.process_frame(mapped_form_frame(50_000)))
+
+    def rerun():
+        fresh = PivotCube.from_counts(cube.counts, cube.n_rows)
+        return [fresh.pivot(view) for view in DASHBOARD_VIEWS]
+
+    def reruns_until(done, at_least=1):
+        times = []
+        while not done() or len(times) < at_least:
+            times.append(timed(rerun)[0] * 1000)
+        times.sort()
+        return times[len(times) // 2], times[-1], len(times)
+
+    def wait(*jobs):
+        return lambda: all(job.status in FINISHED for job in jobs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [write_form_xlsx(os.path.join(tmp, f"export_{i}.xlsx"), n_rows, seed=i) for i in range(n_jobs)]
+        print(f"{n_jobs} exports x {n_rows:,} responses, {os.cpu_count()} CPUs; "
+              f"'rerun' = six views sliced from a {cube.n_rows:,}-row cube in another session")
+        p50, worst, _ = reruns_until(lambda: True, at_least=20)
+        print(f"  idle reruns: p50 {p50:.1f} ms, max {worst:.1f} ms")
+
+        dataset_cache.CACHE_DIR = os.path.join(tmp, 'sync') # every phase parses from scratch
+        t_sync, _ = timed(dataset_cache.load_or_process_files, paths[:1])
+        print(f"  synchronous upload: script run blocked {t_sync:.2f}s")
+
+        dataset_cache.CACHE_DIR = os.path.join(tmp, 'jobs')
+        jobs = IngestJobs(DatasetStore(), max_jobs=n_jobs)
+        started = time.perf_counter()
+        t_submit, submitted = timed(lambda: [jobs.submit([path]) for path in paths])
+        p50, worst, n = reruns_until(wait(*submitted))
+        print(f"  {n_jobs} background jobs: submit returned in {t_submit * 1000:.0f} ms, all done in "
+              f"{time.perf_counter() - started:.2f}s; {n} reruns meanwhile, p50 {p50:.1f} ms, max {worst:.1f} ms")
+        for job in submitted:
+            print(f"    job {job.id}: {job.status}, {job.rows:,} master rows, "
+                  f"{job.finished - job.created:.2f}s from submit")
+
+        dataset_cache.CACHE_DIR = os.path.join(tmp, 'cancel')
+        job = IngestJobs(DatasetStore()).submit(paths[:1])
+        while job.done == 0:
+            time.sleep(0.005)
+        cancelled = time.perf_counter()
+        job.cancel()
+        while job.status not in FINISHED:
+            time.sleep(0.005)
+        print(f"  cancel during '{job.stage}' after {job.done:,} rows: {job.status} in "
+              f"{(time.perf_counter() - cancelled) * 1000:.0f} ms")
+
+        # Several files: stops while workbooks are still being parsed, serially or in worker processes
+        for workers in (1, 2) if n_jobs > 1 else ():
+            multi_ingest.MAX_WORKERS = workers
+            dataset_cache.CACHE_DIR = os.path.join(tmp, f'cancel_{workers}')
+            job = IngestJobs(DatasetStore()).submit(paths[:2])
+            while job.stage != 'read':
+                time.sleep(0.005)
+            time.sleep(0.3)
+            cancelled = time.perf_counter()
+            job.cancel()
+            while job.status not in FINISHED:
+                time.sleep(0.005)
+            assert job.status == 'cancelled' and job.done == 0, (job.status, job.done)
+            print(f"  cancel of 2 files with {workers} worker(s) before any finished: "
+                  f"{job.status} in {(time.perf_counter() - cancelled) * 1000:.0f} ms")
+
+        # A finished job nobody follows anymore lets go of its dataset
+        store = DatasetStore()
+        jobs = IngestJobs(store)
+        job = jobs.submit(paths[:1])
+        while job.status not in FINISHED:
+            time.sleep(0.005)
+        jobs.release(job.id)
+        assert jobs.stats() == [] and jobs.get(job.id) is None
+        assert all(row['sessions'] == 0 for row in store.stats())
+
+def current_pss():
+    # Proportional set size: pages shared by several processes are split between them, so the
+    # PSS of all workers adds up to the memory they really use (Linux only)
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+def worker_memory(path, mode, loaded, results):
+    """
+    One server worker process opening the cached master_df at path: 'parsed' converts the
+    whole file to pandas (how entries were read before), 'mapped' maps it (dataset_cache).
+    Every column is read once, as building the cube and the lookup index do. Reports RSS and
+    PSS above the baseline while every worker holds its frame.
+    """
+    import gc
+    import dataset_cache
+    import pyarrow.feather as feather
+    from test_pivots import current_rss
+
+    gc.collect()
+    base_rss, base_pss = current_rss(), current_pss()
+    t0 = time.perf_counter()
+    df = dataset_cache._read_frame(path) if mode == 'mapped' else feather.read_table(path, memory_map=True).to_pandas()
+    seconds = time.perf_counter() - t0
+    for col in df.columns:
+        values = df[col]
+        (values.array.codes if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()).sum()
+    loaded.wait() # every worker holds its frame before any is measured...
+    results.put({'rss': current_rss() - base_rss, 'pss': current_pss() - base_pss, 'seconds': seconds})
+    loaded.wait() # ...and keeps it until all of them are
+
+def bench_workers(n_rows, worker_counts):
+    import multiprocessing
+    import os
+    import tempfile
+    import dataset_cache
+    import pyarrow.feather as feather
+
+    df = data_processor.process_frame(mapped_form_frame(n_rows))
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'parsed': os.path.join(tmp, 'parsed.feather'), 'mapped': os.path.join(tmp, 'mapped.feather')}
+        feather.write_feather(df, paths['parsed'], compression='uncompressed')
+        dataset_cache._write_frame(df, paths['mapped'])
+        print(f"{n_rows:,} form rows -> {len(df):,} master rows ({df.memory_usage(deep=True).sum() / 2**20:.1f} MB in "
+              f"pandas); cache entry {os.path.getsize(paths['mapped']) / 2**20:.1f} MB mapped, "
+              f"{os.path.getsize(paths['parsed']) / 2**20:.1f} MB as plain Feather")
+        print(f"  {'workers':>7} {'mode':<7} {'load ms':>8} {'RSS MB/worker':>14} {'PSS MB total':>13}")
+        for n_workers in worker_counts:
+            for mode in ('parsed', 'mapped'):
+                loaded, results = ctx.Barrier(n_workers), ctx.Queue()
+                workers = [ctx.Process(target=worker_memory, args=(paths[mode], mode, loaded, results))
+                           for _ in range(n_workers)]
+                for w in workers:
+                    w.start()
+                out = [results.get() for _ in workers]
+                for w in workers:
+                    w.join()
+                print(f"  {n_workers:>7} {mode:<7} {max(r['seconds'] for r in out) * 1000:>8.1f} "
+                      f"{sum(r['rss'] for r in out) / n_workers / 2**20:>14.1f} "
+                      f"{sum(r['pss'] for r in out) / 2**20:>13.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cardinal Virtues dashboard benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('ingest', help="columnar process_frame vs the legacy iterrows loop")
+    p.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    p.add_argument('--legacy-limit', type=int, default=1_000_000,
+                   help="skip the (slow) legacy loop above this many rows")
+
+    p = sub.add_parser('schema', help="master_df bytes/row and dashboard pivot timings, plain vs categorical")
+    p.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+
+    p = sub.add_parser('cube', help="per-view pivot_table vs slicing the precomputed PivotCube")
+    p.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+
+    p = sub.add_parser('terms', help="term-expression throughput on repetitive and adversarial answers")
+    p.add_argument('--strings', type=int, default=200_000)
+
+    p = sub.add_parser('lookup', help="Course Lookup filters: copy + isin chain vs the inverted index")
+    p.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+
+    p = sub.add_parser('paging', help="st.dataframe payload: full frame vs one server-side page")
+    p.add_argument('--master-rows', type=int, default=500_000)
+    p.add_argument('--page-size', type=int, default=50)
+
+    p = sub.add_parser('incremental', help="re-ingest of an updated export: full vs delta-only")
+    p.add_argument('--rows', type=int, default=500_000)
+    p.add_argument('--change-pct', type=float, nargs='+', default=[0.1, 1, 10])
+
+    p = sub.add_parser('multi', help="parallel multi-file ingest: wall time by worker count")
+    p.add_argument('--files', type=int, default=8)
+    p.add_argument('--rows', type=int, default=20_000)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+
+    p = sub.add_parser('charts', help="Vega-Lite payload and spec build time, full melt vs capped + cached")
+    p.add_argument('--rows', type=int, default=100_000)
+
+    p = sub.add_parser('engines', help="the six views and lookup/catalog filters, pandas vs polars query engine")
+    p.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+
+    p = sub.add_parser('startup', help="app.py first-run and rerun script time, landing page and a few pages")
+    p.add_argument('--rows', type=int, default=20_000, help="form rows behind the dashboard pages (0: landing only)")
+    p.add_argument('--reruns', type=int, default=20)
+    p.add_argument('--processes', type=int, default=3, help="fresh interpreters; first-run times are their median")
+
+    p = sub.add_parser('sessions', help="load test: RSS of N concurrent sessions on one export, private vs shared store")
+    p.add_argument('--rows', type=int, default=200_000)
+    p.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16])
+
+    p = sub.add_parser('extract', help="course code / virtue / virtual extraction: per-row functions vs one scan")
+    p.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    p.add_argument('--cross-listed', type=float, default=5, help="percent of answers naming two courses")
+
+    p = sub.add_parser('quality', help="quality pages: master_df scan per visit vs the precomputed quality index")
+    p.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+
+    p = sub.add_parser('export', help="XLSX/CSV/Parquet download of a row selection: full copy vs chunked writers")
+    p.add_argument('--rows', type=int, default=1_000_000, help="master rows exported")
+    p.add_argument('--formats', nargs='+', default=['CSV', 'Parquet', 'XLSX'], choices=['CSV', 'Parquet', 'XLSX'])
+
+    p = sub.add_parser('topk', help="Instructor Load: value_counts + isin per rerun vs the per-instructor aggregates")
+    p.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 300_000])
+    p.add_argument('-k', type=int, default=20)
+
+    p = sub.add_parser('jobs', help="upload ingest: blocking script run vs background jobs polled by the page")
+    p.add_argument('--rows', type=int, default=50_000)
+    p.add_argument('--jobs', type=int, default=2)
+
+    p = sub.add_parser('workers', help="RSS/PSS of N server processes holding the cached master_df, parsed vs mapped")
+    p.add_argument('--rows', type=int, default=300_000)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+
+    args = parser.parse_args()
+    if args.command == 'ingest':
+        bench_ingest(args.rows, args.legacy_limit)
+    elif args.command == 'schema':
+        bench_schema(args.rows)
+    elif args.command == 'cube':
+        bench_cube(args.rows)
+    elif args.command == 'terms':
+        bench_terms(args.strings)
+    elif args.command == 'lookup':
+        bench_lookup(args.rows)
+    elif args.command == 'paging':
+        bench_paging(args.master_rows, args.page_size)
+    elif args.command == 'incremental':
+        bench_incremental(args.rows, args.change_pct)
+    elif args.command == 'multi':
+        bench_multi(args.files, args.rows, args.workers)
+    elif args.command == 'charts':
+        bench_charts(args.rows)
+    elif args.command == 'engines':
+        bench_engines(args.rows)
+    elif args.command == 'startup':
+        bench_startup(args.rows, args.reruns, args.processes)
+    elif args.command == 'sessions':
+        bench_sessions(args.rows, args.sessions)
+    elif args.command == 'extract':
+        bench_extract(args.rows, args.cross_listed)
+    elif args.command == 'quality':
+        bench_quality(args.rows)
+    elif args.command == 'export':
+        bench_export(args.rows, args.formats)
+    elif args.command == 'topk':
+        bench_topk(args.rows, args.k)
+    elif args.command == 'jobs':
+        bench_jobs(args.rows, args.jobs)
+    elif args.command == 'workers':
+        bench_workers(args.rows, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# --- CONFIGURATION ---
+# Charts show at most MAX_CHART_ROWS index values and MAX_CHART_SERIES column values;
+# the rest are summed into an "Other" bucket. Six series = one colour each in CHART_COLORS.
+MAX_CHART_ROWS = 20
+MAX_CHART_SERIES = 6
+OTHER = "Other"
+CHART_TYPES = ["Bar", "Line", "Area", "Heatmap"]
+
+# Custom Color Scale: Purple, Light Green, Gray shades
+CHART_COLORS = ['#9b59b6', '#2ecc71', '#95a5a6', '#8e44ad', '#27ae60', '#7f8c8d']
+
+# Bars and heatmap cells with a zero count draw nothing, so those rows are not shipped;
+# lines and areas need them to drop to zero instead of interpolating across the gap.
+SKIP_ZEROS = {"Bar", "Heatmap"}
+
+# --- CHART DATA ---
+
+def cap_categories(pivot, max_rows=MAX_CHART_ROWS, max_cols=MAX_CHART_SERIES):
+    """
+    Keep the max_rows index values and max_cols columns with the largest totals (in their
+    original order) and sum the others into an "Other" row / column.
+    """
+    pivot = pivot.copy()
+    pivot.index = pivot.index.astype(object)
+    pivot.columns = pivot.columns.astype(object)
+    if len(pivot.index) > max_rows:
+        keep = pivot.sum(axis=1).sort_values(ascending=False, kind='stable').index[:max_rows]
+        rest = pivot.drop(index=keep).sum(axis=0)
+        pivot = pivot.loc[pivot.index.isin(keep)]
+        pivot.loc[OTHER] = rest
+    if len(pivot.columns) > max_cols:
+        keep = pivot.sum(axis=0).sort_values(ascending=False, kind='stable').index[:max_cols]
+        rest = pivot.drop(columns=keep).sum(axis=1)
+        pivot = pivot.loc[:, pivot.columns.isin(keep)]
+        pivot[OTHER] = rest
+    return pivot
+
+def chart_frame(pivot, chart_type):
+    """Long form of the capped pivot: one pre-aggregated (index, Category, Count) row per cell."""
+    capped = cap_categories(pivot)
+    index_name = pivot.index.name
+    long = (capped.rename_axis(index=index_name, columns='Category')
+            .stack().rename('Count').reset_index())
+    if chart_type in SKIP_ZEROS:
+        long = long[long['Count'] != 0]
+    return long
+
+# --- SPECS ---
+
+def build_spec(pivot, index_col, columns_col, chart_type):
+    """Vega-Lite spec (dict, data inlined) for one view's pivot in the given chart type."""
+    import altair as alt # ~0.25s to import; only paid once a chart is drawn
+
+    melted = chart_frame(pivot, chart_type)
+    primary_dim = index_col     # e.g., Academic Year
+    secondary_dim = 'Category'  # e.g., Semester/Virtue
+    custom_colors = alt.Scale(range=CHART_COLORS)
+    # Keep the pivot's own order (years, semesters...) rather than Vega's alphabetical sort
+    x_order = list(melted[primary_dim].drop_duplicates())
+
+    # Chart Logic
+    if chart_type == "Bar":
+        # Grouped Bar Chart (Cleaner, Single Axis, No Overflow)
+        chart = alt.Chart(melted).mark_bar().encode(
+            x=alt.X(primary_dim, title=index_col, sort=x_order, axis=alt.Axis(labelAngle=0)),
+            y=alt.Y('Count', title='Count'),
+            xOffset=alt.XOffset(secondary_dim),
+            color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
+            tooltip=[primary_dim, secondary_dim, 'Count']
+        ).properties(
+            height=500 # Strict match to table
+        ).interactive()
+
+    elif chart_type == "Line":
+        chart = alt.Chart(melted).mark_line(point=True).encode(
+            x=alt.X(primary_dim, title=index_col, sort=x_order),
+            y=alt.Y('Count', title='Count'),
+            color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
+            tooltip=[primary_dim, secondary_dim, 'Count']
+        ).properties(height=500).interactive()
+
+    elif chart_type == "Area":
+        chart = alt.Chart(melted).mark_area(opacity=0.6).encode(
+            x=alt.X(primary_dim, title=index_col, sort=x_order),
+            y=alt.Y('Count', title='Count', stack=None),
+            color=alt.Color(secondary_dim, title=columns_col, scale=custom_colors),
+            tooltip=[primary_dim, secondary_dim, 'Count']
+        ).properties(height=500).interactive()
+
+    elif chart_type == "Heatmap":
+        chart = alt.Chart(melted).mark_rect().encode(
+            x=alt.X(primary_dim, title=index_col, sort=x_order),
+            y=alt.Y(secondary_dim, title=columns_col),
+            color=alt.Color('Count', title='Count'),
+            tooltip=[primary_dim, secondary_dim, 'Count']
+        ).properties(height=500).interactive()
+
+    else:
+        raise ValueError(f"Unknown chart type: {chart_type}")
+
+    return chart.to_dict()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import time
+
+import artifacts
+import multi_ingest
+
+# --- HEADLESS BATCH RUN ---
+# Ingest one or more form exports and write every dashboard table without a browser:
+#   python cli.py exports/*.xlsx --out reports
+# The app picks the output up from CV_ARTIFACTS_DIR (default ./reports) on its landing page.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Cardinal Virtues dashboard tables from form exports")
+    parser.add_argument('exports', nargs='+', help="Course Designation Form .xlsx exports")
+    parser.add_argument('--out', default=artifacts.ARTIFACTS_DIR, help="output directory (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None, help="parallel workbook parsers (default: one per CPU)")
+    parser.add_argument('--no-xlsx', action='store_true', help="only write Parquet")
+    args = parser.parse_args(argv)
+
+    sources = []
+    for path in args.exports:
+        with open(path, 'rb') as f:
+            sources.append((os.path.basename(path), f.read()))
+
+    start = time.perf_counter()
+    state, report = multi_ingest.process_files(sources, max_workers=args.workers)
+    for r in report:
+        print(f"  {r['file']}: {r['rows']:,} responses, {r['duplicates']:,} duplicates, "
+              f"{r['master_rows']:,} master rows ({r['seconds']:.2f}s)")
+    print(f"Ingested {len(state.master_df):,} master rows in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    manifest = artifacts.write_artifacts(state, args.out, sources=sources, report=report, xlsx=not args.no_xlsx)
+    written = [manifest['master'], manifest['cube'], manifest['quality']] + list(manifest['tables'].values())
+    if manifest['xlsx']:
+        written.append(manifest['xlsx'])
+    print(f"Wrote {len(written)} files to {args.out} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
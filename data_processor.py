@@ -1,78 +1,125 @@
+import functools
+import hashlib
+import json
+import os
+import time
 import pandas as pd
 import re
 import numpy as np
+from pandas.api.types import union_categoricals
+
+from instrumentation import record, span, traced
 
 # --- CONFIGURATION ---
-AY_MAPPING = {
-    'Fall 2025': 'AY 25',
-    'J-Term 2026': 'AY 25',
-    'Spring 2026': 'AY 25',
-    'Summer 2026': 'AY 25',
-    
-    'Fall 2026': 'AY 26',
-    'J-Term 2027': 'AY 26',
-    'Spring 2027': 'AY 26',
-    'Summer 2027': 'AY 26',
-    
-    'Fall 2027': 'AY 27',
-    'Spring 2027': 'AY 26', # Duplicate, handled by AY 26 logic above
-    # Add more as needed or use logic
-    # User rule: "Fall 2025 is mapped to AY 25 not add to 26"
-}
+# Academic years run Fall -> Summer and are named after the Fall year:
+# Fall 2025, J-Term 2026, Spring 2026 and Summer 2026 are all "AY 25".
+# User rule: "Fall 2025 is mapped to AY 25 not add to 26"
+SEASONS = ['Fall', 'J-Term', 'Spring', 'Summer']
+
+# Terms the dashboard plans for ("Every Semester" expands inside this window)
+TERM_WINDOW = (2025, 2027)
+
+def academic_year(season, year):
+    start = year if season == 'Fall' else year - 1
+    return f"AY {start % 100:02d}"
+
+def window_terms(min_year, max_year):
+    # Every term from Fall <min_year> up to the last term of <max_year>, in calendar order
+    terms = []
+    for start in range(min_year, max_year + 1):
+        for season in SEASONS:
+            year = start if season == 'Fall' else start + 1
+            if year <= max_year:
+                terms.append((f"{season} {year}", academic_year(season, year)))
+    return terms
+
+AY_MAPPING = dict(window_terms(*TERM_WINDOW))
 
 VIRTUES = ['Justice', 'Prudence', 'Temperance', 'Fortitude']
 
+# Bump whenever parsing/normalization changes the master data for the same input,
+# so persisted caches (dataset_cache.py) are not reused across the change.
+PARSER_VERSION = 5
+
 # --- HARDCODED DATA INJECTION ---
-# "Justice and Prudence EDUC210 Fall and Spring, usually taught by Muffet Trout"
-# "Justice and Fortitude EDUC 329 Fall and Spring, usually taught by Chelda Smith"
-# "Fortitude: EDUC 370... all in fall"
-# "Fortitude: EDUC 330/332 normally fall and spring. But not fall 2026."
+# Courses that run whatever the form says (EDUC 210/329, the Fortitude group, EDUC 330/332)
+# come from a rules table, one line per course; see the header of hardcoded_courses.csv.
+# It is compiled once into exploded master rows and recompiled only when the file changes.
+HARDCODED_RULES = os.environ.get(
+    'CV_HARDCODED_RULES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hardcoded_courses.csv')
+)
+RULE_COLUMNS = ['Department', 'Course Number', 'Course Title', 'Virtues', 'Terms', 'Except', 'Instructor', 'Virtual']
 
-def get_hardcoded_courses():
+def hardcoded_rules_version(path=None):
+    """(path, mtime, size) of the rules file: the cache key of everything compiled from it."""
+    path = os.path.abspath(HARDCODED_RULES if path is None else path)
+    info = os.stat(path)
+    return (path, info.st_mtime_ns, info.st_size)
+
+def _rule_list(cell):
+    return [part.strip() for part in cell.split(';') if part.strip()]
+
+def _rule_terms(text, expand):
+    # "Fall 2026" is that one term; anything else ("every fall and spring") is read like a
+    # form answer. (The form parser alone would take "fall 2026" as "all" -> every Fall.)
+    explicit = TERM_PATTERN.findall(text.lower())
+    if explicit:
+        return [_term_label(season, year) for season, year in explicit]
+    return list(expand(text))
+
+@functools.lru_cache(maxsize=4)
+@traced('hardcoded courses: compile')
+def _compile_hardcoded(version):
+    # -> (one row per course x term, the same exploded to one row per virtue in MASTER_COLUMNS)
+    path = version[0]
+    rules = pd.read_csv(path, comment='#', dtype=str, keep_default_na=False, skipinitialspace=True)
+    missing = [col for col in RULE_COLUMNS if col not in rules.columns]
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+
+    expand = parse_terms()
     rows = []
-    
-    # helper
-    def add(dept, num, title, virt_str, term_list, instr, virtual=False):
-        for term, ay in term_list:
+    for rule in rules.to_dict('records'):
+        dept, num = rule['Department'].strip(), rule['Course Number'].strip()
+        virtues = _rule_list(rule['Virtues'])
+        if not virtues or any(v not in VIRTUES for v in virtues):
+            raise ValueError(f"{path}: {dept} {num}: virtues must be among {', '.join(VIRTUES)}")
+        # Term expressions in listed order, minus the exceptions (read the same way)
+        excluded = {term for text in _rule_list(rule['Except']) for term in _rule_terms(text, expand)}
+        terms = []
+        for text in _rule_list(rule['Terms']):
+            terms.extend(t for t in _rule_terms(text, expand) if t not in excluded and t not in terms)
+        if not terms:
+            raise ValueError(f"{path}: {dept} {num}: no terms left")
+        virtual = rule['Virtual'].strip().lower() in ('yes', 'y', 'true', '1')
+        for term, ay in terms:
             rows.append({
                 'Course Code': f"{dept} {num}",
                 'Department': dept,
                 'Course Number': num,
-                'Course Title': title,
+                'Course Title': rule['Course Title'].strip(),
                 'Section': 'All',
-                'Instructor name': instr,
-                'Cardinal virtues addressed': virt_str,
+                'Instructor name': rule['Instructor'].strip(),
+                'Cardinal virtues addressed': ';'.join(virtues),
                 'Term': term,
                 'Academic Year': ay,
                 'DeliveryMode': 'Virtual' if virtual else 'Not marked',
                 'Hardcoded': True
             })
+    courses = pd.DataFrame(rows)
 
-    # EDUC 210
-    terms_210 = [('Fall 2025', 'AY 25'), ('Spring 2026', 'AY 25'), ('Fall 2026', 'AY 26'), ('Spring 2027', 'AY 26')]
-    add('EDUC', '210', 'Introduction to Education', 'Justice;Prudence', terms_210, 'Muffet Trout')
-
-    # EDUC 329
-    terms_329 = [('Fall 2025', 'AY 25'), ('Spring 2026', 'AY 25'), ('Fall 2026', 'AY 26'), ('Spring 2027', 'AY 26')]
-    add('EDUC', '329', 'Equitable Schools', 'Justice;Fortitude', terms_329, 'Chelda Smith')
-
-    # Fortitude Group: 370, 371, 372, 373, 316, 317, 318, 319, 380 (All in Fall)
-    fort_courses = [
-        ('370', 'Kaback'), ('371', 'D. Monson'), ('372', 'M. Trout'), ('373', 'M. Trout'),
-        ('316', 'E. Gullickson'), ('317', 'E. Gullickson'), ('318', 'TBD'), ('319', 'TBD'), ('380', 'TBD')
-    ]
-    terms_fall_only = [('Fall 2025', 'AY 25'), ('Fall 2026', 'AY 26')]
-    for num, instr in fort_courses:
-        add('EDUC', num, 'Fortitude Special', 'Fortitude', terms_fall_only, instr)
+    # Normalize to the master schema: one row per virtue, compact dtypes for build_master
+    exploded = courses.assign(**{'Cardinal virtues addressed': courses['Cardinal virtues addressed'].str.split(';')})
+    exploded = exploded.explode('Cardinal virtues addressed', ignore_index=True)
+    exploded['Source'] = 'Hardcoded'
+    exploded['Semester'] = exploded['Term'].str.partition(' ')[0]
+    exploded = exploded[MASTER_COLUMNS].astype({col: 'category' for col in MASTER_COLUMNS if col != 'Hardcoded'})
+    return courses, exploded
 
-    # EDUC 330/332: Fall and Spring normally. BUT NOT Fall 2026.
-    # J-Term 2027 is Study Abroad.
-    # Terms: Fall 2025 (Yes), Spring 2026 (Yes), Fall 2026 (NO), Spring 2027 (Yes), J-Term 2027 (Yes)
-    terms_330 = [('Fall 2025', 'AY 25'), ('Spring 2026', 'AY 25'), ('Spring 2027', 'AY 26'), ('J-Term 2027', 'AY 26')]
-    add('EDUC', '330', 'Clinical Practice', 'Fortitude', terms_330, 'Muffet Trout')
-    add('EDUC', '332', 'Clinical Practice II', 'Fortitude', terms_330, 'Muffet Trout')
-
-    return pd.DataFrame(rows)
+def get_hardcoded_courses():
+    # Shallow copies: under copy-on-write callers can't change the cached frames
+    return _compile_hardcoded(hardcoded_rules_version())[0].copy(deep=False)
 
 # --- PARSING FUNCTIONS ---
 
@@ -96,160 +143,496 @@ def get_virtual_status(row):
         return 'Virtual'
     return 'Not marked'
 
-def parse_terms(min_year=2025, max_year=2027):
+# --- TERM EXPRESSIONS ---
+# Form answers repeat heavily ("Every Semester", "Fall 2025, Spring 2026"), so each distinct
+# lowercased answer is parsed once and memoized.
+
+TERM_PATTERN = re.compile(r'(fall|spring|summer|j-term)\s*(\d{4}|\d{2})')
+TERM_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=None)
+def _term_label(season, year):
+    # ('spring', '26') -> ('Spring 2026', 'AY 25')
+    year = int('20' + year if len(year) == 2 else year)
+    season = season.title()
+    return (f"{season} {year}", academic_year(season, year))
+
+@functools.lru_cache(maxsize=None)
+def _repeat_defaults(min_year, max_year):
+    # Fall and Spring of every academic year that finishes inside the window
+    defaults = []
+    for start in range(min_year, max_year):
+        defaults.append((f"Fall {start}", academic_year('Fall', start)))
+        defaults.append((f"Spring {start + 1}", academic_year('Spring', start + 1)))
+    return tuple(defaults)
+
+@functools.lru_cache(maxsize=TERM_CACHE_SIZE)
+def _expand_terms(text, min_year, max_year):
+    # Explicit mentions (e.g. Fall 2025, Spring 26); the academic year comes from the season rule,
+    # so terms outside the window are kept instead of dropped
+    results = [_term_label(season, year) for season, year in TERM_PATTERN.findall(text)]
+
+    # "Every Semester" / "Each Term" logic (plain substring checks, so "fall" also counts as "all")
+    if 'every' in text or 'each' in text or 'all' in text:
+        defaults = _repeat_defaults(min_year, max_year)
+        # If specific seasons mentioned? e.g. "Every Fall"
+        if 'fall' in text and 'spring' not in text:
+            defaults = [d for d in defaults if d[0].startswith('Fall')]
+        elif 'spring' in text and 'fall' not in text:
+            defaults = [d for d in defaults if d[0].startswith('Spring')]
+
+        # Avoid dupes if regex found them too
+        existing_terms = {r[0] for r in results}
+        results.extend(d for d in defaults if d[0] not in existing_terms)
+
+    return tuple(results)
+
+def parse_terms(min_year=TERM_WINDOW[0], max_year=TERM_WINDOW[1]):
     # Logic to translate "Every Semester" etc.
-    # Returns list of dicts: {'Term': 'Fall 2025', 'Academic Year': 'AY 25', 'Semester': 'Fall'}
-    
+    # Returns expand(text) -> tuple of (term, academic year), e.g. (('Fall 2025', 'AY 25'),)
+    # The tuple is shared through the memo, so it must not be modified.
+
     def expand(text):
-        if not isinstance(text, str): return []
-        text = text.lower()
-        
-        results = []
-        
-        # Explicit mentions
-        # Regex for Season + Year (e.g. Fall 2025, Spring 26)
-        matches = re.findall(r'(fall|spring|summer|j-term)\s*(\d{4}|\d{2})', text)
-        for season, year in matches:
-            if len(year) == 2: year = '20' + year
-            term_str = f"{season.title()} {year}"
-            
-            # Map valid ones
-            if term_str in AY_MAPPING:
-                results.append((term_str, AY_MAPPING[term_str]))
-            elif '2025' in term_str and 'fall' in season: # Fall 2025 -> AY 25 explicit hook if missed
-                 results.append((term_str, 'AY 25'))
-        
-        # "Every Semester" / "Each Term" logic
-        if 'every' in text or 'each' in text or 'all' in text:
-            # Generate defaults for the window
-            # Limit to AY 25 and AY 26 for now as requested range
-            defaults = [
-                ('Fall 2025', 'AY 25'),
-                ('Spring 2026', 'AY 25'),
-                ('Fall 2026', 'AY 26'),
-                ('Spring 2027', 'AY 26')
-            ]
-            # If specific seasons mentioned? e.g. "Every Fall"
-            if 'fall' in text and 'spring' not in text:
-                defaults = [x for x in defaults if 'Fall' in x[0]]
-            elif 'spring' in text and 'fall' not in text:
-                defaults = [x for x in defaults if 'Spring' in x[0]]
-                
-            # Avoid dupes if regex found them too
-            existing_terms = {r[0] for r in results}
-            for d in defaults:
-                if d[0] not in existing_terms:
-                    results.append(d)
-                    
-        return results
+        if not isinstance(text, str): return ()
+        return _expand_terms(text.lower(), min_year, max_year)
 
     return expand
 
-def process_file(uploaded_file):
-    # Load
-    df = pd.read_excel(uploaded_file, engine='openpyxl')
-    
+def term_parser_stats():
+    info = _expand_terms.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': info.hits / lookups if lookups else 0.0,
+        'cached': info.currsize,
+    }
+
+# --- INGEST ---
+
+STREAM_BATCH_ROWS = 5000 # form rows per batch in streaming mode
+
+MASTER_COLUMNS = [
+    'Source', 'Course Code', 'Department', 'Course Number', 'Course Title', 'Section',
+    'Instructor name', 'Cardinal virtues addressed', 'Term', 'Academic Year',
+    'DeliveryMode', 'Semester', 'Hardcoded'
+]
+
+def map_columns(columns):
     # Rename columns to standard keys
     # Map based on keyword search
     col_map = {}
-    for c in df.columns:
+    for c in columns:
         if 'Start' in c: col_map[c] = 'Start'
         elif 'Instructor' in c: col_map[c] = 'Instructor name'
         elif 'Course department' in c: col_map[c] = 'Course Info'
         elif 'Term' in c: col_map[c] = 'Term(s) offered'
         elif 'virtues' in c: col_map[c] = 'Cardinal virtues addressed'
-    
-    df = df.rename(columns=col_map)
-    
-    # Pre-cleaning
-    processed_rows = []
-    term_expander = parse_terms()
-    
-    # 1. Process FORM Entries
-    for idx, row in df.iterrows():
-        # Parsing Logic
-        raw_course = str(row.get('Course Info', ''))
-        raw_term = str(row.get('Term(s) offered', ''))
-        virtue_str = str(row.get('Cardinal virtues addressed', ''))
-        instructor = str(row.get('Instructor name', ''))
-        
-        # Virtues
-        virtues = normalize_virtues(virtue_str)
-        if not virtues: continue # Skip if no virtue? Or keep as 'None'? Keep as 'None' for audit? 
-        # User wants pivot by Virtue, so maybe explode virtues too.
-        
-        # Virtual check
-        delivery = get_virtual_status(row)
-        
-        # Terms
-        terms = term_expander(raw_term)
-        if not terms:
-            terms = [('Unknown', 'Unknown')]
-            
-        # Course Code Extraction (Simple Regex)
-        # Look for "DEPT 123"
-        course_match = re.search(r'([A-Z]{3,4})\s*-?(\d{3})', raw_course)
-        if course_match:
-            dept = course_match.group(1)
-            num = course_match.group(2)
-            code = f"{dept} {num}"
+    return col_map
+
+def read_form(uploaded_file):
+    with span('read_excel') as s:
+        df = pd.read_excel(uploaded_file, engine='openpyxl')
+        s.set(rows=len(df))
+    return df.rename(columns=map_columns(df.columns))
+
+def _header_names(header):
+    # Same column labels read_excel would give: blanks -> "Unnamed: i", repeats -> "name.1"
+    names, seen = [], {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else name
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
         else:
-            dept = 'Unknown'
-            num = 'Unknown'
-            code = raw_course[:20] + '...'
-            
-        # Explode time!
-        # Multi-level explode: Terms x Virtues
-        for v in virtues:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def iter_form_batches(uploaded_file, batch_size=STREAM_BATCH_ROWS):
+    """
+    Read the first sheet in read-only mode and yield (mapped batch, rows_read, total_rows).
+    total_rows comes from the sheet dimension and is None when the file doesn't record it.
+    """
+    import openpyxl # deferred: the dashboard imports this module before any upload
+
+    with span('read: open workbook'):
+        wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        total_rows = ws.max_row - 1 if ws.max_row else None
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header_names(header)
+        col_map = map_columns(columns)
+        columns = [col_map.get(c, c) for c in columns]
+        width = len(columns)
+
+        rows_read = 0
+        batch = []
+        started = time.perf_counter()
+        for values in rows:
+            # Short rows are padded; empty cells become NaN like read_excel
+            values = [np.nan if v is None else v for v in values[:width]]
+            values += [np.nan] * (width - len(values))
+            batch.append(values)
+            if len(batch) == batch_size:
+                rows_read += len(batch)
+                record('read: batch', started, rows=len(batch)) # time spent by the consumer is excluded
+                yield pd.DataFrame(batch, columns=columns, dtype=object), rows_read, total_rows
+                batch = []
+                started = time.perf_counter()
+        if batch:
+            rows_read += len(batch)
+            record('read: batch', started, rows=len(batch))
+            yield pd.DataFrame(batch, columns=columns, dtype=object), rows_read, total_rows
+    finally:
+        wb.close()
+
+def _take(values, indexer):
+    return pd.Categorical(np.asarray(values, dtype=object)).take(indexer)
+
+# --- TEXT EXTRACTION ---
+# Answers repeat heavily, so each column is factorized and every distinct answer is scanned
+# once with one compiled pattern (regex alternation), instead of one substring test per
+# virtue / flag over every row.
+
+COURSE_CODE_PATTERN = r'([A-Z]{3,4})\s*-?(\d{3})'
+# A code plus any cross-listed numbers after it: "EDUC 330/332", "HIST 101 & 102". A cross-listed
+# number must end there, so "THEO 101, 100% online" or "a 200-level course" add no code.
+CROSS_LISTED_PATTERN = r'(?P<cross>(?:\s*(?:[/,&]|\band\b)(?:\s*and\b)?\s*\d{3}{end})*)'
+CROSS_END = r'(?=[\s/,&);.:]|$)(?![.,]\d)'
+COURSE_CODES = re.compile(r'(?P<dept>[A-Z]{3,4})\s*-?(?P<num>\d{3})'
+                          + CROSS_LISTED_PATTERN.replace('{end}', CROSS_END))
+CROSS_LISTED = re.compile(r'\d{3}')
+# The same patterns for pyarrow's RE2 automaton, which scans a whole column per call. RE2's \s
+# is narrower than Python's, so it spells out what Python's \s matches in ASCII text;
+# non-ASCII answers take the Python path. RE2 has no lookahead either: its cross-listing only
+# ends at a word boundary, which can flag more answers, and extract_course_codes re-reads those.
+ASCII_SPACE = r'[\t-\r\x1c-\x1f ]'
+ARROW_COURSE_CODES = (r'(?P<dept>[A-Z]{3,4})\s*-?(?P<num>\d{3})'
+                      + CROSS_LISTED_PATTERN.replace('{end}', r'\b')).replace(r'\s', ASCII_SPACE)
+ARROW_COURSE_CODE = COURSE_CODE_PATTERN.replace(r'\s', ASCII_SPACE)
+
+# Same substring rule as normalize_virtues / get_virtual_status, all in one scan
+FLAG_WORDS = [v.lower() for v in VIRTUES] + ['virtual']
+FLAG_SCAN = re.compile('|'.join(map(re.escape, FLAG_WORDS)))
+FLAG_BITS = {word: 1 << i for i, word in enumerate(FLAG_WORDS)}
+FLAG_BITS_ARRAY = np.array([FLAG_BITS[word] for word in FLAG_WORDS], dtype=np.uint8)
+VIRTUE_FLAGS = (1 << len(VIRTUES)) - 1
+VIRTUAL_FLAG = FLAG_BITS['virtual']
+
+# Data-quality issue bits of each form response, recorded by normalize_form_rows (see quality_index.py)
+UNPARSED_COURSE = 1 # no course code in the course answer: Department/Course Number are Unknown
+UNKNOWN_TERM = 2 # no term in the term answer: Term is Unknown
+NO_VIRTUE = 4 # no virtue named: the response is dropped
+YEAR_OUT_OF_RANGE = 8 # an explicit term outside TERM_WINDOW
+VIRTUAL_DETECTED = 16 # delivery mode set to Virtual
+
+def scan_flags(answers):
+    """uint8 bit set per answer: bit j for VIRTUES[j] (case-insensitive substring), then 'virtual'."""
+    flags = np.zeros(len(answers), dtype=np.uint8)
+    for i, text in enumerate(answers):
+        bits = 0
+        for word in FLAG_SCAN.findall(text.lower()):
+            bits |= FLAG_BITS[word]
+        flags[i] = bits
+    return flags
+
+def extract_course_codes(text):
+    """Every (dept, number) in an answer, in order and without repeats; cross-listed numbers keep the dept."""
+    codes = []
+    for match in COURSE_CODES.finditer(text):
+        dept = match.group(1)
+        for num in [match.group(2)] + CROSS_LISTED.findall(match.group(3)):
+            if (dept, num) not in codes:
+                codes.append((dept, num))
+    return codes
+
+def _first_course_codes(answers):
+    # -> (dept or None, num, has_more) of every answer's first code; has_more marks answers
+    # that need extract_course_codes (several codes, or not checked here)
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError: # pandas' per-answer regex
+        text = pd.Series(answers, dtype=object)
+        first = text.str.extract(COURSE_CODES)
+        has_more = first['cross'].fillna('').ne('').to_numpy() | (text.str.count(COURSE_CODE_PATTERN).to_numpy() > 1)
+        dept = first['dept'].to_numpy(dtype=object, copy=True)
+        dept[first['dept'].isna().to_numpy()] = None
+        return dept, first['num'].to_numpy(dtype=object), has_more
+
+    arr = pa.array(answers, type=pa.string())
+    first = pc.extract_regex(arr, ARROW_COURSE_CODES)
+    has_more = (pc.fill_null(pc.not_equal(first.field('cross'), ''), False).to_numpy(zero_copy_only=False)
+                | (pc.count_substring_regex(arr, ARROW_COURSE_CODE).to_numpy(zero_copy_only=False) > 1)
+                | ~pc.string_is_ascii(arr).to_numpy(zero_copy_only=False))
+    dept = first.field('dept').to_numpy(zero_copy_only=False)
+    dept[first.is_null().to_numpy(zero_copy_only=False)] = None
+    return dept, first.field('num').to_numpy(zero_copy_only=False), has_more
+
+def _course_table(answers):
+    # One entry per (distinct answer, course code); answers without a code get one Unknown entry.
+    # Returns the flat dept/num/code/title arrays plus offsets/counts per answer.
+    answers = np.asarray(answers, dtype=object)
+    first_dept, first_num, has_more = _first_course_codes(answers)
+    several = np.flatnonzero(has_more)
+    found = [extract_course_codes(answers[i]) for i in several]
+
+    counts = np.ones(len(answers), dtype=np.int64)
+    counts[several] = [max(len(codes), 1) for codes in found]
+    offsets = np.cumsum(counts) - counts
+    dept = np.repeat(first_dept.astype(object), counts)
+    num = np.repeat(first_num.astype(object), counts)
+    for i, codes in zip(several, found):
+        dept[offsets[i]:offsets[i] + counts[i]] = [d for d, _ in codes] or [None]
+        num[offsets[i]:offsets[i] + counts[i]] = [n for _, n in codes] or [None]
+    matched = pd.notna(dept)
+    dept[~matched] = 'Unknown'
+    num[~matched] = 'Unknown'
+    title = np.repeat(answers, counts) # Keep full string as title for now
+    code = np.where(matched, dept + ' ' + num,
+                    np.repeat(np.array([text[:20] + '...' for text in answers], dtype=object), counts))
+    return dept, num, code, title, offsets, counts
+
+def text_column(df, col):
+    # Same coercion the old row loop did with str(row.get(col, '')):
+    # missing column -> '', NaN -> 'nan', numbers/dates -> their str()
+    if col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[col].astype(object).map(str)
+
+def _expand_term_table(raw_terms, term_expander):
+    # Term answers repeat heavily, so expand each distinct answer once.
+    # Returns per-row codes plus a flat (term, ay) table with offsets/counts per code,
+    # and the scan_flags of each distinct answer.
+    codes, uniques = pd.factorize(raw_terms)
+    names, ays, counts = [], [], []
+    with span('normalize: terms', rows=len(raw_terms), unique=len(uniques)):
+        for text in uniques:
+            terms = term_expander(text) or [('Unknown', 'Unknown')]
+            counts.append(len(terms))
             for term_name, ay in terms:
-                processed_rows.append({
-                    'Source': 'Form',
-                    'Course Code': code,
-                    'Department': dept,
-                    'Course Number': num,
-                    'Course Title': raw_course, # Keep full string as title for now
-                    'Section': 'See Info',
-                    'Instructor name': instructor,
-                    'Cardinal virtues addressed': v, # Single virtue per row
-                    'Term': term_name,
-                    'Academic Year': ay,
-                    'DeliveryMode': delivery,
-                    'Semester': term_name.split(' ')[0] if ' ' in term_name else term_name,
-                    'Hardcoded': False
-                })
-
-    # 2. Inject Hardcoded
-    hard_df = get_hardcoded_courses()
-    # Normalize hardcoded to match schema
-    for idx, row in hard_df.iterrows():
-        virtues = row['Cardinal virtues addressed'].split(';')
-        for v in virtues:
-            processed_rows.append({
-                'Source': 'Hardcoded',
-                'Course Code': row['Course Code'],
-                'Department': row['Department'],
-                'Course Number': row['Course Number'],
-                'Course Title': row['Course Title'],
-                'Section': row['Section'],
-                'Instructor name': row['Instructor name'],
-                'Cardinal virtues addressed': v,
-                'Term': row['Term'],
-                'Academic Year': row['Academic Year'],
-                'DeliveryMode': row['DeliveryMode'],
-                'Semester': row['Term'].split(' ')[0],
-                'Hardcoded': True
-            })
+                names.append(term_name)
+                ays.append(ay)
+    counts = np.array(counts, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return codes, np.array(names, dtype=object), np.array(ays, dtype=object), offsets, counts, scan_flags(uniques)
+
+@traced('normalize', rows=lambda norm: len(norm['rows']))
+def normalize_form_rows(df):
+    """
+    Per-answer normalization of (already column-mapped) form rows: virtue matrix, delivery
+    mode, course code parts and term expansion, each computed once per distinct answer.
+    Returns the pieces explode_normalized needs, as a dict of arrays, plus the quality bits
+    ('issues'), virtue bits ('tags') and text answers ('answers') of every row of df, dropped
+    ones included.
+    """
+    raw_course = text_column(df, 'Course Info')
+    raw_term = text_column(df, 'Term(s) offered')
+    virtue_str = text_column(df, 'Cardinal virtues addressed')
+    instructor = text_column(df, 'Instructor name')
+    answers = {'Course Info': raw_course, 'Term(s) offered': raw_term,
+               'Cardinal virtues addressed': virtue_str, 'Instructor name': instructor}
+
+    # Virtues and the virtual flag: one scan per distinct answer (see scan_flags)
+    with span('normalize: scan', rows=len(df)):
+        virtue_code, virtue_uniques = pd.factorize(virtue_str)
+        flags = scan_flags(virtue_uniques)[virtue_code]
+
+    # Skip rows with no virtue; they only show up in the quality bits
+    tags = flags & VIRTUE_FLAGS
+    issues = np.where(tags == 0, NO_VIRTUE, 0).astype(np.uint8)
+    kept = np.flatnonzero(tags)
+
+    # Course codes, once per distinct answer. An answer naming several courses
+    # ("EDUC 330/332") counts for each of them: its row is repeated once per code.
+    course_answer, course_uniques = pd.factorize(raw_course.to_numpy()[kept])
+    dept, num, code, title, course_offsets, course_counts = _course_table(course_uniques)
+    issues[kept[dept[course_offsets][course_answer] == 'Unknown']] |= UNPARSED_COURSE
+    n_codes = course_counts[course_answer]
+    rows = np.repeat(kept, n_codes)
+    course_code = (np.arange(len(rows)) - np.repeat(np.cumsum(n_codes) - n_codes, n_codes)
+                   + np.repeat(course_offsets[course_answer], n_codes))
+
+    flags = flags[rows]
+    hits = (flags[:, None] & FLAG_BITS_ARRAY[:len(VIRTUES)]).astype(bool)
+    raw_term = raw_term.iloc[rows].reset_index(drop=True)
+    instructor = instructor.iloc[rows].reset_index(drop=True)
+
+    # Terms
+    term_code, term_names, term_ays, term_offsets, term_counts, term_flags = _expand_term_table(raw_term, parse_terms())
+    # Virtual check (see get_virtual_status): either answer mentions it
+    is_virtual = ((flags | term_flags[term_code]) & VIRTUAL_FLAG).astype(bool)
+    delivery = np.where(is_virtual, 'Virtual', 'Not marked').astype(object)
+    semesters = np.array([t.split(' ')[0] if ' ' in t else t for t in term_names], dtype=object)
 
-    # Final DataFrame
-    master_df = pd.DataFrame(processed_rows)
-    return master_df
+    # Quality bits that depend on the term answer, once per distinct answer; the repeats of a
+    # row all carry the same answers, so scattering them back by row is unambiguous
+    term_issues = np.where(term_names[term_offsets] == 'Unknown', UNKNOWN_TERM, 0).astype(np.uint8)
+    if len(term_names):
+        outside = ~np.isin(term_names, list(AY_MAPPING) + ['Unknown'])
+        term_issues[np.logical_or.reduceat(outside, term_offsets)] |= YEAR_OUT_OF_RANGE
+    issues[rows] |= term_issues[term_code] | np.where(is_virtual, VIRTUAL_DETECTED, 0).astype(np.uint8)
+
+    instructor_code, instructor_uniques = pd.factorize(instructor)
+    return {
+        'rows': rows, 'hits': hits, 'delivery': delivery,
+        'course_code': course_code, 'code': code, 'dept': dept, 'num': num, 'title': title,
+        'instructor_code': instructor_code, 'instructors': instructor_uniques,
+        'term_code': term_code, 'term_names': term_names, 'term_ays': term_ays,
+        'term_offsets': term_offsets, 'term_counts': term_counts, 'semesters': semesters,
+        'issues': issues, 'tags': tags, 'answers': answers,
+    }
+
+@traced('explode', rows=lambda out: len(out[0] if isinstance(out, tuple) else out))
+def explode_normalized(norm, with_source=False):
+    """One master record per virtue x term of each normalized row (see explode_form_rows)."""
+    # Explode time! Row-major nonzero keeps the old loop order: row -> virtue -> term
+    row_idx, virtue_idx = np.nonzero(norm['hits'])
+    n_terms = norm['term_counts'][norm['term_code'][row_idx]]
+    out_row = np.repeat(row_idx, n_terms)
+    pair_start = np.repeat(np.cumsum(n_terms) - n_terms, n_terms)
+    out_term = (np.arange(len(out_row)) - pair_start
+                + np.repeat(norm['term_offsets'][norm['term_code'][row_idx]], n_terms))
+
+    # Columns are built as categoricals over the small per-answer arrays,
+    # so the exploded rows are never materialized as strings
+    out_course = norm['course_code'][out_row]
+    n_out = len(out_row)
+    exploded = pd.DataFrame({
+        'Source': _take(['Form'], np.zeros(n_out, dtype=np.intp)),
+        'Course Code': _take(norm['code'], out_course),
+        'Department': _take(norm['dept'], out_course),
+        'Course Number': _take(norm['num'], out_course),
+        'Course Title': _take(norm['title'], out_course), # Keep full string as title for now
+        'Section': _take(['See Info'], np.zeros(n_out, dtype=np.intp)),
+        'Instructor name': _take(norm['instructors'], norm['instructor_code'][out_row]),
+        'Cardinal virtues addressed': _take(VIRTUES, np.repeat(virtue_idx, n_terms)),
+        'Term': _take(norm['term_names'], out_term),
+        'Academic Year': _take(norm['term_ays'], out_term),
+        'DeliveryMode': _take(norm['delivery'], out_row),
+        'Semester': _take(norm['semesters'], out_term),
+        'Hardcoded': np.zeros(n_out, dtype=bool)
+    }, columns=MASTER_COLUMNS)
+    if with_source:
+        return exploded, norm['rows'][out_row]
+    return exploded
+
+def explode_form_rows(df, with_source=False):
+    """
+    Normalize (already column-mapped) form rows into one record per virtue x term.
+    with_source=True also returns, for every output row, the position of its form row in df.
+    """
+    return explode_normalized(normalize_form_rows(df), with_source)
+
+def explode_hardcoded_rows():
+    return _compile_hardcoded(hardcoded_rules_version())[1].copy(deep=False)
+
+# --- MASTER SCHEMA ---
+# Every text column repeats once per virtue x term row, so master_df stores them as
+# categoricals. Category lists are sorted so pivots/sorts keep the old string order.
+# The sets below are fixed; course codes, titles and instructors are data-derived.
+
+SOURCES = ['Form', 'Hardcoded']
+DELIVERY_MODES = ['Not marked', 'Virtual']
+SEMESTERS = ['Fall', 'J-Term', 'Spring', 'Summer', 'Unknown']
+
+def term_categories():
+    return sorted(set(AY_MAPPING) | {'Unknown'})
+
+def academic_year_categories():
+    return sorted(set(AY_MAPPING.values()) | {'Unknown'})
+
+def fixed_categories():
+    return {
+        'Source': SOURCES,
+        'Cardinal virtues addressed': VIRTUES,
+        'Term': term_categories(),
+        'Academic Year': academic_year_categories(),
+        'DeliveryMode': DELIVERY_MODES,
+        'Semester': SEMESTERS,
+    }
+
+def _merge_categories(observed, fixed=None):
+    # Fixed category sets are extended with any unexpected value rather than turning it into NaN
+    if fixed is None:
+        return sorted(observed)
+    return sorted(set(fixed) | set(observed))
+
+@traced('build_master', rows=len)
+def build_master(parts):
+    """Concatenate exploded chunks into master_df with the compact dtypes used by the dashboard."""
+    fixed = fixed_categories()
+    parts = [p for p in parts if len(p)]
+    out = {}
+    for col in MASTER_COLUMNS:
+        if not parts:
+            # Nothing exploded (e.g. an update whose new responses name no virtue): same schema, no rows
+            out[col] = (np.array([], dtype=bool) if col == 'Hardcoded'
+                        else pd.Categorical([], categories=_merge_categories([], fixed.get(col))))
+        elif col == 'Hardcoded':
+            out[col] = np.concatenate([p[col].to_numpy(dtype=bool) for p in parts])
+        else:
+            # Course codes, titles, instructors...: interned as data-derived categories
+            merged = union_categoricals([p[col].astype('category').array for p in parts])
+            # Slices of an earlier master (incremental updates) still carry retracted values
+            used = np.bincount(merged.codes[merged.codes >= 0], minlength=len(merged.categories)) > 0
+            out[col] = merged.set_categories(_merge_categories(merged.categories[used], fixed.get(col)))
+    return pd.DataFrame(out, columns=MASTER_COLUMNS)
+
+def process_frame(df):
+    # 1. Process FORM Entries, 2. Inject Hardcoded
+    return build_master([explode_form_rows(df), explode_hardcoded_rows()])
+
+def iter_process_file(uploaded_file, batch_size=STREAM_BATCH_ROWS):
+    """
+    Streaming ingest: yields (master_df chunk, rows_read, total_rows) per batch of form rows,
+    then the hardcoded rows as the last chunk. Only one batch of raw rows is held at a time.
+    """
+    rows_read, total_rows = 0, None
+    for batch, rows_read, total_rows in iter_form_batches(uploaded_file, batch_size):
+        yield explode_form_rows(batch), rows_read, total_rows
+    yield explode_hardcoded_rows(), rows_read, total_rows
+
+@traced('process_file', rows=len)
+def process_file(uploaded_file, streaming=False, progress=None):
+    # progress(rows_read, total_rows) is called after each batch in streaming mode
+    if not streaming:
+        return process_frame(read_form(uploaded_file))
+
+    chunks = []
+    for chunk, rows_read, total_rows in iter_process_file(uploaded_file):
+        if len(chunk):
+            chunks.append(chunk)
+        if progress is not None:
+            progress(rows_read, total_rows)
+    return build_master(chunks)
+
+# --- RULES FINGERPRINT ---
+
+def rules_fingerprint():
+    # Anything that changes what process_file emits for the same bytes belongs here.
+    # The rules are module constants plus the hardcoded-courses file, so it is computed
+    # once per version of that file. Keys cache entries (dataset_cache) and batch artifacts.
+    return _rules_fingerprint(hardcoded_rules_version())
+
+@functools.lru_cache(maxsize=4)
+def _rules_fingerprint(hardcoded_version):
+    rules = {
+        'parser_version': PARSER_VERSION,
+        'ay_mapping': AY_MAPPING,
+        'virtues': VIRTUES,
+        'columns': MASTER_COLUMNS,
+        'hardcoded': get_hardcoded_courses().to_dict('records'),
+    }
+    payload = json.dumps(rules, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
 
 if __name__ == "__main__":
-    # Test run
-    try:
-        df = process_file(r'c:\Users\hoang\Class_Attributes_Data\Course designation form--Cardinal Virtues (Four Pillars Project) - Copy.xlsx')
-        print(f"Success! Generated {len(df)} rows.")
-        print(df.head())
-        df.to_csv('debug_master_data.csv', index=False)
-    except Exception as e:
-        print(f"Error: {e}")
+    # Headless runs go through the batch CLI: python cli.py <exports...> --out reports
+    import cli
+    raise SystemExit(cli.main())
@@ -0,0 +1,299 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import data_processor
+import multi_ingest
+from data_processor import rules_fingerprint
+from incremental import IngestState
+from quality_index import QualityIndex
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError: # pickle fallback below
+    pa = None
+
+# --- CONFIGURATION ---
+# Processed master data is stored per (upload bytes, parsing rules) so a restarted
+# server or a recycled worker reads it back instead of re-parsing the workbook.
+CACHE_DIR = os.environ.get(
+    'CV_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'master')
+)
+CACHE_MAX_BYTES = int(float(os.environ.get('CV_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+
+# Feather v2 is the Arrow IPC file format: entries are memory-mapped by every server process
+# that reads them (see _read_frame), so workers behind a load balancer share one copy
+EXTENSION = '.feather' if pa is not None else '.pkl'
+LAYOUT_KEY = b'cv_layout' # schema metadata of entries written by _write_frame
+KEYS_EXTENSION = '.keys.npz' # source row keys (incremental updates) and quality index of each entry
+QUALITY_PREFIX = 'quality_' # QualityIndex.to_arrays() names in that file
+
+# --- KEYS ---
+
+def read_bytes(uploaded_file):
+    # Streamlit UploadedFile, any file-like object, or a path
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    if hasattr(uploaded_file, 'read'):
+        return uploaded_file.read()
+    with open(uploaded_file, 'rb') as f:
+        return f.read()
+
+def content_key(raw_bytes):
+    digest = hashlib.sha256(raw_bytes)
+    digest.update(rules_fingerprint().encode('ascii'))
+    return digest.hexdigest()
+
+def files_key(files):
+    """Key of a set of exports [(name, raw bytes)] in upload order; a single file keys as itself."""
+    if len(files) == 1:
+        return content_key(files[0][1])
+    return content_key(b''.join(hashlib.sha256(raw_bytes).digest() for _, raw_bytes in files))
+
+def uploads_key(uploaded_files):
+    """Key load_or_process_files keeps these exports under, without reading the cache."""
+    uploaded_files = list(uploaded_files)
+    if len(uploaded_files) == 1:
+        return content_key(read_bytes(uploaded_files[0]))
+    return files_key([(getattr(f, 'name', str(f)), read_bytes(f)) for f in uploaded_files])
+
+# --- STORE ---
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key + EXTENSION)
+
+def _keys_path(key):
+    return os.path.join(CACHE_DIR, key + KEYS_EXTENSION)
+
+def _write_frame(df, path):
+    """
+    df as an uncompressed Arrow IPC file laid out to be mapped: categoricals as dictionary
+    columns over their own codes and categories, booleans as bytes (Arrow packs them into
+    bits, which would be unpacked on every read).
+    """
+    columns, bools = {}, []
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            columns[col] = pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0),
+                                                          pa.array(values.cat.categories))
+        elif values.dtype == bool:
+            bools.append(col)
+            columns[col] = pa.array(values.to_numpy().view(np.uint8))
+        else:
+            columns[col] = pa.array(values.to_numpy())
+    # One record batch, written even when empty so the categories are kept
+    batch = pa.RecordBatch.from_pydict(columns).replace_schema_metadata({LAYOUT_KEY: json.dumps({'bools': bools})})
+    with ipc.new_file(path, batch.schema) as writer:
+        writer.write_batch(batch)
+
+def _categories(dictionary):
+    if pa.types.is_string(dictionary.type) or pa.types.is_large_string(dictionary.type):
+        return pd.Index(pd.array(dictionary, dtype='str')) # wraps the mapped strings
+    return pd.Index(dictionary.to_pandas())
+
+def _read_frame(path):
+    """
+    DataFrame over the memory-mapped file: the codes, category strings and booleans are
+    read-only views of it, nothing is parsed or copied per row, and the pages are shared
+    with every process mapping the same entry. Writing to the frame in place raises;
+    sessions get shallow copies (DatasetHandle), which copy-on-write makes private first.
+    """
+    reader = ipc.open_file(pa.memory_map(path))
+    layout = (reader.schema.metadata or {}).get(LAYOUT_KEY)
+    if layout is None:
+        return reader.read_pandas() # an entry written as plain Feather by an older version
+    bools = json.loads(layout)['bools']
+    batch = reader.get_batch(0)
+    columns = {}
+    for col in batch.schema.names:
+        values = batch.column(col)
+        if pa.types.is_dictionary(values.type):
+            indices = values.indices
+            # Missing values are nulls in Arrow and code -1 in pandas: only then is a column copied
+            codes = indices.fill_null(-1) if indices.null_count else indices
+            columns[col] = pd.Categorical.from_codes(codes.to_numpy(zero_copy_only=True), validate=False,
+                                                     dtype=pd.CategoricalDtype(_categories(values.dictionary)))
+        elif col in bools:
+            columns[col] = values.to_numpy(zero_copy_only=True).view(bool)
+        else:
+            columns[col] = values.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+def load(key):
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        if pa is not None:
+            df = _read_frame(path)
+        else:
+            with open(path, 'rb') as f:
+                df = pickle.load(f)
+    except Exception:
+        # Truncated or unreadable entry: drop it and re-process
+        _remove(path)
+        _remove(_keys_path(key))
+        return None
+    os.utime(path) # mark as recently used for LRU eviction
+    return df
+
+def _load_keys(key, wanted=None):
+    # {name: array} of an entry's keys file (only names with wanted(name), if given),
+    # or None if it is missing, unreadable or was written under other parsing rules
+    try:
+        with np.load(_keys_path(key)) as keys:
+            if str(keys['rules']) != rules_fingerprint():
+                return None # kept rows would carry the old parsing rules
+            return {name: keys[name] for name in keys.files if wanted is None or wanted(name)}
+    except Exception:
+        return None
+
+def _quality(arrays):
+    quality = {name[len(QUALITY_PREFIX):]: values for name, values in arrays.items() if name.startswith(QUALITY_PREFIX)}
+    return QualityIndex.from_arrays(quality) if quality else None
+
+def load_quality(key):
+    """QualityIndex of an entry, or None if it has none."""
+    arrays = _load_keys(key, lambda name: name.startswith(QUALITY_PREFIX))
+    return None if arrays is None else _quality(arrays)
+
+def load_state(key):
+    """IngestState of an entry, or None if it has no usable row keys or quality index."""
+    arrays = _load_keys(key)
+    quality = None if arrays is None else _quality(arrays)
+    if quality is None:
+        return None
+    df = load(key)
+    return None if df is None else IngestState(df, arrays['row_keys'], arrays['source_keys'], quality=quality)
+
+def store(key, df, state=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if state is not None:
+        # Written first: an entry is only picked as an update base once its frame exists
+        tmp_path = f"{_keys_path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                quality = {QUALITY_PREFIX + name: values for name, values in state.quality.to_arrays().items()}
+                np.savez(f, row_keys=state.row_keys, source_keys=state.source_keys, rules=rules_fingerprint(),
+                         **quality)
+            os.replace(tmp_path, _keys_path(key))
+        finally:
+            _remove(tmp_path)
+
+    path = _path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if pa is not None:
+            _write_frame(df, tmp_path)
+        else:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path) # atomic, so concurrent readers never see half a file
+    finally:
+        _remove(tmp_path)
+    evict()
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(EXTENSION):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            continue
+        keys_path = _keys_path(name[:-len(EXTENSION)])
+        size = info.st_size + (os.path.getsize(keys_path) if os.path.exists(keys_path) else 0)
+        entries.append((info.st_mtime, size, path, keys_path))
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, keys_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        _remove(keys_path)
+        total -= size
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# --- ENTRY POINT ---
+
+def _stored(key, state):
+    # The freshly parsed master_df is written once and served from the mapped entry, like in
+    # every other process, so the parsed copy is freed once the caller drops the state
+    try:
+        store(key, state.master_df, state)
+    except OSError:
+        return state.master_df # read-only or full disk: still serve the freshly parsed data
+    df = load(key)
+    return state.master_df if df is None else df
+
+def load_or_process(uploaded_file, progress=None, base_key=None, stage=None, partial=None):
+    """
+    process_file with a persistent cache keyed by content hash + rules fingerprint.
+
+    On a miss the export is parsed in full, or, given the base_key of the dataset it updates
+    (app_state.apply_update), applied as an incremental update to that entry so only responses
+    that are new since then get parsed; stage and partial are passed on to IngestState.update.
+    Unrelated uploads are never diffed against another entry: their row order would then
+    depend on what was opened before.
+    Returns (key, master_df, QualityIndex, IngestDelta against base_key); the delta is None
+    on a cache hit, without a base_key and when the base has no stored state (evicted, never
+    written), in which case the export was parsed in full.
+    """
+    raw_bytes = read_bytes(uploaded_file)
+    key = content_key(raw_bytes)
+
+    quality = load_quality(key)
+    df = None if quality is None else load(key)
+    if df is not None:
+        return key, df, quality, None
+
+    base = load_state(base_key) if base_key else None
+    batches = data_processor.iter_form_batches(io.BytesIO(raw_bytes), data_processor.STREAM_BATCH_ROWS)
+    state, delta = (base or IngestState.empty()).update(batches, progress=progress, stage=stage, partial=partial)
+    return key, _stored(key, state), state.quality, None if base is None else delta
+
+def load_or_process_files(uploaded_files, progress=None, stage=None, partial=None, check=None):
+    """
+    Several exports merged into one master_df (see multi_ingest), cached like a single file
+    under a key over all of their contents in upload order. A single file goes through
+    load_or_process. progress is called with (rows_read, total_rows) for a single file and
+    (files_done, n_files) otherwise; stage(name) and partial(n_rows, virtue_counts) as the
+    ingest goes (see IngestState.update); check() while several files are parsed
+    (see multi_ingest.process_files).
+    Returns (key, master_df, QualityIndex, per-file report or None for a single file / cache hit).
+    """
+    uploaded_files = list(uploaded_files)
+    if len(uploaded_files) == 1:
+        key, df, quality, _ = load_or_process(uploaded_files[0], progress=progress, stage=stage, partial=partial)
+        return key, df, quality, None
+
+    files = [(getattr(f, 'name', str(f)), read_bytes(f)) for f in uploaded_files]
+    key = files_key(files)
+    quality = load_quality(key)
+    df = None if quality is None else load(key)
+    if df is not None:
+        return key, df, quality, None
+
+    state, report = multi_ingest.process_files(files, progress=progress, stage=stage, partial=partial,
+                                               check=check)
+    return key, _stored(key, state), state.quality, report
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# --- CONFIGURATION ---
+# One store per server process (see app_state.get_store): every browser session that shows
+# the same export shares one master_df, its pivot cube, query engine and chart specs.
+# Datasets no session holds stay around for a quick re-open until they exceed the budget.
+STORE_MAX_BYTES = int(float(os.environ.get('CV_STORE_MAX_MB', '2048')) * 1024 * 1024)
+
+
+class Dataset:
+    """One loaded export and everything derived from it, shared read-only between sessions."""
+
+    def __init__(self, key, df, report=None, cube=None, quality=None):
+        self.key = key
+        self.df = df
+        self.report = report
+        self.cube = cube
+        self.quality = quality # quality_index.QualityIndex of the responses behind df
+        self.engine = None
+        self.chart_specs = {}
+        self.nbytes = int(df.memory_usage(deep=True, index=False).sum())
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self._lock = threading.RLock() # the cube builds the engine, under the same lock
+
+    def derive(self, attr, build):
+        """self.<attr>, built once by whichever session asks first while the others wait."""
+        with self._lock:
+            if getattr(self, attr) is None:
+                setattr(self, attr, build())
+            return getattr(self, attr)
+
+
+class DatasetHandle:
+    """
+    What a session keeps in st.session_state. Closing it, or the session state being garbage
+    collected when the browser session ends, gives the store its reference back.
+    """
+
+    def __init__(self, store, dataset):
+        self.dataset = dataset
+        self.key = dataset.key
+        # Shallow copy: no data is copied, and under copy-on-write (pandas 3) anything a page
+        # slices or writes to stays private to the session instead of changing the shared frame
+        self.df = dataset.df.copy(deep=False)
+        self._finalizer = weakref.finalize(self, store._release, dataset.key)
+
+    def close(self):
+        self._finalizer()
+
+
+class DatasetStore:
+    """Reference-counted datasets keyed by content hash (dataset_cache.files_key), LRU-evicted."""
+
+    def __init__(self, max_bytes=STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._datasets = OrderedDict() # least recently used first
+        self._loading = {} # key -> lock, so sessions racing on one upload parse it once
+        self._lock = threading.Lock()
+
+    def open(self, key, load=None):
+        """
+        Handle on the dataset stored under key, or None if there is none and no load.
+        On a miss load() -> (master_df, report, quality index) runs once; concurrent callers
+        for the same key wait for it instead of loading their own copy.
+        """
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                if load is None:
+                    return None
+                key_lock = self._loading.setdefault(key, threading.Lock())
+        if dataset is None:
+            with key_lock:
+                try:
+                    with self._lock:
+                        dataset = self._datasets.get(key)
+                    if dataset is None:
+                        df, report, quality = load()
+                        # Stored before the key lock is let go: callers waiting on it, or
+                        # arriving right after, find it instead of loading again
+                        with self._lock:
+                            dataset = self._datasets.setdefault(key, Dataset(key, df, report, quality=quality))
+                finally:
+                    # Also when load() fails, so the next caller retries with a fresh lock
+                    with self._lock:
+                        self._loading.pop(key, None)
+        return self._acquire(dataset)
+
+    def add(self, key, df, report=None, cube=None, quality=None):
+        """Handle on df under key; if key is already stored the stored copy wins and df is dropped."""
+        with self._lock:
+            dataset = self._datasets.get(key)
+        return self._acquire(dataset or Dataset(key, df, report, cube, quality))
+
+    def _acquire(self, dataset):
+        with self._lock:
+            # An unused entry can be evicted between lookup and here: put it back
+            dataset = self._datasets.setdefault(dataset.key, dataset)
+            dataset.refs += 1
+            dataset.last_used = time.monotonic()
+            self._datasets.move_to_end(dataset.key)
+            self._evict()
+        return DatasetHandle(self, dataset)
+
+    def _release(self, key):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                return
+            dataset.refs = max(dataset.refs - 1, 0)
+            dataset.last_used = time.monotonic()
+            self._datasets.move_to_end(key)
+            self._evict()
+
+    def _evict(self, max_bytes=None):
+        # Least recently used first; datasets a session still holds are never dropped
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = sum(d.nbytes for d in self._datasets.values())
+        for key in [k for k, d in self._datasets.items() if d.refs == 0]:
+            if total <= max_bytes:
+                break
+            total -= self._datasets.pop(key).nbytes
+
+    def evict(self, max_bytes=None):
+        """Drop unused datasets until the store fits in max_bytes (default: its budget)."""
+        with self._lock:
+            self._evict(max_bytes)
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(d.nbytes for d in self._datasets.values())
+
+    def stats(self):
+        """One row per stored dataset, most recently used first (for the Diagnostics page)."""
+        now = time.monotonic()
+        with self._lock:
+            datasets = list(self._datasets.values())[::-1]
+        return [{
+            'dataset': d.key[:12],
+            'rows': len(d.df),
+            'MB': round(d.nbytes / 2**20, 1),
+            'sessions': d.refs,
+            'idle s': 0.0 if d.refs else round(now - d.last_used, 1),
+        } for d in datasets]
@@ -0,0 +1,151 @@
+import os
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+# Downloads (table_view.export_buttons) and the batch report (artifacts.py) are written chunk
+# by chunk straight from a frame and a row selection: the frame is never copied up front and
+# only one chunk of cells is materialized at a time.
+EXPORT_CHUNK_ROWS = int(os.environ.get('CV_EXPORT_CHUNK_ROWS', '50000'))
+XLSX_MAX_ROWS = 1_048_576 # per worksheet, header included
+SHEET_NAME_MAX = 31
+
+# format -> (file extension, MIME type)
+FORMATS = {
+    'XLSX': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV': ('.csv', 'text/csv'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# --- TABLES ---
+
+def slug(name):
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+def sheet_name(name):
+    # Excel forbids []:*?/\ in sheet names and caps them at 31 characters
+    return re.sub(r'[\[\]:*?/\\]', ' -', name)[:SHEET_NAME_MAX]
+
+def flat(table):
+    # Parquet/Excel want plain string labels; pivots carry categorical indexes
+    table = table.reset_index() if table.index.name is not None else table.reset_index(drop=True)
+    table.columns = [str(c) for c in table.columns]
+    return table
+
+def iter_chunks(df, rows=None, columns=None, chunk_rows=EXPORT_CHUNK_ROWS, decode=False):
+    """
+    df restricted to the row positions `rows` (default: all) and `columns`, chunk_rows at a
+    time. decode=True gives categorical columns as their plain values, looked up in a
+    category array built once instead of once per chunk.
+    """
+    # Column projection is free under copy-on-write; only each chunk's rows are copied
+    view = df if columns is None else df[list(columns)]
+    values = {}
+    if decode:
+        for col in view.columns:
+            if isinstance(view[col].dtype, pd.CategoricalDtype):
+                # Trailing None: code -1 (missing) picks it
+                values[col] = np.append(np.asarray(view[col].cat.categories, dtype=object), None)
+    n_rows = len(df) if rows is None else len(rows)
+    for start in range(0, max(n_rows, 1), chunk_rows): # an empty selection is one empty chunk
+        stop = min(start + chunk_rows, n_rows)
+        chunk = view.iloc[start:stop] if rows is None else view.iloc[rows[start:stop]]
+        if values:
+            chunk = chunk.assign(**{col: cats[chunk[col].cat.codes.to_numpy()] for col, cats in values.items()})
+        yield chunk
+
+def _cells(col):
+    # Python scalars for xlsxwriter; missing values become blank cells
+    values = col.tolist()
+    if col.hasnans:
+        values = [None if pd.isna(v) else v for v in values]
+    return values
+
+def _unify(schema):
+    # Chunks of a categorical differ in dictionary index width: one width for every row group
+    import pyarrow as pa
+    return pa.schema([f.with_type(pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+                      for f in schema])
+
+# --- WRITE ---
+
+def write_csv(path, df, rows=None, columns=None):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(iter_chunks(df, rows, columns, decode=True)):
+            chunk.to_csv(f, header=i == 0, index=False)
+
+def write_parquet(path, df, rows=None, columns=None):
+    """One row group per chunk; categoricals stay dictionary-encoded (and read back as categoricals)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_chunks(df, rows, columns):
+            # Only the categories this chunk uses go into its dictionary
+            chunk = chunk.apply(lambda col: col.cat.remove_unused_categories()
+                                if isinstance(col.dtype, pd.CategoricalDtype) else col)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = _unify(table.schema)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_xlsx(path, sheets):
+    """
+    sheets: [(name, df, rows, columns)], written in constant_memory mode (row by row, flushed
+    as it goes). A sheet over Excel's row limit continues on "<name> (2)", "<name> (3)"...
+    """
+    import xlsxwriter
+
+    # Answers are free text: never turned into formulas or hyperlinks
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_formulas': False,
+                                          'strings_to_urls': False})
+    try:
+        header_format = workbook.add_format({'bold': True})
+
+        def add_sheet(name, part, columns):
+            suffix = "" if part == 1 else f" ({part})"
+            sheet = workbook.add_worksheet(sheet_name(name)[:SHEET_NAME_MAX - len(suffix)] + suffix)
+            sheet.write_row(0, 0, columns, header_format)
+            sheet.freeze_panes(1, 0)
+            return sheet
+
+        for name, df, rows, columns in sheets:
+            columns = list(df.columns) if columns is None else list(columns)
+            part, r = 1, 1
+            sheet = add_sheet(name, part, columns)
+            for chunk in iter_chunks(df, rows, columns, decode=True):
+                for values in zip(*(_cells(chunk[c]) for c in columns)):
+                    if r == XLSX_MAX_ROWS:
+                        part, r = part + 1, 1
+                        sheet = add_sheet(name, part, columns)
+                    sheet.write_row(r, 0, values)
+                    r += 1
+    finally:
+        workbook.close()
+
+def export_file(fmt, name, df, rows=None, columns=None):
+    """
+    df (rows/columns selected as in iter_chunks) written as fmt to a temporary file on disk.
+    Returns it opened for reading; the file is already unlinked, so closing it frees the space.
+    """
+    fd, path = tempfile.mkstemp(suffix=FORMATS[fmt][0])
+    os.close(fd)
+    try:
+        if fmt == 'XLSX':
+            write_xlsx(path, [(name, df, rows, columns)])
+        elif fmt == 'CSV':
+            write_csv(path, df, rows, columns)
+        else:
+            write_parquet(path, df, rows, columns)
+        f = open(path, 'rb')
+    finally:
+        os.remove(path)
+    return f
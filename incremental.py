@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+import data_processor
+from instrumentation import traced
+from quality_index import QualityIndex
+
+# --- CONFIGURATION ---
+# The raw answers that decide every exploded row of a form response. Two responses with the
+# same values here produce the same master rows, whatever else the export carries.
+FINGERPRINT_COLUMNS = ['Course Info', 'Term(s) offered', 'Cardinal virtues addressed', 'Instructor name']
+
+NO_KEYS = np.array([], dtype=np.uint64)
+
+# --- ROW KEYS ---
+
+def row_fingerprints(df):
+    """uint64 hash of the FINGERPRINT_COLUMNS answers of every (column-mapped) form row."""
+    # Raw cells are hashed as read; only stability matters, not text_column's coercion
+    answers = pd.DataFrame({col: df[col] if col in df.columns else '' for col in FINGERPRINT_COLUMNS},
+                           index=df.index)
+    return pd.util.hash_pandas_object(answers, index=False).to_numpy()
+
+
+class KeyAssigner:
+    """
+    Turns fingerprints into source row keys across a stream of batches. The key also hashes
+    the occurrence number of the fingerprint (1st, 2nd... identical response), so duplicate
+    responses stay distinct and deleting one of them retracts exactly one copy.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def __call__(self, fingerprints):
+        seen = self.seen
+        occurrence = np.empty(len(fingerprints), dtype=np.uint64)
+        for i, fp in enumerate(fingerprints.tolist()):
+            n = seen.get(fp, 0)
+            occurrence[i] = n
+            seen[fp] = n + 1
+        pairs = pd.DataFrame({'fingerprint': fingerprints, 'occurrence': occurrence})
+        return pd.util.hash_pandas_object(pairs, index=False).to_numpy()
+
+# --- STATE ---
+
+class IngestDelta:
+    """What an update changed: exploded rows added/retracted (None if none) and source row tallies."""
+
+    def __init__(self, added, removed, n_new, n_deleted, n_unchanged):
+        self.added = added
+        self.removed = removed
+        self.n_new = n_new
+        self.n_deleted = n_deleted
+        self.n_unchanged = n_unchanged
+
+    def summary(self):
+        n_added = 0 if self.added is None else len(self.added)
+        n_removed = 0 if self.removed is None else len(self.removed)
+        return (f"{self.n_new:,} new/changed responses, {self.n_deleted:,} removed, "
+                f"{self.n_unchanged:,} unchanged (+{n_added:,} / -{n_removed:,} rows)")
+
+
+class IngestState:
+    """
+    master_df plus the source row key of each form row behind it.
+
+    master_df is laid out as [form rows..., hardcoded rows]; row_keys holds one key per form
+    row (aligned with the head of master_df) and source_keys the keys of every response in
+    the export it came from, including responses that exploded to nothing; quality is the
+    quality_index.QualityIndex of those responses, aligned with source_keys.
+    """
+
+    def __init__(self, master_df, row_keys, source_keys, quality=None):
+        self.master_df = master_df
+        self.row_keys = row_keys
+        self.source_keys = source_keys
+        self.quality = quality
+
+    @classmethod
+    def empty(cls):
+        return cls(None, NO_KEYS, NO_KEYS, quality=QualityIndex.empty())
+
+    @property
+    def n_form_rows(self):
+        return len(self.row_keys)
+
+    @traced('incremental update', rows=lambda out: len(out[0].master_df))
+    def update(self, batches, progress=None, stage=None, partial=None):
+        """
+        Apply a new export, given as iter_form_batches() output. Only responses whose key is
+        not already in this state are exploded; rows of responses missing from the export are
+        retracted. Returns (new IngestState, IngestDelta); self is left untouched.
+
+        stage(name) is called as the work moves between 'read', 'normalize', 'explode' and
+        'hardcoded merge'; partial(n_rows, virtue_counts) after each batch with the rows it
+        exploded (ingest_jobs shows both while the upload is parsed).
+
+        Kept rows keep their order and new rows follow them, so after edits the row order
+        can differ from a full re-ingest; the contents and counts are the same.
+        """
+        known = pd.Index(self.source_keys)
+        assign = KeyAssigner()
+        source_keys, added_parts, added_keys, quality = [], [], [], []
+        n_unchanged = 0
+        stage = stage or (lambda name: None)
+        stage('read')
+        for batch, rows_read, total_rows in batches:
+            stage('normalize')
+            keys = assign(row_fingerprints(batch))
+            source_keys.append(keys)
+            known_at = known.get_indexer(keys) # hash table of known is built once and reused
+            is_new = known_at < 0
+            n_unchanged += len(keys) - int(is_new.sum())
+            # Quality bits of unchanged responses are carried over, new ones come from the same normalize pass
+            parts = [self.quality.take(known_at[~is_new])]
+            if is_new.any():
+                norm = data_processor.normalize_form_rows(batch[is_new])
+                stage('explode')
+                exploded, source = data_processor.explode_normalized(norm, with_source=True)
+                if partial is not None:
+                    partial(len(exploded), exploded['Cardinal virtues addressed'].value_counts())
+                added_parts.append(exploded)
+                added_keys.append(keys[is_new][source])
+                parts.append(QualityIndex.from_normalized(norm))
+            order = np.empty(len(keys), dtype=np.intp)
+            order[~is_new] = np.arange(len(keys) - int(is_new.sum()))
+            order[is_new] = np.arange(len(keys) - int(is_new.sum()), len(keys))
+            quality.append(QualityIndex.concat(parts).take(order))
+            if progress is not None:
+                progress(rows_read, total_rows)
+            stage('read')
+
+        stage('hardcoded merge')
+        source_keys = np.concatenate(source_keys) if source_keys else NO_KEYS
+        deleted = ~known.isin(source_keys)
+
+        if self.master_df is None:
+            kept, removed = [], None
+            kept_keys = NO_KEYS
+            hardcoded = data_processor.explode_hardcoded_rows()
+        else:
+            form_rows = self.master_df.iloc[:self.n_form_rows]
+            retract = pd.Index(self.row_keys).isin(self.source_keys[deleted])
+            kept = [form_rows[~retract]]
+            removed = form_rows[retract] if retract.any() else None
+            kept_keys = self.row_keys[~retract]
+            hardcoded = self.master_df.iloc[self.n_form_rows:]
+
+        master_df = data_processor.build_master(kept + added_parts + [hardcoded])
+        row_keys = np.concatenate([kept_keys] + added_keys)
+        added = data_processor.build_master(added_parts) if any(len(p) for p in added_parts) else None
+        delta = IngestDelta(added, removed, len(source_keys) - n_unchanged, int(deleted.sum()), n_unchanged)
+        return IngestState(master_df, row_keys, source_keys, quality=QualityIndex.concat(quality)), delta
@@ -0,0 +1,205 @@
+import io
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import dataset_cache
+from instrumentation import span
+
+# --- CONFIGURATION ---
+# Uploads are parsed on background threads: the session's script run returns at once and the
+# landing page polls the job (page_landing). One registry per server process
+# (app_state.get_jobs); sessions uploading the same export follow the same job.
+MAX_JOBS = int(os.environ.get('CV_INGEST_JOBS', '2')) # ingests running at once; more wait their turn
+JOB_KEEP_SECONDS = float(os.environ.get('CV_JOB_KEEP_S', '600')) # how long a finished job can be polled
+
+# In order; a multi-file ingest reads, normalizes and explodes in worker processes ('read')
+STAGES = ['queued', 'read', 'normalize', 'explode', 'hardcoded merge', 'aggregate']
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+class IngestJob:
+    """
+    One upload being ingested. status is 'queued', 'running' or one of FINISHED; a done job
+    holds a handle on the loaded dataset in the store until it is dropped from the registry.
+    The progress fields are written by the worker thread and only read by sessions.
+    """
+
+    def __init__(self, key, names):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.names = names
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.unit = "rows" if len(names) == 1 else "files"
+        self.done = 0
+        self.total = None
+        self.rows = 0 # master rows parsed so far
+        self.virtues = {} # virtue -> master rows parsed so far
+        self.error = None
+        self.handle = None
+        self.watchers = 1 # sessions following the job
+        self.created = time.monotonic()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    # Callbacks of the ingest (dataset_cache.load_or_process_files); every one of them is a
+    # point where a cancelled job stops
+
+    def check(self):
+        if self._cancel.is_set():
+            raise IngestCancelled(f"ingest {self.id} cancelled")
+
+    def set_stage(self, stage):
+        self.check()
+        self.stage = stage
+
+    def progress(self, done, total):
+        self.check()
+        self.done, self.total = done, total
+
+    def partial(self, n_rows, virtue_counts):
+        with self._lock:
+            self.rows += n_rows
+            for virtue, n in virtue_counts.items():
+                self.virtues[virtue] = self.virtues.get(virtue, 0) + int(n)
+        self.check()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelling(self):
+        return self._cancel.is_set() and self.status not in FINISHED
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def snapshot(self):
+        """Partial results for display: master rows and rows per virtue parsed so far."""
+        with self._lock:
+            return self.rows, dict(self.virtues)
+
+
+class IngestJobs:
+    """Background ingest jobs by id, run MAX_JOBS at a time; one running job per dataset key."""
+
+    def __init__(self, store, max_jobs=MAX_JOBS):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='ingest')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, uploaded_files):
+        """
+        Job ingesting the uploads (Streamlit UploadedFiles or paths) into the store. The bytes
+        are read here, in the calling session; a job already queued, running or done for the
+        same exports is followed instead of starting another.
+        """
+        files = [(getattr(f, 'name', str(f)), dataset_cache.read_bytes(f)) for f in uploaded_files]
+        key = dataset_cache.files_key(files)
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                if job.key == key and (job.status == 'done' or job.status not in FINISHED and not job.cancelling):
+                    job.watchers += 1
+                    return job
+            job = IngestJob(key, [name for name, _ in files])
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, files)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def release(self, job_id):
+        """A session stops following the job; the last one to leave cancels it if unfinished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.watchers = max(job.watchers - 1, 0)
+            if job.watchers == 0 and job.status not in FINISHED:
+                job.cancel()
+            self._prune()
+
+    def stats(self):
+        """One row per job still in the registry, newest first (for the Diagnostics page)."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune()
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created, reverse=True)
+        return [{
+            'job': job.id,
+            'files': ", ".join(job.names),
+            'status': job.status,
+            'stage': job.stage,
+            'progress': f"{job.done:,} / {job.total:,} {job.unit}" if job.total else f"{job.done:,} {job.unit}",
+            'rows': job.rows,
+            'sessions': job.watchers,
+            'seconds': round((job.finished or now) - job.created, 1),
+        } for job in jobs]
+
+    def _prune(self):
+        # Finished jobs are kept JOB_KEEP_SECONDS for sessions still polling, or until no session
+        # follows them, then dropped along with the handle that kept their dataset in the store.
+        # Called on every registry access, so an idle server does not pin finished datasets.
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and (job.watchers == 0 or now - job.finished > JOB_KEEP_SECONDS):
+                del self._jobs[job_id]
+                if job.handle is not None:
+                    job.handle.close()
+
+    def _run(self, job, files):
+        def load():
+            uploads = []
+            for name, raw_bytes in files:
+                upload = io.BytesIO(raw_bytes)
+                upload.name = name
+                uploads.append(upload)
+            _, df, quality, report = dataset_cache.load_or_process_files(
+                uploads, progress=job.progress, stage=job.set_stage, partial=job.partial, check=job.check)
+            return df, report, quality
+
+        handle = None
+        try:
+            job.check() # cancelled while queued
+            job.status = 'running'
+            with span('ingest job', job=job.id, files=len(files)) as s:
+                handle = self.store.open(job.key, load)
+                job.set_stage('aggregate')
+                build_cube(handle.dataset)
+                s.set(rows=len(handle.df))
+            job.handle = handle
+            job.rows = len(handle.df)
+            job.status = 'done'
+        except Exception as e:
+            if handle is not None:
+                handle.close()
+            if isinstance(e, IngestCancelled):
+                job.status = 'cancelled'
+            else:
+                job.error = str(e)
+                job.status = 'failed'
+        finally:
+            job.finished = time.monotonic()
+
+
+def build_cube(dataset):
+    # The query engine and pivot cube app_state.get_cube would build on the first analysis view
+    from pivot_cube import PivotCube
+    from query_engine import get_engine
+
+    engine = dataset.derive('engine', lambda: get_engine(dataset.df))
+    return dataset.derive('cube', lambda: PivotCube(dataset.df, engine=engine))
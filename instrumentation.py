@@ -0,0 +1,152 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# --- CONFIGURATION ---
+# Opt-in: CV_PROFILE=1 at startup, or the toggle on the Diagnostics page.
+# Disabled, span() hands back one shared no-op object and traced() adds a flag check.
+ENABLED = os.environ.get('CV_PROFILE', '') not in ('', '0')
+MAX_SPANS = 20_000 # oldest spans are dropped beyond this
+
+_spans = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+# --- SPANS ---
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+NO_SPAN = _NoSpan()
+
+
+class Span:
+    """One timed stage; attributes such as rows= can be added with set() before it closes."""
+
+    __slots__ = ('name', 'attrs', 'start', 'duration', 'thread')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        with _lock:
+            _spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def span(name, **attrs):
+    """with span('explode', rows=n) as s: ... s.set(out_rows=m)"""
+    if not ENABLED:
+        return NO_SPAN
+    return Span(name, attrs)
+
+def record(name, start, **attrs):
+    """Add a span that started at perf_counter() value `start` and ends now (for generators)."""
+    if not ENABLED:
+        return
+    s = Span(name, attrs)
+    s.thread = threading.get_ident()
+    s.start = start
+    s.__exit__(None, None, None)
+
+def traced(name=None, rows=None):
+    """
+    Decorator form of span(), named after the function unless given a name.
+    rows(result) -> int, if given, records the row count of what the function returned.
+    """
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(label, {}) as s:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    s.set(rows=rows(result))
+                return result
+        return wrapper
+    return decorate
+
+# --- EXPORT ---
+
+def spans():
+    with _lock:
+        return list(_spans)
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+def records():
+    """Recorded spans as plain dicts, oldest first (times in ms since module import)."""
+    return [{
+        'name': s.name,
+        'start_ms': round((s.start - _origin) * 1000, 3),
+        'duration_ms': round(s.duration * 1000, 3),
+        'thread': s.thread,
+        **s.attrs,
+    } for s in spans()]
+
+def summary():
+    """Per stage name: calls, total/mean/max ms and summed rows, slowest total first."""
+    stages = {}
+    for s in spans():
+        stage = stages.setdefault(s.name, {'name': s.name, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+        ms = s.duration * 1000
+        stage['calls'] += 1
+        stage['total_ms'] += ms
+        stage['max_ms'] = max(stage['max_ms'], ms)
+        stage['rows'] += s.attrs.get('rows', 0)
+    for stage in stages.values():
+        stage['mean_ms'] = stage['total_ms'] / stage['calls']
+    return sorted(stages.values(), key=lambda stage: stage['total_ms'], reverse=True)
+
+def to_json():
+    return json.dumps({'spans': records(), 'summary': summary()}, indent=2, default=str)
+
+def to_chrome_trace():
+    """Trace Event Format, for chrome://tracing or ui.perfetto.dev."""
+    pid = os.getpid()
+    events = [{
+        'name': s.name,
+        'cat': s.name.split(':')[0],
+        'ph': 'X',
+        'ts': round((s.start - _origin) * 1e6, 1),
+        'dur': round(s.duration * 1e6, 1),
+        'pid': pid,
+        'tid': s.thread,
+        'args': s.attrs,
+    } for s in spans()]
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, default=str)
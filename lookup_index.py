@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+# Filters offered on the "Tool: Course Lookup" page
+LOOKUP_DIMENSIONS = ['Cardinal virtues addressed', 'Academic Year', 'Department']
+
+EMPTY = np.array([], dtype=np.int64)
+
+
+class LookupIndex:
+    """
+    Inverted index over master_df, built once per dataset: for every value of each lookup
+    dimension, the sorted row positions holding it, plus the sorted option list for the widget.
+    A filter starts from the position list of the most selective dimension (OR within a
+    dimension) and narrows it with the other dimensions' value codes (AND), without touching
+    the frame.
+    """
+
+    def __init__(self, master_df, dimensions=LOOKUP_DIMENSIONS):
+        self.n_rows = len(master_df)
+        self.codes = {}
+        self.n_values = {}
+        self.value_codes = {}
+        self.postings = {}
+        self.options = {}
+        for dim in dimensions:
+            col = master_df[dim]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                codes, values = col.cat.codes.to_numpy(), col.cat.categories
+            else:
+                codes, values = pd.factorize(col, sort=True)
+
+            # Stable sort groups the row positions by value, ascending within each group
+            order = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            starts = np.cumsum(counts) - counts
+            order = order[len(order) - counts.sum():] # drop missing values (code -1 sorts first)
+
+            observed = [i for i in range(len(values)) if counts[i]]
+            self.codes[dim] = codes
+            self.n_values[dim] = len(values)
+            self.value_codes[dim] = {values[i]: i for i in observed}
+            self.postings[dim] = {values[i]: order[starts[i]:starts[i] + counts[i]] for i in observed}
+            self.options[dim] = [values[i] for i in observed]
+
+    def _union(self, dim, selected):
+        lists = [self.postings[dim].get(v, EMPTY) for v in selected]
+        if len(lists) == 1:
+            return lists[0]
+        # Values of one dimension never share a row, so the union is a plain merge
+        return np.sort(np.concatenate(lists))
+
+    def select(self, filters):
+        """
+        filters: {dimension: [selected values]}; empty selections are ignored.
+        Returns sorted row positions, or None when nothing is filtered (all rows).
+        """
+        active = {dim: selected for dim, selected in filters.items() if selected}
+        if not active:
+            return None
+
+        def matches(dim):
+            return sum(len(self.postings[dim].get(v, EMPTY)) for v in active[dim])
+
+        start_dim = min(active, key=matches)
+        positions = self._union(start_dim, active[start_dim])
+        for dim, selected in active.items():
+            if dim == start_dim or len(positions) == 0:
+                continue
+            # Lookup table over value codes; the extra last slot catches missing values (-1)
+            allowed = np.zeros(self.n_values[dim] + 1, dtype=bool)
+            for v in selected:
+                if v in self.value_codes[dim]:
+                    allowed[self.value_codes[dim][v]] = True
+            positions = positions[allowed[self.codes[dim][positions]]]
+        return positions
@@ -0,0 +1,143 @@
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import data_processor
+from incremental import NO_KEYS, IngestState, KeyAssigner, row_fingerprints
+from instrumentation import traced
+from quality_index import QualityIndex
+
+# --- CONFIGURATION ---
+# One Course Designation Form export per college / per year, loaded together.
+# openpyxl parsing is CPU-bound and holds the GIL, so workbooks go to separate processes.
+MAX_WORKERS = int(os.environ.get('CV_INGEST_WORKERS', '0')) or os.cpu_count() or 1
+CHECK_SECONDS = 0.25 # how often process_files calls check() while workers parse
+
+# --- WORKER ---
+
+def parse_export(name, raw_bytes, batch_size=data_processor.STREAM_BATCH_ROWS, check=None):
+    """
+    Read and explode one export (runs in a worker process; check() is called after each
+    batch when it runs in the caller's).
+    Returns a dict with the exploded form rows, the source key of each of them, the keys and
+    the QualityIndex of all responses in the file and the file's row count and parse time.
+    """
+    start = time.perf_counter()
+    assign = KeyAssigner()
+    parts, row_keys, source_keys, quality = [], [], [], []
+    n_rows = 0
+    for batch, n_rows, _ in data_processor.iter_form_batches(io.BytesIO(raw_bytes), batch_size):
+        keys = assign(row_fingerprints(batch))
+        norm = data_processor.normalize_form_rows(batch)
+        exploded, source = data_processor.explode_normalized(norm, with_source=True)
+        parts.append(exploded)
+        row_keys.append(keys[source])
+        source_keys.append(keys)
+        quality.append(QualityIndex.from_normalized(norm))
+        if check is not None:
+            check()
+    return {
+        'name': name,
+        'form_rows': data_processor.build_master(parts) if parts else None,
+        'row_keys': np.concatenate(row_keys) if row_keys else NO_KEYS,
+        'source_keys': np.concatenate(source_keys) if source_keys else NO_KEYS,
+        'quality': QualityIndex.concat(quality),
+        'rows': n_rows,
+        'seconds': time.perf_counter() - start,
+    }
+
+# --- MERGE ---
+
+@traced('merge exports', rows=lambda out: len(out[0].master_df))
+def merge_exports(results):
+    """
+    Stack per-file results in upload order, dropping responses already seen in an earlier
+    file. Keys carry the occurrence number, so this is a multiset union: a response that
+    appears twice in one export and once in another is kept twice.
+    Returns (IngestState, per-file report).
+    """
+    seen = NO_KEYS
+    parts, row_keys, source_keys, quality, report = [], [], [], [], []
+    for result in results:
+        duplicate = pd.Index(result['source_keys']).isin(seen)
+        keep = ~pd.Index(result['row_keys']).isin(result['source_keys'][duplicate])
+        if result['form_rows'] is not None:
+            parts.append(result['form_rows'][keep])
+        row_keys.append(result['row_keys'][keep])
+        source_keys.append(result['source_keys'][~duplicate])
+        quality.append(result['quality'].take(np.flatnonzero(~duplicate)))
+        seen = np.concatenate([seen, source_keys[-1]])
+        report.append({
+            'file': result['name'],
+            'rows': result['rows'],
+            'duplicates': int(duplicate.sum()),
+            'master_rows': int(keep.sum()),
+            'seconds': round(result['seconds'], 3),
+        })
+
+    master_df = data_processor.build_master(parts + [data_processor.explode_hardcoded_rows()])
+    state = IngestState(master_df, np.concatenate([NO_KEYS] + row_keys), np.concatenate([NO_KEYS] + source_keys),
+                        quality=QualityIndex.concat(quality))
+    return state, report
+
+# --- ENTRY POINT ---
+
+def process_files(files, max_workers=None, progress=None, stage=None, partial=None, check=None):
+    """
+    Parse several exports in parallel and merge them into one master_df.
+
+    files: [(name, raw bytes)] in the order their rows should appear.
+    progress(files_done, n_files) is called as workbooks finish, partial(n_rows, virtue_counts)
+    with the master rows of each finished workbook (before duplicates across files are dropped)
+    and stage(name) with 'read' and then 'hardcoded merge'; check() while workbooks are parsed
+    (after each batch without a pool, every CHECK_SECONDS with one). An exception raised by a
+    callback cancels the workbooks not started yet; running workers finish in the background.
+    Returns (IngestState, report): report has one dict per file with its row count,
+    duplicates dropped, master rows contributed and parse time in seconds.
+    """
+    files = list(files)
+    max_workers = min(max_workers or MAX_WORKERS, len(files)) or 1
+    results = [None] * len(files)
+
+    def finished(i, result, done):
+        results[i] = result
+        if partial is not None and result['form_rows'] is not None:
+            form_rows = result['form_rows']
+            partial(len(form_rows), form_rows['Cardinal virtues addressed'].value_counts())
+        if progress is not None:
+            progress(done, len(files))
+
+    if stage is not None:
+        stage('read')
+    if max_workers == 1:
+        # No pool for a single file / single core: same code path, no pickling
+        for i, (name, raw_bytes) in enumerate(files):
+            finished(i, parse_export(name, raw_bytes, check=check), i + 1)
+    else:
+        # spawn, not fork: the app's server threads (ingest jobs, Streamlit) may hold locks
+        # that a forked worker would inherit held
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = {pool.submit(parse_export, name, raw_bytes): i for i, (name, raw_bytes) in enumerate(files)}
+            pending, done = set(futures), 0
+            while pending:
+                if check is not None:
+                    check()
+                finished_now, pending = wait(pending, timeout=CHECK_SECONDS, return_when=FIRST_COMPLETED)
+                for future in finished_now:
+                    done += 1
+                    finished(futures[future], future.result(), done)
+        except BaseException:
+            # Don't wait for workbooks being parsed: the caller is no longer interested
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    if stage is not None:
+        stage('hardcoded merge')
+    return merge_exports(results)
@@ -0,0 +1,102 @@
+import streamlit as st
+
+from app_state import get_cube
+from charts import CHART_TYPES, build_spec
+from instrumentation import span
+from exports import flat
+from pivot_cube import DASHBOARD_VIEWS, MAX_TOP_INSTRUCTORS, TOP_INSTRUCTORS
+from table_view import export_buttons
+
+# --- CONFIGURATION ---
+# Box titles of each split view: page -> (pivot table, chart)
+VIEW_TITLES = {
+    "Overview: Course Offerings": ("Course Count by Year/Sem", "Trend Overview"),
+    "Trends: Virtue by Year": ("Virtue Distribution (Year)", "Virtue Trends"),
+    "Trends: Virtue by Semester": ("Virtue Distribution (Semester)", "Seasonality Analysis"),
+    # Top 20 by default (see PivotCube.instructors); K and filters are set on the page
+    "Analysis: Instructor Load": ("Instructor Focus Area", "Instructor Load Visualization"),
+    "Analysis: Department Alignment": ("Departmental Breakdown", "Department Strategy"),
+    "Analysis: Virtual Adoption": ("Virtual Penetration", "Adoption Rate"),
+}
+
+# --- SPLIT VIEW ---
+
+def get_chart_spec(view_name, chart_type, pivot=None):
+    view = DASHBOARD_VIEWS[view_name]
+    if pivot is not None:
+        # A filtered variant: small, and one of too many combinations to keep
+        with span(f"chart spec: {view_name}", chart_type=chart_type):
+            return build_spec(pivot, view['index'], view['columns'], chart_type)
+    # Switching chart types or revisiting a view reuses the serialized spec, as does any
+    # other session on the same dataset
+    chart_specs = st.session_state.dataset.dataset.chart_specs
+    key = (view_name, chart_type)
+    if key not in chart_specs:
+        with span(f"chart spec: {view_name}", chart_type=chart_type):
+            chart_specs[key] = build_spec(get_cube().pivot(view_name), view['index'], view['columns'], chart_type)
+    return chart_specs[key]
+
+def instructor_load_pivot():
+    """
+    Top-K and virtue / year filters of Instructor Load, answered from the cube's per-instructor
+    aggregates. None for the default view, which the cube memoizes.
+    """
+    load = get_cube().instructors
+    col1, col2, col3 = st.columns([1, 2, 2])
+    with col1: k = st.number_input("Top instructors", min_value=1, max_value=MAX_TOP_INSTRUCTORS,
+                                   value=TOP_INSTRUCTORS, step=5, key="instructor_load_k")
+    with col2: virtues = st.multiselect("Virtue", load.options('Cardinal virtues addressed'), key="instructor_load_virtues")
+    with col3: years = st.multiselect("Academic Year", load.options('Academic Year'), key="instructor_load_years")
+    if k == TOP_INSTRUCTORS and not virtues and not years:
+        return None
+    with span('instructor load: top k', k=k, virtues=len(virtues), years=len(years)):
+        return load.pivot(k, virtues, years)
+
+def show_split_view(view_name, title_pivot="Pivot Table", title_chart="Visualization", pivot=None):
+    """
+    Renders the split view: Left = White Box (Pivot), Right = Mint Box (Chart)
+    pivot: a filtered variant of the view's pivot to show instead (not cached)
+    """
+    filtered = pivot
+    col1, col2 = st.columns([5, 4], gap="medium")
+
+    # 1. Prepare Data (memoized on the cube, so chart-type switches don't recompute it)
+    if pivot is None:
+        with span(f"pivot: {view_name}"):
+            pivot = get_cube().pivot(view_name)
+    # Add Total for table display
+    pivot_display = pivot.copy()
+    pivot_display['Total'] = pivot_display.sum(axis=1)
+
+    # 2. Render Left Column (White Box)
+    with col1:
+        # Marker for CSS targeting
+        st.markdown('<div class="white-box-marker"></div>', unsafe_allow_html=True)
+        st.markdown(f'<h3>{title_pivot}</h3>', unsafe_allow_html=True)
+        st.dataframe(pivot_display, use_container_width=True, height=500)
+        export_buttons(view_name, flat(pivot_display), key=f"pivot_{view_name}")
+
+    # 3. Render Right Column (Mint Box)
+    with col2:
+        # Marker for CSS targeting
+        st.markdown('<div class="mint-box-marker"></div>', unsafe_allow_html=True)
+
+        # Header + Chart Toggle in columns
+        c_head_1, c_head_2 = st.columns([2, 1])
+        with c_head_1:
+            st.markdown(f'<h3>{title_chart}</h3>', unsafe_allow_html=True)
+        with c_head_2:
+            chart_type = st.selectbox("Chart Type", CHART_TYPES, key=title_chart, label_visibility="collapsed")
+
+        # Move chart down for cleaner look
+        st.markdown("<br>", unsafe_allow_html=True)
+
+        # Pre-aggregated, category-capped Vega-Lite spec, built once per (dataset, view, chart type)
+        spec = get_chart_spec(view_name, chart_type, filtered)
+        with span(f"chart: {view_name}", chart_type=chart_type):
+            st.vega_lite_chart(spec, use_container_width=True)
+
+def render(page):
+    title_pivot, title_chart = VIEW_TITLES[page]
+    pivot = instructor_load_pivot() if page == "Analysis: Instructor Load" else None
+    show_split_view(page, title_pivot=title_pivot, title_chart=title_chart, pivot=pivot)
@@ -0,0 +1,55 @@
+import pandas as pd
+import streamlit as st
+
+import app_state
+import data_processor
+import ingest_jobs
+import instrumentation
+
+# --- DIAGNOSTICS (hidden) ---
+# Listed with ?diagnostics in the URL or when CV_PROFILE=1 (see app.py)
+
+def render(page=None):
+    st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
+    recording = st.toggle("Record timing spans", value=instrumentation.ENABLED,
+                          help="Spans are kept in memory for this server process (all sessions).")
+    if recording and not instrumentation.ENABLED:
+        instrumentation.enable()
+    elif not recording and instrumentation.ENABLED:
+        instrumentation.disable()
+
+    summary = instrumentation.summary()
+    if summary:
+        st.subheader("Stages")
+        st.dataframe(pd.DataFrame(summary).round(2), hide_index=True, use_container_width=True)
+        st.subheader("Recent Spans")
+        st.dataframe(pd.DataFrame(instrumentation.records()[-200:][::-1]), hide_index=True, use_container_width=True)
+
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            st.download_button("Download JSON", instrumentation.to_json(), file_name="cv_profile.json",
+                               mime="application/json", use_container_width=True)
+        with c2:
+            st.download_button("Download Chrome Trace", instrumentation.to_chrome_trace(), file_name="cv_trace.json",
+                               mime="application/json", use_container_width=True,
+                               help="Open in chrome://tracing or ui.perfetto.dev")
+        with c3:
+            if st.button("Clear", use_container_width=True):
+                instrumentation.clear()
+                st.rerun()
+    else:
+        st.info("No spans recorded yet. Turn recording on, then upload a file or open a few pages.")
+
+    st.subheader("Dataset Store")
+    store = app_state.get_store()
+    st.caption(f"Shared by every session in this server process: {store.nbytes / 2**20:,.1f} MB "
+               f"of {store.max_bytes / 2**20:,.0f} MB budget (CV_STORE_MAX_MB)")
+    st.dataframe(pd.DataFrame(store.stats()), hide_index=True, use_container_width=True)
+
+    st.subheader("Ingest Jobs")
+    st.caption(f"Uploads parsed in the background, {ingest_jobs.MAX_JOBS} at a time (CV_INGEST_JOBS)")
+    st.dataframe(pd.DataFrame(app_state.get_jobs().stats()), hide_index=True, use_container_width=True)
+
+    st.subheader("Term Parser Cache")
+    st.json(data_processor.term_parser_stats())
+    st.markdown('</div>', unsafe_allow_html=True)
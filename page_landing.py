@@ -0,0 +1,143 @@
+import streamlit as st
+
+import app_state
+import artifacts
+from instrumentation import span
+
+# --- CONFIGURATION ---
+POLL_SECONDS = 0.5 # how often a running ingest's progress is redrawn
+
+STAGE_LABELS = {
+    'queued': "Waiting for a free worker",
+    'read': "Reading workbook",
+    'normalize': "Normalizing answers",
+    'explode': "Expanding terms and virtues",
+    'hardcoded merge': "Merging hardcoded courses",
+    'aggregate': "Building pivot tables",
+}
+
+# --- DATA LOADING ---
+# Uploads are ingested by a background job (ingest_jobs.py): script runs return at once and
+# the job's progress is polled. Sessions uploading an export that is already loaded, or being
+# loaded, share it; otherwise streaming ingest behind the on-disk cache, several exports in
+# parallel processes.
+
+def follow_upload(uploaded_files):
+    """
+    The ingest job of the uploaded files: submitted on the first run that sees them, followed
+    on later runs. None if this session cancelled it.
+    """
+    jobs = app_state.get_jobs()
+    upload_ids = [f.file_id for f in uploaded_files]
+    if st.session_state.ingest_job is not None:
+        job_id, followed = st.session_state.ingest_job
+        if followed == upload_ids:
+            job = None if job_id is None else jobs.get(job_id)
+            if job is not None or job_id is None:
+                return job
+        elif job_id is not None:
+            jobs.release(job_id)
+    job = jobs.submit(uploaded_files)
+    st.session_state.ingest_job = (job.id, upload_ids)
+    return job
+
+def drop_upload():
+    # The uploads were removed or the ingest cancelled: the job goes on only if another session follows it
+    if st.session_state.ingest_job is not None:
+        job_id, upload_ids = st.session_state.ingest_job
+        if job_id is not None:
+            app_state.get_jobs().release(job_id)
+        st.session_state.ingest_job = (None, upload_ids)
+
+@st.fragment(run_every=POLL_SECONDS)
+def show_job(job_id):
+    from data_processor import VIRTUES
+
+    job = app_state.get_jobs().get(job_id)
+    if job is None or job.status in ('failed', 'cancelled'):
+        st.rerun() # the landing page shows the outcome
+    if job.status == 'done':
+        app_state.open_dataset(app_state.get_store().open(job.key))
+        st.rerun()
+
+    stage = "Cancelling" if job.cancelling else STAGE_LABELS[job.stage]
+    if job.total:
+        text = f"{stage}... {job.done:,} of {job.total:,} {job.unit}"
+    else:
+        text = f"{stage}... {job.done:,} {job.unit}" if job.done else f"{stage}..."
+    st.progress(job.fraction, text=text)
+
+    # Partial results: what the rows parsed so far add up to
+    rows, virtues = job.snapshot()
+    for col, (label, n) in zip(st.columns(1 + len(VIRTUES)),
+                               [("Rows parsed", rows)] + [(v, virtues.get(v, 0)) for v in VIRTUES]):
+        col.metric(label, f"{n:,}")
+    if st.button("✖ Cancel Import", key="cancel_ingest", disabled=job.cancelling):
+        drop_upload()
+        st.rerun()
+
+def load_precomputed(manifest):
+    store = app_state.get_store()
+    handle = store.open(manifest['dataset_key'])
+    if handle is None:
+        manifest, df, cube, quality = artifacts.load_artifacts(manifest=manifest)
+        handle = store.add(manifest['dataset_key'], df, manifest['ingest'] or None, cube=cube, quality=quality)
+    return handle
+
+# --- LANDING / IMPORT STATE ---
+
+def render():
+    col1, col2, col3 = st.columns([1,2,1])
+    with col2:
+        # Unified Landing Card Container
+        with st.container():
+            # Marker for CSS targeting (Landing Card Style)
+            st.markdown('<div class="landing-box-marker"></div>', unsafe_allow_html=True)
+
+            st.markdown("""
+                <h1>Import dataset for pivot tables or insight</h1>
+                <p class="sub-text">Please upload your Course Designation Form (Excel) to begin analysis.</p>
+            """, unsafe_allow_html=True)
+
+            st.markdown("<br>", unsafe_allow_html=True)
+
+            # Uploader NOW INSIDE the container
+            # Several exports (one per college / year) are merged into one dataset
+            uploaded_files = st.file_uploader("Choose a file", type=['xlsx'], accept_multiple_files=True,
+                                              label_visibility="collapsed")
+
+            if uploaded_files:
+                try:
+                    job = follow_upload(uploaded_files)
+                except Exception as e:
+                    job = None
+                    st.error(f"Error processing file: {e}")
+                if job is None:
+                    if st.session_state.ingest_job is not None and st.session_state.ingest_job[0] is None:
+                        st.info("Import cancelled.")
+                        if st.button("🔄 Start Again", use_container_width=True):
+                            st.session_state.ingest_job = None
+                            st.rerun()
+                elif job.status == 'failed':
+                    st.error(f"Error processing file: {job.error}")
+                elif job.status == 'cancelled':
+                    # Cancelled by the other sessions that followed it: start a fresh job
+                    st.session_state.ingest_job = None
+                    st.rerun()
+                else:
+                    show_job(job.id)
+            elif st.session_state.ingest_job is not None:
+                drop_upload()
+                st.session_state.ingest_job = None
+
+            # Output of a headless run (cli.py), when it was built with the current parsing rules
+            manifest = artifacts.read_manifest()
+            if manifest is not None and not uploaded_files:
+                sources = ", ".join(manifest['sources']) or "batch run"
+                st.caption(f"Precomputed dataset: {sources} · {manifest['rows']:,} rows · built {manifest['created']}")
+                if st.button("📦 Open Precomputed Dataset", use_container_width=True):
+                    with span('open artifacts') as s:
+                        handle = load_precomputed(manifest)
+                        s.set(rows=len(handle.df))
+                    app_state.open_dataset(handle)
+                    st.rerun()
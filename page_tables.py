@@ -0,0 +1,81 @@
+import streamlit as st
+
+from app_state import get_dataset_key, get_df, get_quality, get_query_engine
+from instrumentation import span
+from table_view import paged_table
+
+# --- ROW-LEVEL PAGES ---
+# Datasets, tools and quality checks: server-side paged views of master_df rows. The quality
+# pages read the dataset's quality index (quality_index.py), one row per form response.
+
+def render(page):
+    df = get_df()
+    data_key = get_dataset_key()
+    st.markdown('<div class="pivot-box">', unsafe_allow_html=True)
+
+    # 1. Audit: Raw Form Export
+    if page == "Audit: Raw Form Export":
+        st.write("Original Data Source (Form Responses)")
+        paged_table(df, key="raw_form", data_key=data_key, rows=get_query_engine().rows_equal('Source', 'Form'))
+
+    # 2. Dataset: Master Course List
+    elif page == "Dataset: Master Course List":
+        st.write("Full Processed Dataset (Normalized)")
+        paged_table(df, key="master_list", data_key=data_key)
+
+    # 9. Tool: Course Lookup
+    elif page == "Tool: Course Lookup":
+        engine = get_query_engine()
+        col1, col2, col3 = st.columns(3)
+        with col1: sel_virtue = st.multiselect("Virtue", engine.options('Cardinal virtues addressed'))
+        with col2: sel_ay = st.multiselect("Academic Year", engine.options('Academic Year'))
+        with col3: sel_dept = st.multiselect("Department", engine.options('Department'))
+
+        with span('lookup: select', engine=engine.name):
+            positions = engine.select({
+                'Cardinal virtues addressed': sel_virtue,
+                'Academic Year': sel_ay,
+                'Department': sel_dept
+            })
+        paged_table(df, key="course_lookup", data_key=data_key, rows=positions, export="Course Lookup")
+
+    # 10. Catalog: Virtual Courses
+    elif page == "Catalog: Virtual Courses":
+        virt_rows = get_query_engine().rows_equal('DeliveryMode', 'Virtual')
+        if len(virt_rows) == 0:
+            st.warning("No courses explicitly marked as 'Virtual' were found.")
+        else:
+            paged_table(df, key="virtual_catalog", data_key=data_key, rows=virt_rows, export="Virtual Courses")
+
+    # 11. Quality: Issues Log
+    elif page == "Quality: Issues Log":
+        from data_processor import VIRTUAL_DETECTED
+        from quality_index import ISSUES
+
+        quality = get_quality()
+        if quality is None:
+            st.warning("No quality index for this dataset: upload the export again to build one.")
+        else:
+            for col, (label, n) in zip(st.columns(len(ISSUES)), quality.issue_counts.items()):
+                col.metric(label, f"{n:,}")
+            # A virtual course is worth a look, not a problem: listed only on request
+            shown = st.multiselect("Issues", list(ISSUES.values()), key="issues_log_kinds",
+                                   default=[label for bit, label in ISSUES.items() if bit != VIRTUAL_DETECTED])
+            issue_rows = quality.log_rows(sum(bit for bit, label in ISSUES.items() if label in shown))
+            st.write(f"Found {len(issue_rows):,} form responses (of {quality.n_responses:,}) "
+                     "with potential data quality issues.")
+            paged_table(quality.log, key="issues_log", data_key=data_key, rows=issue_rows)
+
+    # 12. Quality: Tag Validation
+    elif page == "Quality: Tag Validation":
+        st.subheader("Virtue / Tag Analysis")
+        quality = get_quality()
+        if quality is None:
+            st.warning("No quality index for this dataset: upload the export again to build one.")
+        else:
+            st.dataframe(quality.tag_table(), use_container_width=True)
+            st.caption(f"Form responses naming each virtue, of {quality.n_responses:,}; "
+                       "a response can name several. Responses naming none are dropped from the dataset.")
+        st.info("Expected: Justice, Prudence, Temperance, Fortitude")
+
+    st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,208 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from query_engine import PandasEngine
+
+# --- CONFIGURATION ---
+# Every dimension an analysis view pivots or filters on
+CUBE_DIMENSIONS = [
+    'Cardinal virtues addressed', 'Academic Year', 'Semester',
+    'Department', 'Instructor name', 'DeliveryMode'
+]
+
+TOP_INSTRUCTORS = 20 # Top 20 for readability
+MAX_TOP_INSTRUCTORS = 200 # Instructor Load's K is user-set up to this
+
+# Instructor Load ranks instructors and filters them by virtue / year on these aggregates
+LOAD_DIMENSIONS = ['Instructor name', 'Cardinal virtues addressed', 'Academic Year']
+
+# The six show_split_view analyses: page -> index, columns and optional row filter
+DASHBOARD_VIEWS = {
+    "Overview: Course Offerings": {'index': 'Academic Year', 'columns': 'Semester', 'filter': 'valid_ay'},
+    "Trends: Virtue by Year": {'index': 'Cardinal virtues addressed', 'columns': 'Academic Year'},
+    "Trends: Virtue by Semester": {'index': 'Cardinal virtues addressed', 'columns': 'Semester'},
+    "Analysis: Instructor Load": {'index': 'Instructor name', 'columns': 'Cardinal virtues addressed', 'filter': 'top_instructors'},
+    "Analysis: Department Alignment": {'index': 'Department', 'columns': 'Cardinal virtues addressed'},
+    "Analysis: Virtual Adoption": {'index': 'Academic Year', 'columns': 'DeliveryMode'},
+}
+
+
+class InstructorLoad:
+    """
+    Row counts per (instructor, virtue, academic year), as an instructors x virtues x years
+    array summed out of the cube counts once and patched with each incremental delta.
+    Ranking and filtering only touch this array, so they cost the same at any row count.
+    Labels keep first-appearance order, which breaks ties in the ranking.
+    """
+
+    def __init__(self, counts):
+        self.labels = [pd.Index([], dtype=object) for _ in LOAD_DIMENSIONS]
+        self.dtypes = counts[LOAD_DIMENSIONS].dtypes.to_dict()
+        self.counts = np.zeros((0, 0, 0), dtype=np.int64)
+        self.add(counts)
+
+    def add(self, counts, sign=1):
+        """Add (sign=-1: take away) grouped counts: LOAD_DIMENSIONS columns plus 'Count'."""
+        positions = []
+        for axis, dim in enumerate(LOAD_DIMENSIONS):
+            # Labels are matched once per distinct value, not per row
+            codes, seen = pd.factorize(counts[dim])
+            seen = pd.Index(np.asarray(seen, dtype=object))
+            self.labels[axis] = self.labels[axis].append(seen[~seen.isin(self.labels[axis])])
+            positions.append(self.labels[axis].get_indexer(seen)[codes])
+        shape = tuple(len(labels) for labels in self.labels)
+        if shape != self.counts.shape:
+            self.counts = np.pad(self.counts, [(0, new - old) for new, old in zip(shape, self.counts.shape)])
+        cells = np.ravel_multi_index(positions, shape)
+        added = np.bincount(cells, weights=counts['Count'].to_numpy(), minlength=self.counts.size)
+        self.counts += sign * added.astype(np.int64).reshape(shape)
+
+    def apply_delta(self, delta, master_df):
+        for rows, sign in ((delta.added, 1), (delta.removed, -1)):
+            if rows is not None and len(rows):
+                self.add(rows.groupby(LOAD_DIMENSIONS, observed=True, sort=False).size()
+                         .rename('Count').reset_index(), sign)
+        self.dtypes = master_df[LOAD_DIMENSIONS].dtypes.to_dict()
+
+    def options(self, dim):
+        """Values of a LOAD_DIMENSIONS column that still have rows, in pivot order."""
+        axis = LOAD_DIMENSIONS.index(dim)
+        present = np.flatnonzero(self.counts.sum(axis=tuple(a for a in range(3) if a != axis)))
+        return list(self.labels[axis][present[self._order(dim, present)]])
+
+    def _order(self, dim, positions):
+        # Pivot order of labels at these positions: category order for categorical columns,
+        # as groupby(observed=True) sorts them
+        labels = self.labels[LOAD_DIMENSIONS.index(dim)][positions]
+        dtype = self.dtypes[dim]
+        if isinstance(dtype, pd.CategoricalDtype):
+            return dtype.categories.get_indexer(labels).argsort(kind='stable')
+        return labels.argsort()
+
+    def _index(self, dim, positions):
+        labels = self.labels[LOAD_DIMENSIONS.index(dim)][positions]
+        dtype = self.dtypes[dim]
+        if isinstance(dtype, pd.CategoricalDtype):
+            return pd.CategoricalIndex(labels, dtype=dtype, name=dim)
+        return pd.Index(labels, name=dim)
+
+    def _positions(self, axis, values):
+        positions = self.labels[axis].get_indexer(values)
+        return positions[positions >= 0]
+
+    def _by_virtue(self, virtues=None, years=None):
+        # instructors x virtues counts over the chosen virtues and years (None / empty: all)
+        counts = self.counts
+        if years:
+            counts = counts[:, :, self._positions(2, years)]
+        by_virtue = counts.sum(axis=2)
+        if virtues:
+            keep = np.zeros(by_virtue.shape[1], dtype=by_virtue.dtype)
+            keep[self._positions(1, virtues)] = 1
+            by_virtue = by_virtue * keep
+        return by_virtue
+
+    def top(self, k=TOP_INSTRUCTORS, virtues=None, years=None, by_virtue=None):
+        """
+        Positions (in labels[0]) of the k instructors with the most rows among the chosen
+        virtues and years, most first; ties go to the instructor that appeared first.
+        """
+        if by_virtue is None:
+            by_virtue = self._by_virtue(virtues, years)
+        totals = by_virtue.sum(axis=1).tolist()
+        # nlargest is stable: equal totals keep ascending (first-appearance) positions
+        return heapq.nlargest(k, (i for i, n in enumerate(totals) if n), key=totals.__getitem__)
+
+    def top_labels(self, k=TOP_INSTRUCTORS, virtues=None, years=None):
+        return self.labels[0][self.top(k, virtues, years)]
+
+    def pivot(self, k=TOP_INSTRUCTORS, virtues=None, years=None):
+        """Instructor x virtue counts of the top k instructors, laid out as PivotCube.pivot does."""
+        instructor, virtue = LOAD_DIMENSIONS[:2]
+        by_virtue = self._by_virtue(virtues, years)
+        rows = np.array(self.top(k, by_virtue=by_virtue), dtype=np.intp)
+        cols = np.flatnonzero(by_virtue[rows].sum(axis=0))
+        rows, cols = rows[self._order(instructor, rows)], cols[self._order(virtue, cols)]
+        return pd.DataFrame(by_virtue[np.ix_(rows, cols)], index=self._index(instructor, rows),
+                            columns=self._index(virtue, cols))
+
+
+class PivotCube:
+    """
+    Row counts of master_df grouped by every CUBE_DIMENSIONS combination, built once per dataset.
+    Each view's pivot (same as pivot_table(..., aggfunc='count', fill_value=0)) is sliced out
+    of the cube on first use and memoized; charts.build_spec draws it.
+    The grouping itself runs on a query_engine engine (pandas unless one is given).
+    """
+
+    def __init__(self, master_df, engine=None):
+        # First-appearance order, which top_instructors relies on for ties
+        engine = engine or PandasEngine(master_df)
+        self.counts = engine.group_counts(CUBE_DIMENSIONS)
+        self.n_rows = len(master_df)
+        self._instructors = None
+        self._pivots = {}
+
+    @classmethod
+    def from_counts(cls, counts, n_rows):
+        """Cube over already-grouped counts (e.g. read back from batch artifacts)."""
+        cube = cls.__new__(cls)
+        cube.counts = counts
+        cube.n_rows = n_rows
+        cube._instructors = None
+        cube._pivots = {}
+        return cube
+
+    def apply_delta(self, delta, master_df):
+        """
+        Patch the counts with an incremental update (incremental.IngestDelta) instead of
+        re-grouping master_df: added rows count +1, retracted rows -1, emptied cells drop out.
+        """
+        parts = [self.counts]
+        for rows, sign in ((delta.added, 1), (delta.removed, -1)):
+            if rows is not None and len(rows):
+                part = rows.groupby(CUBE_DIMENSIONS, observed=True, sort=False).size().rename('Count').reset_index()
+                part['Count'] *= sign
+                parts.append(part)
+        # Align categories with the new master so the dimensions stay categorical after concat
+        dtypes = master_df[CUBE_DIMENSIONS].dtypes.to_dict()
+        merged = pd.concat([p.astype(dtypes) for p in parts], ignore_index=True)
+        counts = merged.groupby(CUBE_DIMENSIONS, observed=True, sort=False)['Count'].sum()
+        self.counts = counts[counts != 0].reset_index()
+        self.n_rows = len(master_df)
+        if self._instructors is not None:
+            self._instructors.apply_delta(delta, master_df)
+        self._pivots.clear()
+
+    @property
+    def instructors(self):
+        # Summed out of the counts on first use; patched, not rebuilt, by apply_delta
+        if self._instructors is None:
+            self._instructors = InstructorLoad(self.counts)
+        return self._instructors
+
+    def top_instructors(self, k=TOP_INSTRUCTORS):
+        return self.instructors.top_labels(k)
+
+    def _slice(self, view_filter):
+        counts = self.counts
+        if view_filter == 'valid_ay':
+            counts = counts[counts['Academic Year'].str.startswith('AY')]
+        return counts
+
+    def pivot(self, view_name):
+        if view_name not in self._pivots:
+            view = DASHBOARD_VIEWS[view_name]
+            if view.get('filter') == 'top_instructors':
+                pivot = self.instructors.pivot()
+            else:
+                pivot = (
+                    self._slice(view.get('filter'))
+                    .groupby([view['index'], view['columns']], observed=True)['Count'].sum()
+                    .unstack(view['columns'], fill_value=0)
+                )
+            self._pivots[view_name] = pivot
+        return self._pivots[view_name]
+
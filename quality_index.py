@@ -0,0 +1,147 @@
+import functools
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import data_processor
+from data_processor import VIRTUES
+
+# --- CONFIGURATION ---
+# The quality pages read one small index per dataset instead of scanning master_df:
+#   issues   uint8 issue bits of every form response, in source row order (normalize_form_rows)
+#   tags     uint8 virtue bits of every response, so virtues are counted per response, not per
+#            exploded row, and responses that name none (dropped from master_df) still count
+#   answers  the raw answers of the responses with at least one issue bit, in the same order
+# Counts are computed once when the index is built.
+ISSUES = {
+    data_processor.UNPARSED_COURSE: "Unparsed course code",
+    data_processor.UNKNOWN_TERM: "Unknown term",
+    data_processor.NO_VIRTUE: "No virtue (dropped)",
+    data_processor.YEAR_OUT_OF_RANGE: "Year outside planning window",
+    data_processor.VIRTUAL_DETECTED: "Virtual detected",
+}
+ANSWER_COLUMNS = ['Course Info', 'Term(s) offered', 'Cardinal virtues addressed', 'Instructor name']
+NO_TAG = "(none: dropped)"
+
+def _categorical(values, categories=None):
+    # Object categories throughout, so parts built from any batch (or read back) concat
+    if categories is None:
+        codes, categories = pd.factorize(values)
+    else:
+        codes = values
+    return pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+
+def _bit_counts(bits, n_bits):
+    # Responses with each bit set, from one bincount over the (at most 2^n_bits) bit sets
+    per_set = np.bincount(bits, minlength=1 << n_bits)
+    sets = np.arange(len(per_set))
+    return [int(per_set[((sets >> j) & 1).astype(bool)].sum()) for j in range(n_bits)]
+
+
+class QualityIndex:
+    """Issue and virtue bits of every form response of a dataset, with the answers behind the issues."""
+
+    def __init__(self, issues, tags, answers):
+        self.issues = np.asarray(issues, dtype=np.uint8)
+        self.tags = np.asarray(tags, dtype=np.uint8)
+        self.answers = answers
+        self.issue_counts = dict(zip(ISSUES.values(), _bit_counts(self.issues, len(ISSUES))))
+        self.tag_counts = dict(zip(VIRTUES, _bit_counts(self.tags, len(VIRTUES))))
+        self.tag_counts[NO_TAG] = self.issue_counts[ISSUES[data_processor.NO_VIRTUE]]
+
+    @property
+    def n_responses(self):
+        return len(self.issues)
+
+    # --- BUILD ---
+
+    @classmethod
+    def empty(cls):
+        answers = pd.DataFrame({col: _categorical(np.array([], dtype=object)) for col in ANSWER_COLUMNS})
+        return cls(np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.uint8), answers)
+
+    @classmethod
+    def from_normalized(cls, norm):
+        """Index of the form rows behind one normalize_form_rows() result."""
+        flagged = np.flatnonzero(norm['issues'])
+        answers = pd.DataFrame({col: _categorical(norm['answers'][col].iloc[flagged])
+                                for col in ANSWER_COLUMNS})
+        return cls(norm['issues'], norm['tags'], answers)
+
+    @classmethod
+    def concat(cls, parts):
+        """Responses of parts, back to back."""
+        parts = list(parts)
+        if not parts:
+            return cls.empty()
+        answers = {}
+        for col in ANSWER_COLUMNS:
+            merged = union_categoricals([p.answers[col].array for p in parts])
+            answers[col] = _categorical(merged.codes, merged.categories)
+        answers = pd.DataFrame(answers)
+        return cls(np.concatenate([p.issues for p in parts]), np.concatenate([p.tags for p in parts]), answers)
+
+    def take(self, positions):
+        """Index of the responses at positions (in that order)."""
+        positions = np.asarray(positions, dtype=np.intp)
+        answer_row = np.cumsum(self.issues != 0) - 1
+        issues = self.issues[positions]
+        answers = self.answers.iloc[answer_row[positions[issues != 0]]].reset_index(drop=True)
+        return QualityIndex(issues, self.tags[positions], answers)
+
+    # --- TABLES ---
+
+    def issue_table(self):
+        return pd.DataFrame({'Responses': list(self.issue_counts.values())},
+                            index=pd.Index(list(self.issue_counts), name='Issue'))
+
+    def tag_table(self):
+        # One row per virtue: form responses naming it (a response can name several)
+        return pd.DataFrame({'Responses': list(self.tag_counts.values())},
+                            index=pd.Index(list(self.tag_counts), name='Cardinal virtues addressed'))
+
+    @functools.cached_property
+    def log(self):
+        """One row per response with an issue: its position in the dataset (1-based), issues and answers."""
+        flagged = np.flatnonzero(self.issues)
+        sets, codes = np.unique(self.issues[flagged], return_inverse=True)
+        labels = ["; ".join(label for bit, label in ISSUES.items() if s & bit) for s in sets]
+        log = pd.DataFrame({
+            'Response': flagged + 1,
+            'Issues': _categorical(np.array(labels, dtype=object)[codes.reshape(-1)]),
+        })
+        for col in ANSWER_COLUMNS:
+            log[col] = self.answers[col].array
+        # paged_table sorts categoricals by code, so the categories go in sorted order
+        for col in log.columns[1:]:
+            log[col] = log[col].cat.set_categories(sorted(log[col].cat.categories))
+        return log
+
+    @functools.cached_property
+    def _log_issues(self):
+        return self.issues[self.issues != 0]
+
+    def log_rows(self, issues=None):
+        """Positions in log of the responses with any of the issue bits in `issues` (default: all)."""
+        mask = sum(ISSUES) if issues is None else int(issues)
+        return np.flatnonzero(self._log_issues & mask)
+
+    # --- PERSISTENCE ---
+
+    def to_arrays(self):
+        """Plain numpy arrays (np.savez without pickling); see from_arrays."""
+        arrays = {'issues': self.issues, 'tags': self.tags}
+        for i, col in enumerate(ANSWER_COLUMNS):
+            cat = self.answers[col].array
+            arrays[f'answer{i}_codes'] = cat.codes
+            arrays[f'answer{i}_values'] = np.array(cat.categories, dtype=str)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        answers = pd.DataFrame({
+            col: _categorical(arrays[f'answer{i}_codes'], arrays[f'answer{i}_values'].tolist())
+            for i, col in enumerate(ANSWER_COLUMNS)
+        })
+        return cls(arrays['issues'], arrays['tags'], answers)
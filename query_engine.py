@@ -0,0 +1,160 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from lookup_index import LookupIndex
+
+# --- CONFIGURATION ---
+# Engine behind the cube build and the row filters of the lookup/catalog pages:
+#   CV_QUERY_ENGINE=auto    Polars when it is installed, else pandas (default)
+#   CV_QUERY_ENGINE=polars  lazy, multi-threaded Polars over the category codes
+#   CV_QUERY_ENGINE=pandas  groupby + the LookupIndex inverted index
+# Both return identical frames and row positions; pandas is the reference.
+ENGINE = os.environ.get('CV_QUERY_ENGINE', 'auto').lower()
+
+def polars_available():
+    return importlib.util.find_spec('polars') is not None
+
+# --- ENGINES ---
+
+class PandasEngine:
+    """Eager pandas over master_df; filters go through a LookupIndex built on first use."""
+
+    name = 'pandas'
+
+    def __init__(self, master_df):
+        self.df = master_df
+        self._lookup = None
+
+    def group_counts(self, dimensions):
+        # sort=False keeps first-appearance order, which PivotCube.top_instructors relies on for ties
+        return (
+            self.df.groupby(dimensions, observed=True, sort=False)
+            .size()
+            .rename('Count')
+            .reset_index()
+        )
+
+    def lookup(self):
+        if self._lookup is None:
+            self._lookup = LookupIndex(self.df)
+        return self._lookup
+
+    def options(self, dim):
+        return self.lookup().options[dim]
+
+    def select(self, filters):
+        return self.lookup().select(filters)
+
+    def rows_equal(self, column, value):
+        return np.flatnonzero(self.df[column] == value)
+
+
+class PolarsEngine:
+    """
+    Lazy Polars queries over the integer codes of master_df's columns: every grouping and
+    filter runs multi-threaded on a narrow Arrow-backed frame of codes, and only the result
+    is mapped back to labels (with master_df's own categorical dtypes).
+    """
+
+    name = 'polars'
+
+    def __init__(self, master_df):
+        import polars as pl
+
+        self.pl = pl
+        self.df = master_df
+        self._codes = {}  # column -> (codes, values)
+        self._series = {} # column -> Polars Series of the codes
+        self._options = {}
+
+    def _column(self, col):
+        # Categoricals are already coded; anything else is factorized once (sorted, like categories)
+        if col not in self._codes:
+            series = self.df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes, values = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                codes, values = pd.factorize(series, sort=True)
+            self._codes[col] = (codes, values)
+            self._series[col] = self.pl.Series(col, codes)
+        return self._codes[col]
+
+    def _scan(self, columns):
+        for col in columns:
+            self._column(col)
+        return self.pl.DataFrame([self._series[col] for col in columns]).lazy()
+
+    def _labels(self, col, codes):
+        values = self._codes[col][1]
+        dtype = self.df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            return pd.Categorical.from_codes(codes, dtype=dtype)
+        return values.take(codes)
+
+    def group_counts(self, dimensions):
+        pl = self.pl
+        # Missing values (code -1) are dropped, as pandas groupby does
+        out = (
+            self._scan(dimensions)
+            .filter(pl.all_horizontal([pl.col(d) >= 0 for d in dimensions]))
+            .group_by(dimensions, maintain_order=True)
+            .len(name='Count')
+            .collect()
+        )
+        counts = pd.DataFrame({d: self._labels(d, out[d].to_numpy()) for d in dimensions})
+        counts['Count'] = out['Count'].to_numpy().astype(np.int64)
+        return counts
+
+    def options(self, dim):
+        # Observed values in category order, as LookupIndex lists them
+        if dim not in self._options:
+            codes = self._scan([dim]).filter(self.pl.col(dim) >= 0).unique().sort(dim).collect()[dim].to_numpy()
+            self._options[dim] = list(self._codes[dim][1].take(codes))
+        return self._options[dim]
+
+    def _positions(self, predicate, columns):
+        return (
+            self._scan(columns)
+            .with_row_index('row')
+            .filter(predicate)
+            .select('row')
+            .collect()['row']
+            .to_numpy()
+            .astype(np.int64)
+        )
+
+    def select(self, filters):
+        """Same contract as LookupIndex.select: OR within a dimension, AND across them."""
+        active = {dim: selected for dim, selected in filters.items() if selected}
+        if not active:
+            return None
+        pl = self.pl
+        predicates = []
+        for dim, selected in active.items():
+            values = self._column(dim)[1]
+            codes = pd.Index(values).get_indexer(selected)
+            predicates.append(pl.col(dim).is_in(codes[codes >= 0].tolist()))
+        return self._positions(pl.all_horizontal(predicates), list(active))
+
+    def rows_equal(self, column, value):
+        codes = pd.Index(self._column(column)[1]).get_indexer([value])
+        if codes[0] < 0:
+            return np.array([], dtype=np.int64)
+        return self._positions(self.pl.col(column) == codes[0], [column])
+
+
+ENGINES = {'pandas': PandasEngine, 'polars': PolarsEngine}
+
+def get_engine(master_df, name=None):
+    """Query engine over master_df: `name`, else CV_QUERY_ENGINE, with pandas as the fallback."""
+    name = (name or ENGINE).lower()
+    if name == 'auto':
+        name = 'polars' if polars_available() else 'pandas'
+    if name not in ENGINES:
+        raise ValueError(f"Unknown query engine: {name}")
+    if name == 'polars' and not polars_available():
+        name = 'pandas'
+    return ENGINES[name](master_df)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# --- SYNTHETIC COURSE DESIGNATION FORM ---
+# Generates rows shaped like the Microsoft Forms export (same headers, same
+# kind of messy free-text answers) so ingest can be exercised without the
+# real workbook.
+
+FORM_COLUMNS = [
+    'ID',
+    'Start time',
+    'Completion time',
+    'Email',
+    'Instructor name',
+    'Course department, number, and title',
+    'Term(s) offered',
+    'Which Cardinal virtues does this course address?',
+]
+
+DEPTS = ['THEO', 'PHIL', 'ENGL', 'HIST', 'MATH', 'BIOL', 'EDUC', 'BUS', 'COMM', 'SOWK', 'NURS', 'MUSC']
+
+COURSE_FORMATS = [
+    '{dept} {num} - {title}',
+    '{dept}{num} {title}',
+    '{dept}-{num}: {title}',
+    '{title} ({dept} {num})',
+    '{dept_lower} {num} {title}',   # lowercase dept, does not parse
+    '{title}',                      # no code at all
+]
+
+TITLES = ['Christian Theology', 'Ethics', 'Foundations of Writing', 'World History', 'Calculus I',
+          'Cell Biology', 'Introduction to Education', 'Business Law', 'Public Speaking', 'Social Policy',
+          'Community Health', 'Music Theory']
+
+TERM_ANSWERS = [
+    'Fall 2025', 'Spring 2026', 'Fall 2025, Spring 2026', 'Every Semester', 'Each term',
+    'Every Fall', 'every spring', 'Fall 26', 'J-Term 2027', 'Summer 2026', 'Spring 2027; Fall 2027',
+    'Virtual - Summer 2026', 'TBD', 'Not sure yet', 'Fall 2024', 'All semesters',
+]
+
+VIRTUE_ANSWERS = [
+    'Justice;', 'Prudence;', 'Temperance;', 'Fortitude;', 'Justice;Prudence;', 'Justice;Fortitude;',
+    'Temperance;Prudence;Justice;', 'Justice;Prudence;Temperance;Fortitude;', 'Fortitude;Virtual;',
+    'justice, prudence', 'None of these', '',
+]
+
+INSTRUCTORS = ['Muffet Trout', 'Chelda Smith', 'D. Monson', 'E. Gullickson', 'J. Alvarez', 'K. Nguyen',
+               'L. Okafor', 'M. Rossi', 'P. Schmidt', 'R. Patel', 'S. Lindqvist', 'T. Haddad']
+
+
+def make_form_frame(n_rows, seed=0):
+    """Random form responses with the raw export headers (before column mapping)."""
+    rng = np.random.default_rng(seed)
+
+    dept = rng.choice(DEPTS, n_rows)
+    num = rng.integers(100, 499, n_rows).astype(str)
+    title = rng.choice(TITLES, n_rows)
+    fmt = rng.choice(len(COURSE_FORMATS), n_rows, p=[0.45, 0.2, 0.15, 0.1, 0.05, 0.05])
+    courses = [
+        COURSE_FORMATS[f].format(dept=d, dept_lower=d.lower(), num=n, title=t)
+        for f, d, n, t in zip(fmt, dept, num, title)
+    ]
+
+    terms = rng.choice(np.array(TERM_ANSWERS, dtype=object), n_rows)
+    terms[rng.random(n_rows) < 0.02] = np.nan
+
+    virtues = rng.choice(np.array(VIRTUE_ANSWERS, dtype=object), n_rows)
+    virtues[virtues == ''] = np.nan
+
+    # A long tail of instructors on top of the regulars
+    instructors = np.where(
+        rng.random(n_rows) < 0.7,
+        rng.choice(INSTRUCTORS, n_rows),
+        np.char.add('Instructor ', rng.integers(0, max(n_rows // 20, 1), n_rows).astype(str)),
+    )
+
+    start = pd.Timestamp('2025-03-01') + pd.to_timedelta(rng.integers(0, 200 * 24 * 60, n_rows), unit='min')
+
+    return pd.DataFrame({
+        'ID': np.arange(1, n_rows + 1),
+        'Start time': start,
+        'Completion time': start + pd.to_timedelta(rng.integers(1, 30, n_rows), unit='min'),
+        'Email': [f'user{i}@stthomas.edu' for i in rng.integers(0, 5000, n_rows)],
+        'Instructor name': instructors.astype(object),
+        'Course department, number, and title': courses,
+        'Term(s) offered': terms,
+        'Which Cardinal virtues does this course address?': virtues,
+    }, columns=FORM_COLUMNS)
+
+
+def write_form_xlsx(path, n_rows, seed=0):
+    """Write a synthetic export to ``path``, row by row in xlsxwriter's constant_memory mode."""
+    import xlsxwriter
+
+    df = make_form_frame(n_rows, seed)
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet('Sheet1')
+        date_format = workbook.add_format({'num_format': 'm/d/yy h:mm'})
+        sheet.write_row(0, 0, FORM_COLUMNS)
+        for r, values in enumerate(df.itertuples(index=False, name=None), start=1):
+            for c, value in enumerate(values):
+                if isinstance(value, pd.Timestamp):
+                    sheet.write_datetime(r, c, value.to_pydatetime(), date_format)
+                elif isinstance(value, str) or not pd.isna(value):
+                    sheet.write(r, c, value)
+    finally:
+        workbook.close()
+    return path
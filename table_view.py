@@ -0,0 +1,123 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import exports
+from instrumentation import span
+
+# --- CONFIGURATION ---
+PAGE_SIZES = [25, 50, 100, 250, 500]
+NO_SORT = "(no sort)"
+
+# --- SERVER-SIDE TABLE ---
+# st.dataframe serializes every row it is given to Arrow and ships it to the browser on
+# each rerun. paged_table keeps projection, filtering, sorting and paging on the server and
+# only hands the visible window to st.dataframe.
+
+def _codes(col):
+    # Sortable/searchable integer view of a column; categoricals are already coded in sorted order
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy(), col.cat.categories
+    codes, values = pd.factorize(col, sort=True)
+    return codes, values
+
+def _rows_signature(rows):
+    return None if rows is None else hashlib.blake2b(np.ascontiguousarray(rows).tobytes(), digest_size=16).hexdigest()
+
+def _search(df, rows, column, text):
+    # Match against the distinct values once, then select rows by code
+    codes, values = _codes(df[column])
+    hit = np.append(pd.Index(values).astype(str).str.contains(text, case=False, regex=False), False) # -1 -> missing
+    if rows is None:
+        return np.flatnonzero(hit[codes])
+    return rows[hit[codes[rows]]]
+
+def _sort(df, rows, column, ascending):
+    codes, _ = _codes(df[column])
+    if rows is None:
+        rows = np.arange(len(df))
+    keys = codes[rows].astype(np.int64)
+    order = np.argsort(keys if ascending else -keys, kind='stable') # stable keeps original order for ties
+    return rows[order]
+
+def page_frame(df, window, columns):
+    # Slice the window; categoricals would otherwise ship their whole category list with every page
+    page = df.iloc[window][columns]
+    for col in page.columns:
+        if isinstance(page[col].dtype, pd.CategoricalDtype):
+            page[col] = page[col].cat.remove_unused_categories()
+    return page
+
+def visible_rows(df, rows=None, search_column=None, search_text='', sort_column=None, ascending=True):
+    """Row positions after search and sort; None means all rows in their original order."""
+    if search_column and search_text:
+        rows = _search(df, rows, search_column, search_text)
+    if sort_column:
+        rows = _sort(df, rows, sort_column, ascending)
+    return rows
+
+def export_buttons(name, df, key, rows=None, columns=None):
+    """
+    XLSX / CSV / Parquet downloads of df (rows/columns as in exports.iter_chunks). The file
+    is only written when a button is clicked, chunk by chunk from df and the row selection.
+    """
+    def build(fmt):
+        with span(f"export: {name}", format=fmt, rows=len(df) if rows is None else len(rows)):
+            return exports.export_file(fmt, name, df, rows, columns)
+
+    for col, (fmt, (extension, mime)) in zip(st.columns(len(exports.FORMATS)), exports.FORMATS.items()):
+        with col:
+            st.download_button(f"⬇ {fmt}", lambda fmt=fmt: build(fmt), file_name=exports.slug(name) + extension,
+                               mime=mime, key=f"{key}_export_{fmt}", on_click="ignore", use_container_width=True)
+
+def paged_table(df, key, data_key, rows=None, height=500, export=None):
+    """
+    Paginated view of df (optionally restricted to the row positions in `rows`).
+    `key` namespaces the widgets, so several tables can coexist across pages; `data_key`
+    identifies df's contents (the dataset key), so a memoized search/sort never outlives them.
+    With an `export` name, the search/sort result (all pages, selected columns) can be downloaded.
+    """
+    all_columns = list(df.columns)
+
+    c1, c2, c3, c4 = st.columns([3, 2, 2, 1])
+    with c1:
+        columns = st.multiselect("Columns", all_columns, default=all_columns, key=f"{key}_columns")
+    with c2:
+        search_column = st.selectbox("Search in", all_columns, key=f"{key}_search_col")
+        search_text = st.text_input("Contains", key=f"{key}_search", placeholder="Search...")
+    with c3:
+        sort_column = st.selectbox("Sort by", [NO_SORT] + all_columns, key=f"{key}_sort")
+        ascending = st.toggle("Ascending", value=True, key=f"{key}_asc")
+    with c4:
+        page_size = st.selectbox("Rows/page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+
+    sort_column = None if sort_column == NO_SORT else sort_column
+
+    # Search/sort results are memoized per table, so paging through them is only a slice
+    # Keyed on the content hash, not id(df): a freed frame's id can be reused by the next dataset
+    signature = (data_key, _rows_signature(rows), search_column, search_text, sort_column, ascending)
+    memo = st.session_state.get(f"{key}_rows")
+    if memo is None or memo[0] != signature:
+        memo = (signature, visible_rows(df, rows, search_column, search_text, sort_column, ascending))
+        st.session_state[f"{key}_rows"] = memo
+        st.session_state[f"{key}_page"] = 1 # new result set: back to the first page
+    rows = memo[1]
+
+    n_rows = len(df) if rows is None else len(rows)
+    n_pages = max((n_rows - 1) // page_size + 1, 1)
+    # A narrower search or a bigger page size can leave the current page out of range
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = n_pages
+    page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+
+    start = (page - 1) * page_size
+    stop = min(start + page_size, n_rows)
+    window = np.arange(start, stop) if rows is None else rows[start:stop]
+
+    # Only the visible window (and the projected columns) is serialized
+    st.dataframe(page_frame(df, window, columns or all_columns), use_container_width=True, height=height)
+    st.caption(f"Rows {start + 1 if n_rows else 0:,}–{stop:,} of {n_rows:,} · page {page:,} of {n_pages:,}")
+    if export is not None:
+        export_buttons(export, df, key, rows=rows, columns=columns or all_columns)
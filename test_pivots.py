@@ -1,83 +1,233 @@
-import pandas as pd
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
 import numpy as np
+import pandas as pd
+
+import data_processor
+from charts import CHART_TYPES, build_spec
+from pivot_cube import DASHBOARD_VIEWS, PivotCube
+from synthetic_data import write_form_xlsx
+
+# --- BENCHMARK HARNESS ---
+# End-to-end timing of the dashboard pipeline on synthetic Course Designation Form exports:
+#   python test_pivots.py --rows 1000 100000 1000000 --output bench.json
+#   python test_pivots.py --rows 1000 100000 --compare bench.json
+# Each size runs in a fresh process so its peak RSS is its own.
+
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000]
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'bench')
+RSS_SAMPLE_SECONDS = 0.005
+NOISE_FLOOR_SECONDS = 0.01 # stages faster than this are not flagged as regressions
+
+# --- 1. Synthetic Data ---
+
+def form_workbook(n_rows, seed, data_dir=DATA_DIR):
+    """Seeded export with messy course/term answers; generated once per (rows, seed)."""
+    path = os.path.join(data_dir, f"form_{n_rows}_{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.xlsx"
+        write_form_xlsx(tmp_path, n_rows, seed)
+        os.replace(tmp_path, path)
+    return path
+
+# --- 2. Memory ---
 
-# --- 1. Generate Synthetic Data ---
-print("Generating 1000 rows of synthetic data...")
-
-# Options
-depts = ['MATH', 'ENG', 'HIST', 'PHIL', 'THEO', 'BIOS', 'BUS']
-virtues = ['Justice', 'Prudence', 'Temperance', 'Fortitude']
-terms = ['Fall 2025', 'Spring 2026', 'J-Term 2026', 'Fall 2026', 'Spring 2027', 'Unknown']
-ays = {
-    'Fall 2025': 'AY 25', 'Spring 2026': 'AY 25', 'J-Term 2026': 'AY 25',
-    'Fall 2026': 'AY 26', 'Spring 2027': 'AY 26', 'Unknown': 'Unknown'
-}
-instructors = ['Prof A', 'Prof B', 'Prof C', 'Prof D', 'Prof E']
-delivery_modes = ['Virtual', 'Not marked']
-
-rows = []
-for i in range(1000):
-    term = np.random.choice(terms)
-    dept = np.random.choice(depts)
-    rows.append({
-        'Source': 'Use Synthetic',
-        'Course Code': f"{dept} {np.random.randint(100, 499)}",
-        'Department': dept,
-        'Instructor name': np.random.choice(instructors),
-        'Cardinal virtues addressed': np.random.choice(virtues),
-        'Term': term,
-        'Academic Year': ays[term],
-        'DeliveryMode': np.random.choice(delivery_modes, p=[0.2, 0.8]),
-        'Semester': term.split(' ')[0]
-    })
-
-df = pd.DataFrame(rows)
-print(f"Data Generated. Shape: {df.shape}")
-print(df.head(3))
-print("-" * 30)
-
-# --- 2. Test Pivot Logic from app.py ---
-
-def test_pivot(name, dataframe, index_col, columns_col, values_col='Course Code', agg='count'):
-    print(f"Testing {name}...")
+def current_rss():
+    # Linux only; other platforms fall back to the process high-water mark
     try:
-        pivot = dataframe.pivot_table(
-            index=index_col,
-            columns=columns_col,
-            values=values_col,
-            aggfunc=agg,
-            fill_value=0
-        )
-        print(f"  [PASS] Created pivot {pivot.shape}")
-        
-        # Test Flattening (used for Chart)
-        reset = pivot.reset_index()
-        melted = reset.melt(id_vars=[reset.columns[0]], var_name='Category', value_name='Count')
-        print(f"  [PASS] Melted for chart {melted.shape}")
-        
-    except Exception as e:
-        print(f"  [FAIL] Error: {e}")
-
-# View 3: Overview
-test_pivot("Overview: Course Offerings", df[df['Academic Year'].str.startswith('AY')], 'Academic Year', 'Semester')
-
-# View 4: Virtue by Year
-test_pivot("Trends: Virtue by Year", df, 'Cardinal virtues addressed', 'Academic Year')
-
-# View 5: Virtue by Semester
-test_pivot("Trends: Virtue by Semester", df, 'Cardinal virtues addressed', 'Semester')
-
-# View 6: Instructor Load
-# Filter top 20 logic
-top_instructors = df['Instructor name'].value_counts().head(20).index
-filtered_instr = df[df['Instructor name'].isin(top_instructors)]
-test_pivot("Analysis: Instructor Load", filtered_instr, 'Instructor name', 'Cardinal virtues addressed')
-
-# View 7: Department Alignment
-test_pivot("Analysis: Department Alignment", df, 'Department', 'Cardinal virtues addressed')
-
-# View 8: Virtual Adoption
-test_pivot("Analysis: Virtual Adoption", df, 'Academic Year', 'DeliveryMode')
-
-print("-" * 30)
-print("Stress Test Complete.")
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def max_rss():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # bytes on macOS, KiB elsewhere
+
+
+class RssSampler:
+    """Peak RSS while the block runs, sampled from a background thread."""
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.peak is None:
+            self.peak = max_rss()
+        else:
+            self._thread.join()
+            self.peak = max(self.peak, current_rss())
+        return False
+
+# --- 3. Stages ---
+
+def run_stage(stages, name, fn, *args):
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        result = fn(*args)
+        seconds = time.perf_counter() - start
+    stages[name] = {
+        'seconds': round(seconds, 6),
+        'peak_rss_mb': None if rss.peak is None else round(rss.peak / 2**20, 1),
+    }
+    print(f"    {name:<48} {seconds:>9.3f}s {stages[name]['peak_rss_mb'] or '-':>9} MB", flush=True)
+    return result
+
+def reference_pivot(master_df, view_name, cube):
+    # What each view computed before the cube: filter, then pivot_table(aggfunc='count')
+    view = DASHBOARD_VIEWS[view_name]
+    df = master_df
+    if view.get('filter') == 'valid_ay':
+        df = df[df['Academic Year'].str.startswith('AY')]
+    elif view.get('filter') == 'top_instructors':
+        df = df[df['Instructor name'].isin(cube.top_instructors())]
+    return df.pivot_table(index=view['index'], columns=view['columns'], values='Course Code',
+                          aggfunc='count', fill_value=0, observed=True)
+
+def check_pivot(name, pivot, expected):
+    try:
+        pd.testing.assert_frame_equal(pivot, expected, check_dtype=False, check_names=False,
+                                      check_index_type=False, check_column_type=False,
+                                      check_categorical=False)
+        print(f"    [PASS] {name} {pivot.shape}")
+        return True
+    except AssertionError as e:
+        print(f"    [FAIL] {name}: {e}")
+        return False
+
+def run_size(n_rows, seed, verify_limit):
+    """All stages for one export size; runs in its own process."""
+    path = form_workbook(n_rows, seed)
+    stages = {}
+
+    df = run_stage(stages, 'read_excel', data_processor.read_form, path)
+    norm = run_stage(stages, 'normalize', data_processor.normalize_form_rows, df)
+    form = run_stage(stages, 'explode', data_processor.explode_normalized, norm)
+    master_df = run_stage(stages, 'build_master',
+                          lambda: data_processor.build_master([form, data_processor.explode_hardcoded_rows()]))
+    del df, norm, form
+    run_stage(stages, 'process_file (streaming)', data_processor.process_file, path, True)
+
+    cube = run_stage(stages, 'pivot_cube', PivotCube, master_df)
+    for view_name in DASHBOARD_VIEWS:
+        run_stage(stages, f"pivot: {view_name}", cube.pivot, view_name)
+    import altair # build_spec imports it on first use; kept out of the first view's time
+    for view_name, view in DASHBOARD_VIEWS.items():
+        # What page_analysis draws by default: the capped long form and its spec (charts.build_spec)
+        run_stage(stages, f"chart spec: {view_name}", build_spec,
+                  cube.pivot(view_name), view['index'], view['columns'], CHART_TYPES[0])
+
+    passed = None
+    if n_rows <= verify_limit:
+        passed = all(check_pivot(view_name, cube.pivot(view_name), reference_pivot(master_df, view_name, cube))
+                     for view_name in DASHBOARD_VIEWS)
+
+    return {
+        'form_rows': n_rows,
+        'master_rows': len(master_df),
+        'peak_rss_mb': None if max_rss() is None else round(max_rss() / 2**20, 1),
+        'pivots_verified': passed,
+        'stages': stages,
+    }
+
+# --- 4. Report ---
+
+def metadata(seed):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': seed,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def compare(results, baseline, threshold):
+    """Print per-stage time ratios against a previous JSON run; returns the regressions."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}):")
+    for size, run in results['runs'].items():
+        old_run = baseline['runs'].get(size)
+        if old_run is None:
+            continue
+        print(f"  {int(size):,} rows")
+        for stage, timing in run['stages'].items():
+            old = old_run['stages'].get(stage)
+            if old is None:
+                continue
+            ratio = timing['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+            slower = ratio > threshold and timing['seconds'] >= NOISE_FLOOR_SECONDS
+            if slower:
+                regressions.append((size, stage, ratio))
+            print(f"    {stage:<48} {old['seconds']:>9.3f}s -> {timing['seconds']:>9.3f}s "
+                  f"{ratio:>6.2f}x{'  REGRESSION' if slower else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard pipeline benchmark on synthetic form exports")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify-limit', type=int, default=100_000,
+                        help="check cube pivots against pivot_table up to this many rows")
+    parser.add_argument('--output', help="write results as JSON to this path")
+    parser.add_argument('--compare', help="JSON from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="flag stages slower than baseline by more than this factor")
+    args = parser.parse_args()
+
+    results = {'meta': metadata(args.seed), 'runs': {}}
+    # spawn: every size starts from a clean interpreter, so peak RSS is per size
+    ctx = multiprocessing.get_context('spawn')
+    for n_rows in args.rows:
+        print(f"{n_rows:,} form rows", flush=True)
+        with ctx.Pool(1) as pool:
+            results['runs'][str(n_rows)] = pool.apply(run_size, (n_rows, args.seed, args.verify_limit))
+        run = results['runs'][str(n_rows)]
+        print(f"  -> {run['master_rows']:,} master rows, peak RSS {run['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    failed = any(run['pivots_verified'] is False for run in results['runs'].values())
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed beyond {args.threshold}x")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()